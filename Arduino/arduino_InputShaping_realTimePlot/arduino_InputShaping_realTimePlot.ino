@@ -11,7 +11,28 @@
    * 10/13/13 - JEV - joshua.vaughan@louisiana.edu
      - updated commenting
      - 
+   * 10/18/26
+     - added BINARY_OUTPUT, which sends each sample as a fixed-size packet with a
+       CRC at 500000 baud, for Misc/serial_packets.py
  ------------------------------------------------------------------------------------*/
+
+// Uncomment to send binary packets instead of text
+//   The packet format is described in Misc/serial_packets.py
+// #define BINARY_OUTPUT
+
+#ifdef BINARY_OUTPUT
+// The packet of one sample - AVR is little-endian, and the fixed-width types keep it
+// 26 bytes whatever the size of an int on the board
+struct Packet {
+  byte sync[2];                // 0xA5, 0x5A
+  uint16_t sequence;           // counts up, to find lost packets
+  uint32_t timestamp;          // micros() when the sample was taken
+  float channels[4];           // unshaped, A1, A2, shaped
+  uint16_t crc;                // CRC-16/CCITT of sequence through channels
+} __attribute__((packed));
+
+Packet packet;
+#endif
 // Variables declared here are global
 const float pi = 3.14;         // declare and define pi
 double sampleTime = 100;       // the time between samples (ms)
@@ -29,8 +50,17 @@ int pushButton = 2;          // pin 2 has a pushbutton attached to it.
 // Use to initialize variables, pin modes, libraries, communication, etc
 void setup()
 {
+#ifdef BINARY_OUTPUT
+  // initialize serial communication at 500000 bits per second, exact on a 16 MHz
+  // board, and room for about 1900 packets per second
+  Serial.begin(500000);
+  packet.sync[0] = 0xA5;
+  packet.sync[1] = 0x5A;
+  packet.sequence = 0;
+#else
   // initialize serial communication at 9600 bits per second
   Serial.begin(9600);
+#endif
 
   // define the button digital pin as an INPUT
   pinMode(pushButton, INPUT);    
@@ -117,6 +147,19 @@ void loop()
     A1buffer[bufferIndex] = 0;
     A2buffer[bufferIndex] = 0;
     
+#ifdef BINARY_OUTPUT
+    packet.timestamp = micros();
+    packet.channels[0] = float(currButtonState);
+    packet.channels[1] = currentA1;
+    packet.channels[2] = currentA2;
+    packet.channels[3] = currentOutput;
+    packet.crc = crc16((byte*)&packet.sequence, sizeof(packet) - 4);
+    
+    // write only queues the bytes, so no flush - the next sample is computed 
+    // while this one is sent
+    Serial.write((byte*)&packet, sizeof(packet));
+    packet.sequence++;
+#else
     Serial.print(float(currButtonState));
     Serial.print(" ");              // prints a tab, to make parsing easier
     Serial.print(currentA1);           
@@ -126,6 +169,7 @@ void loop()
     Serial.print(currentOutput); 
     Serial.print("\n");             // use an explicit newline character
     Serial.flush();                 // wait for serial comm to finish
+#endif
     
   
     // if the next index is outside the buffer size, loop back to the beginning
@@ -170,3 +214,28 @@ void ZV(double freq, double zeta, double shaper[4])
 } 
 
 
+#ifdef BINARY_OUTPUT
+// CRC-16/CCITT (polynomial 0x1021, initial value 0xFFFF) of length bytes
+uint16_t crc16(byte *data, int length)
+{
+  uint16_t crc = 0xFFFF;
+  
+  for (int ii = 0; ii < length; ii++)
+  {
+    crc ^= (uint16_t)data[ii] << 8;
+    for (int bit = 0; bit < 8; bit++)
+    {
+      if (crc & 0x8000)
+      {
+        crc = (crc << 1) ^ 0x1021;
+      }
+      else
+      {
+        crc = crc << 1;
+      }
+    }
+  }
+  
+  return crc;
+}
+#endif
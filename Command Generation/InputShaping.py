@@ -0,0 +1,243 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# InputShaping.py
+#
+# Input shaper design and a fast shaper convolution
+#
+# Shapers are arrays of the form [Ti Ai] - one row per impulse, with the impulse time
+# in the first column and its amplitude in the second. This is the format accel_input
+# and CommandProfile use.
+#
+# Shaper functions return [shaper, exactshaper]. The exact shaper has the designed
+# impulse times. The other has its impulse times rounded to the sample time, so that it
+# can be applied to sampled commands.
+#
+# Usage:
+#   [shaper, exactshaper] = ZV(freq, zeta, 0.001)
+#   [t_shaped, U_shaped] = conv(U, shaper, 0.001)
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import numpy as np
+
+# Inputs whose (first or second) differences are nonzero at fewer than this fraction
+# of the samples are shaped through their differences
+SPARSE_INPUT_FRACTION = 0.05
+
+
+def _damped_period(freq, zeta):
+    """ Damped period of vibration (s) for a natural frequency in Hz """
+    return 1. / (freq * np.sqrt(1 - zeta**2))
+
+
+def digitize_shaper(shaper, dt):
+    """
+    Rounds the impulse times of shaper to multiples of dt, merging impulses that
+    land on the same sample.
+    """
+    shaper = np.asarray(shaper, dtype=float)
+    samples = np.round(shaper[:, 0] / dt).astype(int)
+
+    times, index = np.unique(samples, return_inverse=True)
+    amps = np.bincount(index, weights=shaper[:, 1], minlength=len(times))
+
+    return np.column_stack((times * dt, amps))
+
+
+def _shaper_pair(times, amps, dt):
+    exactshaper = np.column_stack((times, amps))
+    if dt is None or dt == 0:
+        return exactshaper, exactshaper
+    return digitize_shaper(exactshaper, dt), exactshaper
+
+
+def ZV(freq, zeta=0., dt=None):
+    """
+    Zero Vibration shaper.
+
+    Arguments:
+        freq :  natural frequency (Hz)
+        zeta :  damping ratio
+        dt :  sample time to digitize the shaper to (s)
+
+    Returns:
+        [shaper, exactshaper]
+    """
+    K = np.exp(-zeta * np.pi / np.sqrt(1 - zeta**2))
+    tau = _damped_period(freq, zeta)
+
+    amps = np.array([1., K]) / (1 + K)
+    times = np.array([0., 0.5 * tau])
+
+    return _shaper_pair(times, amps, dt)
+
+
+def ZVD(freq, zeta=0., dt=None):
+    """
+    Zero Vibration and Derivative shaper, more robust to modeling errors than
+    ZV at the cost of a half period of extra duration. See ZV for arguments.
+    """
+    K = np.exp(-zeta * np.pi / np.sqrt(1 - zeta**2))
+    tau = _damped_period(freq, zeta)
+
+    amps = np.array([1., 2 * K, K**2]) / (1 + K)**2
+    times = np.array([0., 0.5 * tau, tau])
+
+    return _shaper_pair(times, amps, dt)
+
+
+def EI(freq, zeta=0., Vtol=0.05, dt=None):
+    """
+    Extra-Insensitive shaper, which allows Vtol residual vibration at the
+    modeled frequency in exchange for a wider insensitive range than ZVD.
+    Uses the curve fits of Singhose et al. for damped systems.
+
+    Arguments:
+        freq :  natural frequency (Hz)
+        zeta :  damping ratio
+        Vtol :  allowable residual vibration, fraction of the unshaped vibration
+        dt :  sample time to digitize the shaper to (s)
+
+    Returns:
+        [shaper, exactshaper]
+    """
+    V = Vtol
+    tau = 1. / freq
+
+    A1 = (0.24968 + 0.24962 * V + 0.80008 * zeta + 1.23328 * V * zeta +
+          0.49599 * zeta**2 + 3.17508 * V * zeta**2)
+    A3 = (0.25032 + 0.24962 * V - 0.80008 * zeta - 1.23328 * V * zeta +
+          0.49599 * zeta**2 + 3.17508 * V * zeta**2)
+    A2 = 1 - A1 - A3
+
+    t2 = (0.49890 + 0.16270 * V - 0.54262 * zeta + 6.16180 * V * zeta**2) * tau
+    t3 = (0.99748 + 0.18382 * V - 1.58270 * zeta + 8.17120 * V * zeta**2) * tau
+
+    return _shaper_pair(np.array([0., t2, t3]), np.array([A1, A2, A3]), dt)
+
+
+def seqconv(*shapers):
+    """
+    Convolves shapers together, for example to build a multi-mode shaper from
+    single-mode ones. The impulse times add and the amplitudes multiply.
+    """
+    result = np.array([[0., 1.]])
+
+    for shaper in shapers:
+        shaper = np.asarray(shaper, dtype=float)
+        times = (result[:, 0, np.newaxis] + shaper[:, 0]).ravel()
+        amps = (result[:, 1, np.newaxis] * shaper[:, 1]).ravel()
+
+        # Merge impulses at the same time
+        times, index = np.unique(np.round(times, 12), return_inverse=True)
+        amps = np.bincount(index, weights=amps, minlength=len(times))
+        result = np.column_stack((times, amps))
+
+    return result
+
+
+def multimode(freqs, zetas, dt=None, shaper=ZV):
+    """
+    Multi-mode shaper - the convolution of one shaper per mode.
+
+    Arguments:
+        freqs :  natural frequencies of the modes (Hz)
+        zetas :  damping ratios of the modes
+        dt :  sample time to digitize the shaper to (s)
+        shaper :  single-mode shaper function to use for each mode (ZV, ZVD, EI)
+
+    Returns:
+        [shaper, exactshaper]
+    """
+    zetas = np.broadcast_to(zetas, np.shape(freqs))
+    exactshaper = seqconv(*[shaper(f, z)[1] for f, z in zip(np.ravel(freqs), np.ravel(zetas))])
+
+    return _shaper_pair(exactshaper[:, 0], exactshaper[:, 1], dt)
+
+
+def _shift_add(values, shifts, amps, out):
+    """ out[s:s+len(values)] += A*values for each impulse, using one scratch array """
+    scratch = np.empty_like(values)
+    for shift, amp in zip(shifts, amps):
+        np.multiply(values, amp, out=scratch)
+        out[shift:shift + len(values)] += scratch
+
+
+def _shift_add_sparse(diffs, tol, shifts, amps, out):
+    """ Shift-and-add of only the nonzero elements of diffs """
+    index = np.nonzero(np.abs(diffs) > tol)[0]
+    values = diffs[index]
+    for shift, amp in zip(shifts, amps):
+        target = index + shift
+        keep = target < len(out)
+        np.add.at(out, target[keep], amp * values[keep])
+
+
+def conv(U, shaper, dt, out=None):
+    """
+    Shapes the sampled command U by convolving it with shaper.
+
+    The command is held at its final value past its end, so the shaped command is
+    longer than U by the shaper duration. Each impulse of the (digitized) shaper adds
+    a shifted, scaled copy of U into one preallocated array, O(M*N) for a length-M
+    command and N-impulse shaper. Commands made of steps or ramps have sparse first
+    or second differences, so for those only the nonzero differences are shifted and
+    added, and the result is recovered with cumulative sums in O(M).
+
+    Arguments:
+        U :  sampled command, 1D (a column or row vector is flattened)
+        shaper :  shaper of the form [Ti Ai]
+        dt :  sample time of U (s)
+        out :  optional preallocated array for the shaped command, of length
+               len(U) + round(max(Ti)/dt)
+
+    Returns:
+        [t, U_shaped] :  time vector and shaped command
+    """
+    U = np.asarray(U, dtype=float).ravel()
+    shaper = np.asarray(shaper, dtype=float)
+
+    shifts = np.round(shaper[:, 0] / dt).astype(int)
+    amps = shaper[:, 1]
+    num_samples = len(U) + shifts.max()
+
+    if out is None:
+        out = np.empty(num_samples)
+    out[:] = 0.
+
+    # Differences smaller than this are round-off, such as in a sampled ramp
+    tol = 1e-12 * np.max(np.abs(U))
+
+    first_diff = np.diff(U, prepend=0.)
+    second_diff = np.diff(first_diff, prepend=0.)
+
+    if np.count_nonzero(np.abs(first_diff) > tol) <= SPARSE_INPUT_FRACTION * len(U):
+        # Piecewise constant - shape the steps, then integrate once
+        _shift_add_sparse(first_diff, tol, shifts, amps, out)
+        np.cumsum(out, out=out)
+
+    elif np.count_nonzero(np.abs(second_diff) > tol) <= SPARSE_INPUT_FRACTION * len(U):
+        # Piecewise linear - shape the slope changes, then integrate twice. The
+        # command is held past its end, so its slope is cancelled there.
+        second_diff = np.append(second_diff, -first_diff[-1])
+        _shift_add_sparse(second_diff, tol, shifts, amps, out)
+        np.cumsum(out, out=out)
+        np.cumsum(out, out=out)
+
+    else:
+        _shift_add(U, shifts, amps, out)
+        # Hold the command at its final value past its end
+        for shift, amp in zip(shifts, amps):
+            out[shift + len(U):] += amp * U[-1]
+
+    t = np.arange(num_samples) * dt
+
+    return t, out
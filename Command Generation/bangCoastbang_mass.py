@@ -15,7 +15,8 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - simulate with discrete_sim.zoh_response instead of control.forced_response
 #
 ##########################################################################################
 
@@ -33,6 +34,7 @@
 from numpy import *                 # Grab all of the NumPy functions
 from matplotlib.pyplot import *     # Grab MATLAB-like plotting functions
 import control                      # import the control system functions
+from discrete_sim import zoh_response    # exact ZOH simulation of sampled inputs
 
 # Uncomment to use LaTeX to process the text in figure
 rc('text',usetex=True)
@@ -84,8 +86,8 @@ savefig('BangCoastBang_Force.png')
 #show()
 
 
-# run the simulation - utilize the built-in forced_response function
-[T,yout,xout] = control.forced_response(sys,t,F,hmax=0.01)
+# run the simulation - exact zero-order-hold response to the sampled force
+[T,yout,xout] = zoh_response(sys,t,F)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -120,8 +122,8 @@ savefig('BangCoastBang_Mass.png')
 #----- Look at the velocity
 sys_vel = control.tf(num,[m,0])
 
-# run the simulation - utilize the built-in forced_response function
-[T,yout,xout] = control.forced_response(sys_vel,t,F,hmax=0.01)
+# run the simulation - exact zero-order-hold response to the sampled force
+[T,yout,xout] = zoh_response(sys_vel,t,F)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
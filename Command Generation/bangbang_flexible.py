@@ -15,7 +15,11 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - simulate with discrete_sim.zoh_response instead of control.forced_response
+#   * 10/18/26
+#       - compute the switch times of the longer command with time_optimal.py
+#         instead of hard-coding the sample indices
 #
 ##########################################################################################
 
@@ -33,6 +37,8 @@
 from numpy import *                 # Grab all of the NumPy functions
 from matplotlib.pyplot import *     # Grab MATLAB-like plotting functions
 import control                      # import the control system functions
+from discrete_sim import zoh_response, switched_response    # exact simulation
+from time_optimal import time_optimal_profile   # time-optimal rest-to-rest commands
 
 # Uncomment to use LaTeX to process the text in figure
 rc('text',usetex=True)
@@ -96,8 +102,8 @@ savefig('BangBang_Force_Flexible.png')
 #show()
 
 
-# run the simulation - utilize the built-in forced_response function
-[T,yout,xout] = control.forced_response(sys,t,F)
+# run the simulation - exact zero-order-hold response to the sampled force
+[T,yout,xout] = zoh_response(sys,t,F)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -139,9 +145,11 @@ t = r_[0:10:0.001]            # time for simulation, 0-10s
 
 # Let's start it at t=0.5s for clarity in plotting
 fmax = 1.                   # Define the maximum actuator force (assumed symmetric)
-F = zeros(10000)             # Define an array of all zeros
-F[500:1914] = fmax
-F[1915:3329] = -fmax
+distance = 1.               # Move distance (m)
+
+# Solve for the time-optimal switch times that leave no vibration, then sample the force
+profile = time_optimal_profile(sys,fmax,distance,0.5)
+F = profile(t)
 
 # Plot the command
 # Make the figure pretty, then plot the results
@@ -174,8 +182,8 @@ plot(t,F,color='blue',linewidth=2,label='Response')
 #show()
 
 
-# run the simulation - utilize the built-in forced_response function
-[T,yout,xout] = control.forced_response(sys,t,F)
+# run the simulation - exact response to the steps at the (off-sample) switch times
+[T,yout,xout] = switched_response(sys,t,profile.breakpoints,profile.steps)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# command_profiles.py
+#
+# Piecewise-constant command profiles built once per move
+#
+# A profile stores the sorted switch times (breakpoints) of a command and the
+# command level between them. The switch times and amplitudes of bang-bang and
+# bang-coast-bang moves are computed once, shapers of any length are convolved into
+# the breakpoints, and the command is then evaluated by binary search at a single
+# time or for whole time arrays at once.
+#
+# Usage:
+#   profile = CommandProfile.bang_coast_bang(Amax,Vmax,Distance,StartTime,Shaper)
+#   accel = profile(t)                   # scalar or array t
+#   wsol = odeint_piecewise(f, w0, t, profile.breakpoints, args=(profile,))
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+from bisect import bisect_left
+
+import numpy as np
+from scipy.integrate import odeint
+
+
+def bcb_switch_times(Amax,Vmax,Distance,StartTime,bang_bang=True):
+    """
+    Returns the switch times and force steps of the rest-to-rest bang-coast-bang
+    (or bang-bang) command of the original accel_input. All arguments broadcast,
+    so the switches of a whole grid of moves are found at once.
+
+    Arguments:
+        Amax :  maximum accel, assumed to be symmetric +/-
+        Vmax :  maximum velocity, assumed to be symmetric +/-
+        Distance :  desired travel distance
+        StartTime :  time the command should begin
+        bang_bang :  switch moves too short to reach Vmax to bang-bang. accel_input
+                     only did this for unshaped commands - its shaped commands
+                     kept the bang-coast-bang times, which still travel Distance,
+                     coasting below Vmax.
+
+    Returns:
+        times, steps :  arrays of shape (..., 4) holding the times of the steps
+                        and their amplitudes. Bang-bang moves have t2 == t3, so
+                        their two middle steps add to the -2*Amax step.
+    """
+    Amax, Vmax, Distance, StartTime = np.broadcast_arrays(Amax*1.0, Vmax*1.0,
+                                                          Distance*1.0, StartTime*1.0)
+
+    # Bang-coast-bang times
+    t1 = StartTime
+    t2 = (Vmax/Amax) + t1
+    t3 = (Distance/Vmax) + t1
+    t4 = (t2 + t3)-t1
+
+    # Switch to bang-bang where the coast would have negative length
+    if bang_bang:
+        short = (t3 <= t2)
+        t_bang = np.sqrt(Distance/Amax)+t1
+        t2 = np.where(short, t_bang, t2)
+        t3 = np.where(short, t_bang, t3)
+        t4 = np.where(short, 2*np.sqrt(Distance/Amax)+t1, t4)
+
+    times = np.stack((t1, t2, t3, t4), axis=-1)
+    steps = np.stack((Amax, -Amax, -Amax, Amax), axis=-1)
+
+    return times, steps
+
+
+class CommandProfile(object):
+    """
+    Piecewise-constant command defined by steps at a set of switch times.
+
+    The command is 0 before the first breakpoint and, like the original
+    accel_input, takes the new level only for times strictly after a breakpoint.
+
+    Arguments:
+        switch_times :  times of the steps in the command (s)
+        steps :  change in the command at each switch time
+    """
+    def __init__(self, switch_times, steps):
+        switch_times = np.asarray(switch_times, dtype=float).ravel()
+        steps = np.asarray(steps, dtype=float).ravel()
+
+        # Merge steps that land at the same time and drop the ones that cancel
+        times, index = np.unique(switch_times, return_inverse=True)
+        merged = np.bincount(index, weights=steps, minlength=len(times))
+        keep = (merged != 0)
+
+        self.breakpoints = times[keep]
+        self.steps = merged[keep]
+        self.levels = np.r_[0., np.cumsum(self.steps)]
+
+        # Plain lists for fast scalar lookups inside ODE right-hand sides
+        self._breakpoint_list = self.breakpoints.tolist()
+        self._level_list = self.levels.tolist()
+
+    @classmethod
+    def bang_coast_bang(cls, Amax, Vmax, Distance, StartTime=0., Shaper=[]):
+        """
+        Rest-to-rest bang-coast-bang (or bang-bang) move, optionally shaped.
+        Like the original accel_input, only unshaped moves switch to bang-bang
+        when they are too short to reach Vmax.
+
+        Arguments:
+            Amax, Vmax, Distance, StartTime :  as in bcb_switch_times
+            Shaper :  array of the form [Ti Ai], or empty for unshaped
+        """
+        times, steps = bcb_switch_times(Amax, Vmax, Distance, StartTime,
+                                        bang_bang=(len(Shaper) == 0))
+        return cls(times, steps).shaped(Shaper)
+
+    def shaped(self, Shaper):
+        """
+        Returns the profile convolved with a shaper of the form [Ti Ai], which
+        can have any number of impulses.
+        """
+        if len(Shaper) == 0:
+            return self
+
+        Shaper = np.asarray(Shaper, dtype=float)
+        times = self.breakpoints[:, np.newaxis] + Shaper[:, 0]
+        steps = self.steps[:, np.newaxis] * Shaper[:, 1]
+
+        return CommandProfile(times, steps)
+
+    @property
+    def end_time(self):
+        """ Time of the last switch in the command """
+        if len(self.breakpoints) == 0:
+            return 0.
+        return self.breakpoints[-1]
+
+    def accel(self, t):
+        """
+        Returns the command at time t, which can be a scalar or an array.
+        """
+        if np.ndim(t) == 0:
+            return self._level_list[bisect_left(self._breakpoint_list, t)]
+
+        return self.levels[np.searchsorted(self.breakpoints, t, side='left')]
+
+    __call__ = accel
+
+
+def odeint_piecewise(func, y0, t, breakpoints, args=(), **kwargs):
+    """
+    Solves an ODE like odeint, restarting the integration at every breakpoint, so
+    each call only integrates across a constant piece of the command. odeint's
+    tcrit fails ("Illegal input detected") when two breakpoints fall between the
+    same pair of output times, and returns garbage rather than raising.
+
+    Arguments:
+        func, y0, t, args :  as for odeint - y0 is the state at t[0]
+        breakpoints :  sorted times at which the right-hand side jumps
+        kwargs :  other arguments for odeint (atol, rtol, ...)
+
+    Returns:
+        array of the states at t, shape (len(t), len(y0))
+    """
+    t = np.asarray(t, dtype=float)
+    breakpoints = np.asarray(breakpoints, dtype=float)
+    state = np.asarray(y0, dtype=float)
+
+    y = np.empty((len(t), len(state)))
+    y[0] = state
+
+    # Samples and breakpoints closer together than this are taken as coincident,
+    # since odeint can't step across a gap of a few ulps either
+    tol = 1e-9 * (t[-1] - t[0])
+    inside = breakpoints[(breakpoints > t[0] + tol) & (breakpoints < t[-1] - tol)]
+
+    start = t[0]
+    done = 1                # samples of t filled in so far
+    for stop in np.r_[inside, t[-1]]:
+        if stop - start <= tol:
+            continue
+
+        end = np.searchsorted(t, stop + tol, side='right')
+        inner = t[done:end]
+        times = np.r_[start, inner]
+        if len(inner) == 0 or inner[-1] < stop - tol:
+            times = np.r_[times, stop]
+
+        sol, info = odeint(func, state, times, args=args, full_output=True, **kwargs)
+        if info['message'] != 'Integration successful.':
+            raise RuntimeError('odeint failed between t = %g and %g: %s' %
+                               (start, stop, info['message']))
+
+        y[done:end] = sol[1:1 + len(inner)]
+        state = sol[-1]
+        start = times[-1]
+        done = end
+
+    return y
@@ -0,0 +1,259 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# discrete_sim.py
+#
+# Exact discrete-time simulation of LTI systems driven by piecewise-constant inputs
+#
+# The continuous system is discretized once per (system, dt) with a zero-order hold,
+# using the matrix exponential of the augmented [[A, B], [0, 0]] matrix. Responses
+# are then either propagated with the Phi/Gamma recurrence or, for commands that only
+# change at a few switch times (step, bang-bang, bang-coast-bang), built directly by
+# superposing the cached discrete step response at each switch.
+#
+# Usage:
+#   from discrete_sim import zoh_response
+#   [T,yout,xout] = zoh_response(sys,t,F)     # F held constant between samples
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import numpy as np
+from scipy.linalg import expm
+
+# Inputs with fewer changes than this fraction of the samples are simulated by
+# superposing step responses rather than stepping through the recurrence
+SPARSE_INPUT_FRACTION = 0.05
+
+# Caches of the ZOH discretizations and step-response tables, keyed by system and dt
+_zoh_cache = {}
+_table_cache = {}
+
+
+def state_space(sys):
+    """
+    Returns the (A, B, C, D) matrices of sys as 2D float arrays.
+
+    Arguments:
+        sys :  a control.ss or control.tf system, or an (A, B, C, D) tuple
+    """
+    if isinstance(sys, (tuple, list)):
+        A, B, C, D = sys
+    else:
+        if not hasattr(sys, 'A'):
+            import control
+            sys = control.tf2ss(sys)
+        A, B, C, D = sys.A, sys.B, sys.C, sys.D
+
+    A = np.atleast_2d(np.asarray(A, dtype=float))
+    B = np.asarray(B, dtype=float).reshape(A.shape[0], -1)
+    C = np.asarray(C, dtype=float).reshape(-1, A.shape[0])
+    D = np.asarray(D, dtype=float).reshape(C.shape[0], B.shape[1])
+
+    return A, B, C, D
+
+
+def _key(A, B, dt):
+    return (A.shape, A.tobytes(), B.shape, B.tobytes(), float(dt))
+
+
+def expm_aug(A, B, tau):
+    """
+    Returns Phi(tau) = e^(A*tau) and Gamma(tau) = integral_0^tau e^(A*s) ds B for
+    an array of durations tau, via the matrix exponential of the augmented matrix.
+
+    Arguments:
+        A, B :  state and input matrices
+        tau :  scalar or array of durations (s)
+
+    Returns:
+        Phi, Gamma :  arrays of shape tau.shape + (n, n) and tau.shape + (n, m)
+    """
+    n, m = B.shape
+    tau = np.asarray(tau, dtype=float)
+
+    M = np.zeros((n + m, n + m))
+    M[:n, :n] = A
+    M[:n, n:] = B
+
+    E = expm(tau[..., np.newaxis, np.newaxis] * M)
+
+    return E[..., :n, :n], E[..., :n, n:]
+
+
+def c2d_zoh(sys, dt):
+    """
+    Zero-order-hold discretization of sys, cached on (system, dt).
+
+    Returns:
+        Phi, Gamma :  so that x[k+1] = Phi x[k] + Gamma u[k]
+    """
+    A, B, C, D = state_space(sys)
+    key = _key(A, B, dt)
+
+    if key not in _zoh_cache:
+        _zoh_cache[key] = expm_aug(A, B, dt)
+
+    return _zoh_cache[key]
+
+
+def step_tables(sys, dt, num_samples):
+    """
+    Returns the cached discrete free- and step-response tables of sys:
+        Phi_n[k] = Phi^k                (num_samples, n, n)
+        S[k] = sum_{j<k} Phi^j Gamma    (num_samples, n, m)
+
+    S[k] is the state k samples after a unit step is applied, so any
+    piecewise-constant response is a sum of shifted, scaled copies of it. The
+    tables are built once per (system, dt) and extended when a longer one is needed.
+    """
+    A, B, C, D = state_space(sys)
+    key = _key(A, B, dt)
+
+    if key in _table_cache and len(_table_cache[key][0]) >= num_samples:
+        Phi_n, S = _table_cache[key]
+        return Phi_n[:num_samples], S[:num_samples]
+
+    Phi, Gamma = c2d_zoh((A, B, C, D), dt)
+    n, m = Gamma.shape
+
+    Phi_n = np.empty((num_samples, n, n))
+    S = np.empty((num_samples, n, m))
+    Phi_n[0] = np.eye(n)
+    S[0] = 0.
+
+    for ii in range(1, num_samples):
+        Phi_n[ii] = np.dot(Phi, Phi_n[ii-1])
+        S[ii] = S[ii-1] + np.dot(Phi_n[ii-1], Gamma)
+
+    _table_cache[key] = (Phi_n, S)
+
+    return Phi_n, S
+
+
+def _outputs(C, D, xout, U, squeeze):
+    yout = np.dot(C, xout) + np.dot(D, U)
+    if squeeze and yout.shape[0] == 1:
+        yout = yout[0]
+    return yout
+
+
+def zoh_response(sys, t, U, x0=None, squeeze=True):
+    """
+    Response of sys to the sampled input U held constant between samples.
+
+    Each U[k] is applied from t[k] until t[k+1] (a zero-order hold), and the result
+    is exact at the samples for that input, so no step-size tuning (hmax) is needed.
+    control.forced_response instead interpolates linearly between the samples, so
+    there a step in U ramps in over the sample before it, and the two responses
+    differ by up to about half a sample of the step response.
+    Inputs that only change at a few samples are built from the cached
+    step-response table; others use the Phi/Gamma recurrence.
+
+    Arguments:
+        sys :  system (see state_space)
+        t :  uniformly spaced time vector
+        U :  input array, shape (len(t),) or (m, len(t))
+        x0 :  initial state (default zeros)
+        squeeze :  return a 1D output array for single-output systems
+
+    Returns:
+        T :  the time vector t
+        yout :  outputs, shape (len(t),) for one output or (p, len(t))
+        xout :  states, shape (n, len(t))
+    """
+    A, B, C, D = state_space(sys)
+    n, m = B.shape
+
+    t = np.asarray(t, dtype=float)
+    U = np.asarray(U, dtype=float).reshape(m, -1)
+    num_samples = len(t)
+    dt = t[1] - t[0]
+
+    if x0 is None:
+        x0 = np.zeros(n)
+    x0 = np.asarray(x0, dtype=float).reshape(n)
+
+    # Sample indices where the held input changes
+    dU = np.diff(U, axis=1, prepend=0.)
+    switches = np.nonzero(np.any(dU != 0, axis=0))[0]
+
+    if len(switches) <= SPARSE_INPUT_FRACTION * num_samples:
+        Phi_n, S = step_tables((A, B, C, D), dt, num_samples)
+
+        xout = np.dot(Phi_n, x0).T
+        for k in switches:
+            # The step applied at sample k shows up in the state from sample k+1 on
+            xout[:, k+1:] += np.dot(S[1:num_samples-k], dU[:, k]).T
+    else:
+        Phi, Gamma = c2d_zoh((A, B, C, D), dt)
+
+        xout = np.empty((n, num_samples))
+        xout[:, 0] = x0
+        GU = np.dot(Gamma, U)
+        for ii in range(num_samples - 1):
+            xout[:, ii+1] = np.dot(Phi, xout[:, ii]) + GU[:, ii]
+
+    return t, _outputs(C, D, xout, U, squeeze), xout
+
+
+def switched_response(sys, t, switch_times, steps, x0=None, squeeze=True):
+    """
+    Exact response of sys to a command made of steps at arbitrary switch times,
+    such as a bang-bang or bang-coast-bang profile. The switch times do not need
+    to fall on the samples of t.
+
+    For each switch, the state jumps from the switch time to the next sample with
+    one small matrix exponential, then follows the cached step-response table.
+
+    Arguments:
+        sys :  system (see state_space)
+        t :  uniformly spaced time vector
+        switch_times :  times of the input steps (s)
+        steps :  change in the input at each switch time, shape (K,) or (K, m)
+        x0 :  initial state at t[0] (default zeros)
+        squeeze :  return a 1D output array for single-output systems
+
+    Returns:
+        T, yout, xout :  as for zoh_response
+    """
+    A, B, C, D = state_space(sys)
+    n, m = B.shape
+
+    t = np.asarray(t, dtype=float)
+    num_samples = len(t)
+    dt = t[1] - t[0]
+
+    switch_times = np.atleast_1d(np.asarray(switch_times, dtype=float))
+    steps = np.asarray(steps, dtype=float).reshape(len(switch_times), m)
+
+    if x0 is None:
+        x0 = np.zeros(n)
+    x0 = np.asarray(x0, dtype=float).reshape(n)
+
+    Phi_n, S = step_tables((A, B, C, D), dt, num_samples)
+
+    # First sample at or after each switch, and the time from the switch to it
+    first = np.ceil((switch_times - t[0]) / dt - 1e-9).astype(int)
+    first = np.clip(first, 0, num_samples)
+    delta = t[0] + first * dt - switch_times
+    Phi_d, Gamma_d = expm_aug(A, B, np.maximum(delta, 0.))
+
+    xout = np.dot(Phi_n, x0).T
+    U = np.zeros((m, num_samples))
+
+    for k, Pd, Gd, du in zip(first, Phi_d, Gamma_d, steps):
+        if k >= num_samples:
+            continue
+        # Gamma(j*dt + delta) = Gamma(delta) + Phi(delta) S[j]
+        x_step = np.dot(Gd, du) + np.dot(np.dot(S[:num_samples-k], du), Pd.T)
+        xout[:, k:] += x_step.T
+        U[:, k:] += du[:, np.newaxis]
+
+    return t, _outputs(C, D, xout, U, squeeze), xout
@@ -11,7 +11,11 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - shape with the in-repo InputShaping module and simulate the shaped command
+#         with discrete_sim.zoh_response
+#       - simulate the step and ramp inputs with zoh_response too, as forced_response
+#         returns only (T, yout) in python-control 0.10
 #
 ##########################################################################################
 
@@ -31,6 +35,7 @@ from numpy import *             # Grab all of the NumPy functions
 from matplotlib.pyplot import * # Grab MATLAB plotting functions
 import control                  # import the control system functions
 from InputShaping import *      # import the input shaping toolbox
+from discrete_sim import zoh_response    # exact ZOH simulation of sampled inputs
 
 # Uncomment to use LaTeX to process the text in figure
 # from matplotlib import rc
@@ -57,8 +62,8 @@ t = r_[0:5:0.001]            # time for simulation, 0-5s with 500 points in-betw
 U = zeros(5000)  # Define an array of all zeros
 U[500:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 
-# run the simulation - utilize the built-in initial condition response function
-[T_un,yout_un,xout_un] = control.forced_response(sys,t,U)
+# run the simulation - exact for the input held constant between samples
+[T_un,yout_un,xout_un] = zoh_response(sys,t,U)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -102,8 +107,8 @@ Uramp = zeros(5000)  # Define an array of all zeros
 Uramp[500:1999] = 2./3*t[0:1499]
 Uramp[1999:] = 1      # Make all elements of this array index>2000 = 1 (all after 2.0s)
 
-# run the simulation - utilize the built-in initial condition response function
-[T_ramp,yout_ramp,xout_ramp] = control.forced_response(sys,t,Uramp)
+# run the simulation - exact for the input held constant between samples
+[T_ramp,yout_ramp,xout_ramp] = zoh_response(sys,t,Uramp)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -148,8 +153,8 @@ setp(ltext,family='CMU Serif',fontsize=16)
 # Create the shaped command
 [t_shap,U_shaped] = conv(transpose(U),shaper,0.001);
 
-# run the simulation - utilize the built-in initial condition response function
-[T_shaped,yout_shap,xout_shap] = control.forced_response(sys,t_shap,U_shaped,hmax=0.01)
+# run the simulation - exact for the input held constant between samples
+[T_shaped,yout_shap,xout_shap] = zoh_response(sys,t_shap,U_shaped)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -0,0 +1,252 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# shaper_design.py
+#
+# Residual vibration sensitivity curves and robust input shaper design
+#
+# The percentage residual vibration of a shaper [Ti Ai] on a mode with natural frequency
+# w and damping ratio zeta, relative to an unshaped impulse, is
+#
+#   V = 100 * | sum_j Aj exp((zeta*w + i*wd)*(Tj - Tn)) |
+#
+# vibration() evaluates that sum for any number of shapers over a whole frequency/damping
+# grid as one broadcast complex exponential. robust_shaper() uses it to find the shortest
+# positive shaper that keeps the vibration below a tolerance over a band of frequencies
+# around the modeled one, rather than only at it, as ZV does.
+#
+# Usage:
+#   curve = sensitivity_curve(shaper, freqs, zeta)
+#   [shaper, exactshaper] = robust_shaper(freq, zeta, Vtol=5., insensitivity=0.4,
+#                                         dt=0.001)
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import numpy as np
+from scipy.optimize import linprog
+
+# Limits on the shapers robust_shaper() searches - the longest duration, in periods of
+# vibration, and the spacing of the possible impulse times when no sample time is given
+MAX_PERIODS = 3
+GRID_POINTS_PER_PERIOD = 100
+
+# Number of sides of the polygon approximating the vibration bound in robust_shaper()
+NUM_SIDES = 16
+
+# Cache of the sensitivity curves, keyed by shaper and frequency/damping grid
+_sensitivity_cache = {}
+
+
+def stack_shapers(shapers):
+    """
+    Stacks shapers with different numbers of impulses into one (S, N, 2) array,
+    padding the shorter ones with zero-amplitude impulses at time zero.
+    """
+    shapers = [np.asarray(shaper, dtype=float) for shaper in shapers]
+    num_impulses = max(len(shaper) for shaper in shapers)
+
+    stacked = np.zeros((len(shapers), num_impulses, 2))
+    for ii, shaper in enumerate(shapers):
+        stacked[ii, num_impulses - len(shaper):] = shaper
+
+    return stacked
+
+
+def vibration(shaper, freqs, zeta=0.):
+    """
+    Percentage residual vibration of shapers over a grid of modes.
+
+    Arguments:
+        shaper :  shaper of the form [Ti Ai], or an (..., N, 2) array of shapers
+                  (see stack_shapers)
+        freqs :  natural frequencies (Hz)
+        zeta :  damping ratios, broadcast against freqs
+
+    Returns:
+        V :  array of shape shaper.shape[:-2] + broadcast(freqs, zeta).shape
+    """
+    shaper = np.asarray(shaper, dtype=float)
+    freqs, zeta = np.broadcast_arrays(np.asarray(freqs, dtype=float),
+                                      np.asarray(zeta, dtype=float))
+
+    batch_shape = shaper.shape[:-2]
+    grid_shape = freqs.shape
+    times = shaper[..., 0]
+    amps = shaper[..., 1]
+
+    # Time of each impulse relative to the last, lined up against the grid
+    relative = times - np.max(times, axis=-1, keepdims=True)
+    expand = batch_shape + (1,) * len(grid_shape) + times.shape[-1:]
+    relative = relative.reshape(expand)
+    amps = amps.reshape(expand)
+
+    w = 2 * np.pi * freqs
+    s = (zeta * w + 1j * w * np.sqrt(1 - zeta**2))[..., np.newaxis]
+
+    return 100. * np.abs(np.sum(amps * np.exp(s * relative), axis=-1))
+
+
+def sensitivity_curve(shaper, freqs, zeta=0.):
+    """
+    Cached vibration() of one shaper over a grid. The returned array is read-only,
+    since it is shared with later calls for the same shaper and grid.
+    """
+    shaper = np.ascontiguousarray(shaper, dtype=float)
+    freqs, zeta = [np.ascontiguousarray(x, dtype=float) for x in
+                   np.broadcast_arrays(np.asarray(freqs, dtype=float),
+                                       np.asarray(zeta, dtype=float))]
+
+    key = (shaper.shape, shaper.tobytes(), freqs.shape, freqs.tobytes(),
+           zeta.shape, zeta.tobytes())
+    if key not in _sensitivity_cache:
+        curve = vibration(shaper, freqs, zeta)
+        curve.setflags(write=False)
+        _sensitivity_cache[key] = curve
+
+    return _sensitivity_cache[key]
+
+
+def insensitivity(shaper, freq, zeta=0., Vtol=5., num_points=2001):
+    """
+    Total width of the frequencies between 0 and 2*freq at which the vibration of
+    shaper is at or below Vtol percent, normalized by freq. This counts both lobes
+    of shapers like EI, which allow Vtol at freq itself.
+    """
+    ratios = np.linspace(0., 2., num_points)
+    curve = sensitivity_curve(shaper, freq * ratios, zeta)
+
+    return np.count_nonzero(curve <= Vtol) * (ratios[1] - ratios[0])
+
+
+def _min_vibration(times, band, zeta):
+    """
+    Smallest worst-case vibration (fraction) over band of any positive shaper with
+    impulses at times, and the amplitudes that reach it.
+
+    For fixed impulse times the residual vibration is the magnitude of a sum that is
+    linear in the amplitudes. Bounding its projection on NUM_SIDES directions bounds
+    the magnitude, so the amplitudes come from a linear program. Raises ValueError
+    if it can't be solved.
+    """
+    w = 2 * np.pi * band
+    s = zeta * w + 1j * w * np.sqrt(1 - zeta**2)
+    terms = np.exp(s[:, np.newaxis] * (times - times[-1]))          # (band, impulses)
+
+    angles = 2 * np.pi * np.arange(NUM_SIDES) / NUM_SIDES
+    projections = np.real(terms[np.newaxis] * np.exp(-1j * angles)[:, np.newaxis, np.newaxis])
+    projections = projections.reshape(-1, len(times))
+
+    # Variables are the amplitudes and the vibration bound r - minimize r
+    num_impulses = len(times)
+    cost = np.r_[np.zeros(num_impulses), 1.]
+    A_ub = np.column_stack((projections, -np.ones(len(projections))))
+    A_eq = np.r_[np.ones(num_impulses), 0.][np.newaxis]
+
+    result = linprog(cost, A_ub=A_ub, b_ub=np.zeros(len(projections)), A_eq=A_eq,
+                     b_eq=[1.], bounds=[(0., None)] * num_impulses + [(None, None)],
+                     method='highs')
+    if not result.success:
+        raise ValueError(result.message)
+
+    # The polygon is inside the circle, so the true magnitude can be a little larger
+    return result.x[-1] / np.cos(np.pi / NUM_SIDES), result.x[:num_impulses]
+
+
+def robust_shaper(freq, zeta=0., Vtol=5., insensitivity=0.4, num_points=41, dt=None):
+    """
+    Shortest positive shaper that keeps the residual vibration below Vtol over the
+    frequency band freq*(1 +/- insensitivity/2).
+
+    The impulses are restricted to a grid of times - the sample times if dt is given.
+    For a trial duration, the amplitudes that minimize the worst vibration over the
+    band are a linear program, and the shortest duration meeting Vtol is found by
+    bisection on the number of grid points.
+
+    Arguments:
+        freq :  modeled natural frequency (Hz)
+        zeta :  damping ratio
+        Vtol :  allowable residual vibration (%)
+        insensitivity :  width of the band, normalized by freq
+        num_points :  number of frequencies the band is checked at
+        dt :  sample time to digitize the shaper to (s)
+
+    Returns:
+        [shaper, exactshaper] :  the same shaper twice, since its impulses are
+                                 already on the grid
+    """
+    band = freq * np.linspace(1 - insensitivity / 2, 1 + insensitivity / 2, num_points)
+    period = 1. / freq
+
+    spacing = dt if dt else period / GRID_POINTS_PER_PERIOD
+    grid = np.arange(int(np.ceil(MAX_PERIODS * period / spacing)) + 1) * spacing
+
+    def solve(num):
+        try:
+            worst, amps = _min_vibration(grid[:num], band, zeta)
+        except ValueError as error:
+            raise ValueError('No shaper could be designed for freq = %g Hz, zeta = %g, '
+                             'Vtol = %g%%, insensitivity = %g: %s' %
+                             (freq, zeta, Vtol, insensitivity, error))
+        return worst <= Vtol / 100., amps
+
+    feasible, amps = solve(len(grid))
+    if not feasible:
+        raise ValueError('No shaper up to %g periods long keeps the vibration below %g%% '
+                         'over a %g insensitivity' % (MAX_PERIODS, Vtol, insensitivity))
+
+    # Bisect for the fewest grid points - low is infeasible, high is feasible
+    low, high = 1, len(grid)
+    while high - low > 1:
+        mid = (low + high) // 2
+        mid_feasible, mid_amps = solve(mid)
+        if mid_feasible:
+            high, amps = mid, mid_amps
+        else:
+            low = mid
+
+    keep = amps > 1e-9
+    exactshaper = np.column_stack((grid[:high][keep], amps[keep] / np.sum(amps[keep])))
+
+    return exactshaper, exactshaper
+
+
+if __name__ == "__main__":
+    import time
+    from InputShaping import ZV, ZVD, EI
+
+    # The 1Hz system of mass_spring_step_Shaped.py
+    freq = 1.
+    zeta = 0.
+
+    shapers = {'ZV': ZV(freq, zeta)[1], 'ZVD': ZVD(freq, zeta)[1],
+               'EI': EI(freq, zeta, 0.05)[1]}
+    for name, shaper in sorted(shapers.items()):
+        print('%-4s duration = %5.3fs   5%% insensitivity = %5.3f' %
+              (name, shaper[-1, 0], insensitivity(shaper, freq, zeta)))
+
+    # Many candidate shapers over a frequency/damping grid in one call
+    rng = np.random.RandomState(0)
+    amps = rng.dirichlet(np.ones(3), 10000)
+    times = np.sort(rng.uniform(0., 1.5, (10000, 3)), axis=1)
+    times[:, 0] = 0.
+    candidates = np.stack((times, amps), axis=-1)
+    freqs, zetas = np.meshgrid(np.linspace(0.5, 1.5, 101), [0., 0.05, 0.1])
+
+    start = time.time()
+    V = vibration(candidates, freqs, zetas)
+    print('%d shapers on a %dx%d grid in %.2fs' %
+          ((len(candidates),) + freqs.shape + (time.time() - start,)))
+
+    for width in (0.2, 0.4, 0.6, 0.8):
+        [shaper, exactshaper] = robust_shaper(freq, zeta, Vtol=5., insensitivity=width)
+        print('%3.1f insensitivity: %d impulses, duration = %5.3fs, max vibration = %4.2f%%' %
+              (width, len(exactshaper), exactshaper[-1, 0],
+               np.max(vibration(exactshaper, freq * np.linspace(1 - width / 2, 1 + width / 2,
+                                                                  201), zeta))))
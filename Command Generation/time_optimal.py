@@ -0,0 +1,196 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# time_optimal.py
+#
+# Time-optimal rest-to-rest force commands for the two-mass system of
+# bangbang_flexible.py
+#
+#             +---> X1        +---> X2
+#             |               |
+#          +-----+         +-----+
+#          |     |         |     |
+#  F=====> |  M1 +--/\/\/--+  M2 |
+#          |     |         |     |
+#          +-----+         +-----+
+#
+# With |F| <= fmax, the time-optimal move of duration T is bang-bang with three switches,
+# symmetric about T/2, so the force steps by fmax*[1, -2, 2, -2, 1] at the times
+# [0, T/2-delta, T/2, T/2+delta, T]. Stopping the vibration of the flexible mode, with
+# frequency w = sqrt(k(m1+m2)/(m1 m2)), and moving the center of mass the distance give
+#
+#   cos(w delta) = cos(w T/4)^2
+#   distance = fmax/(4(m1+m2)) * (T^2 - 8 delta^2)
+#
+# The first gives delta for any T, and the shortest T satisfying the second is found with
+# brentq. Solutions are cached by (k, m1, m2, fmax, distance), so repeated moves, or a
+# table precomputed with solve_table(), are dictionary lookups.
+#
+# Usage:
+#   profile = time_optimal_profile(sys, fmax, distance, StartTime)
+#   F = profile(t)                       # force at any sample times
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import numpy as np
+from scipy.optimize import brentq
+
+from command_profiles import CommandProfile
+from discrete_sim import state_space
+
+# Number of intervals the search for the shortest move time is bracketed over
+BRACKET_POINTS = 256
+
+# Cache of the solutions, keyed by (k, m1, m2, fmax, distance)
+_solution_cache = {}
+
+
+def two_mass_parameters(sys):
+    """
+    Returns (m1, m2, k) from the state-space model of bangbang_flexible.py, with
+    states [x1, x1_dot, x2, x2_dot] and the force acting on m1.
+
+    Arguments:
+        sys :  system (see discrete_sim.state_space)
+    """
+    A, B, C, D = state_space(sys)
+
+    m1 = 1. / B[1, 0]
+    k = -A[1, 0] * m1
+    m2 = k / A[3, 0]
+
+    return m1, m2, k
+
+
+def _delta(T, w):
+    """ Half-width of the middle of the command that cancels the vibration """
+    return np.arccos(np.cos(w * T / 4)**2) / w
+
+
+def _move_time(m1, m2, k, fmax, distance):
+    """ Shortest duration T of a vibration-free move of distance """
+    M = m1 + m2
+    w = np.sqrt(k * M / (m1 * m2))
+
+    def residual(T):
+        return fmax / (4 * M) * (T**2 - 8 * _delta(T, w)**2) - distance
+
+    # delta <= pi/w, so the move is complete by this time
+    T_max = np.sqrt(4 * M * distance / fmax + 8 * np.pi**2 / w**2)
+    T = np.linspace(0., T_max, BRACKET_POINTS + 1)
+    above = residual(T) >= 0
+    first = np.argmax(above)
+
+    if first == 0:
+        return 0.
+    return brentq(residual, T[first - 1], T[first], xtol=1e-12)
+
+
+def solve(m1, m2, k, fmax, distance):
+    """
+    Returns the time-optimal switch times and force steps of a move starting at t=0.
+
+    Arguments:
+        m1, m2, k :  masses and spring constant
+        fmax :  maximum actuator force (assumed symmetric)
+        distance :  move distance, negative to move backwards
+
+    Returns:
+        times, steps :  arrays of the 5 switch times and the force steps at them
+    """
+    key = (float(k), float(m1), float(m2), float(fmax), float(distance))
+
+    if key not in _solution_cache:
+        M = m1 + m2
+        w = np.sqrt(k * M / (m1 * m2))
+
+        T = _move_time(m1, m2, k, fmax, abs(distance))
+        delta = _delta(T, w)
+
+        times = np.array([0., T / 2 - delta, T / 2, T / 2 + delta, T])
+        steps = np.sign(distance) * fmax * np.array([1., -2., 2., -2., 1.])
+
+        times.setflags(write=False)
+        steps.setflags(write=False)
+        _solution_cache[key] = (times, steps)
+
+    return _solution_cache[key]
+
+
+def solve_table(m1, m2, k, fmax, distance):
+    """
+    Solves (and caches) the moves for every combination of the broadcast
+    arguments, so that later calls to solve() or time_optimal_profile() are
+    lookups.
+
+    Returns:
+        move_time :  array of the move durations, with the broadcast shape
+    """
+    m1, m2, k, fmax, distance = np.broadcast_arrays(m1, m2, k, fmax, distance)
+    move_time = np.empty(m1.shape)
+
+    for index in np.ndindex(m1.shape):
+        times, steps = solve(m1[index], m2[index], k[index], fmax[index], distance[index])
+        move_time[index] = times[-1]
+
+    return move_time
+
+
+def time_optimal_profile(sys, fmax, distance, StartTime=0.):
+    """
+    Time-optimal rest-to-rest force command for a two-mass system.
+
+    Arguments:
+        sys :  state-space model of the two-mass system, or an (m1, m2, k) tuple
+        fmax :  maximum actuator force (assumed symmetric)
+        distance :  move distance (m)
+        StartTime :  time at which the move starts (s)
+
+    Returns:
+        CommandProfile of the force
+    """
+    if isinstance(sys, tuple) and len(sys) == 3:
+        m1, m2, k = sys
+    else:
+        m1, m2, k = two_mass_parameters(sys)
+
+    times, steps = solve(m1, m2, k, fmax, distance)
+
+    return CommandProfile(times + StartTime, steps)
+
+
+if __name__ == "__main__":
+    import time
+
+    # The system of bangbang_flexible.py
+    k = 10.             # spring constant (N/m)
+    m1 = 1.             # first mass (kg)
+    m2 = 1.             # second mass (kg)
+    fmax = 1.           # maximum actuator force (N)
+
+    profile = time_optimal_profile((m1, m2, k), fmax, 1., 0.5)
+    print('1m move: switch times = %s' % np.array2string(profile.breakpoints, precision=4))
+    print('Rigid-body bang-bang takes %.4fs, time-optimal takes %.4fs' %
+          (2 * np.sqrt((m1 + m2) / fmax), profile.end_time - 0.5))
+
+    # Precompute a table of moves, then time the lookups
+    distances = np.linspace(0.1, 2., 20)
+    springs = np.linspace(5., 20., 16)
+    start = time.time()
+    solve_table(m1, m2, springs[:, np.newaxis], fmax, distances)
+    print('Solved %d moves in %.3fs' % (distances.size * springs.size, time.time() - start))
+
+    start = time.time()
+    for kk in springs:
+        for distance in distances:
+            solve(m1, m2, kk, fmax, distance)
+    elapsed = time.time() - start
+    print('Cached lookup takes %.1f microseconds' %
+          (1e6 * elapsed / (distances.size * springs.size)))
@@ -3,90 +3,52 @@
 from numpy import *    
 import scipy
 from matplotlib.pyplot import * # Grab MATLAB plotting functions
-from scipy.integrate import odeint
+from command_profiles import CommandProfile, bcb_switch_times, odeint_piecewise
 
 
-def accel_input(Amax,Vmax,Distance,StartTime,CurrTime,Shaper):
-# Original MATLAB/Octave premable
-###########################################################################
-# function [accel] = accel_input(Amax,Vmax,Distance,CurrTime,Shaper)
-#
-# Function returns acceleration at a given timestep based on user input
-#
-# Amax = maximum accel, assumed to besymmetric +/-
-# Vmax = maximum velocity, assumed to be symmetric in +/-
-# Distance = desired travel distance 
-# StartTime = Time command should begin
-# CurrTime = current time 
-# Shaper = array of the form [Ti Ai] - matches output format of shaper functions
-#           in toolbox
-#          * If no Shaper input is given, then unshaped in run
-#          * If Shaper is empty, then unshaped is run
-#
-#
-# Assumptions:
-#   * +/- maximums are of same amplitude
-#   * command will begin at StartTime (default = 0)
-#   * rest-to-rest bang-coast-bang move (before shaping)
-#
-# Created: 9/23/11 - Joshua Vaughan - vaughanje@gatech.edu
-#
-# Modified: 
-#   10/11/11
-#       * Added hard-coded shaping option - JEV (vaughanje@gatech.edu)
-#       * embedded into shaped_jumping.m for use there
-#
-###########################################################################
-#
-# Converted to Python on 3/3/13 by Joshua Vaughan (joshua.vaughan@louisiana.edu)
-
-    # These are the times for a bang-coast-bang input 
-    t1 = StartTime
-    t2 = (Vmax/Amax) + t1
-    t3 = (Distance/Vmax) + t1
-    t4 = (t2 + t3)-t1
-    end_time = t4
-
-    if len(Shaper) == 0:
-    # if nargin == 5 || not Shaper:
-        # If no shaper is input, create an unshaped command
-        if t3 <= t2: # command should be bang-bang, not bang-coast-bang
-            t2 = sqrt(Distance/Amax)+t1
-            t3 = 2*sqrt(Distance/Amax)+t1
-            end_time = t3
-        
-            accel = Amax*(CurrTime > t1) - 2*Amax*(CurrTime > t2) + Amax*(CurrTime > t3)
-    
-        else: # command is bang-coast-bang
-            accel = Amax*(CurrTime > t1) - Amax*(CurrTime > t2) - Amax*(CurrTime > t3) + Amax*(CurrTime > t4)
-
-
-    else: # create a shaped command
-        ts = zeros((9,1))
-        A = zeros((9,1))
-        #   Parse Shaper parameters
-        for ii in range(len(Shaper)):
-            ts[ii] = Shaper[ii,0]  # Shaper impulse times
-            A[ii] = Shaper[ii,1]  # Shaper impulse amplitudes
-#       print A
-#       print ts
-
-        #     if len(Shaper) > 9:
-        #         error('Error: As of 10/11/11, accel_input.m only works for shapers of less than 9 impulses.')
-
-        # Hard-coded for now
-        # TODO: be smarter about constructing the total input - JEV - 10/11/11
-        accel = (A[0]*(Amax*(CurrTime > (t1+ts[0])) - Amax*(CurrTime > (t2+ts[0])) - Amax*(CurrTime > (t3+ts[0])) + Amax*(CurrTime > (t4+ts[0])))
-        +   A[1]*(Amax*(CurrTime > (t1+ts[1])) - Amax*(CurrTime > (t2+ts[1])) - Amax*(CurrTime > (t3+ts[1])) + Amax*(CurrTime > (t4+ts[1])))
-        +   A[2]*(Amax*(CurrTime > (t1+ts[2])) - Amax*(CurrTime > (t2+ts[2])) - Amax*(CurrTime > (t3+ts[2])) + Amax*(CurrTime > (t4+ts[2])))
-        +   A[3]*(Amax*(CurrTime > (t1+ts[3])) - Amax*(CurrTime > (t2+ts[3])) - Amax*(CurrTime > (t3+ts[3])) + Amax*(CurrTime > (t4+ts[3])))
-        +   A[4]*(Amax*(CurrTime > (t1+ts[4])) - Amax*(CurrTime > (t2+ts[4])) - Amax*(CurrTime > (t3+ts[4])) + Amax*(CurrTime > (t4+ts[4])))
-        +   A[5]*(Amax*(CurrTime > (t1+ts[5])) - Amax*(CurrTime > (t2+ts[5])) - Amax*(CurrTime > (t3+ts[5])) + Amax*(CurrTime > (t4+ts[5])))
-        +   A[6]*(Amax*(CurrTime > (t1+ts[6])) - Amax*(CurrTime > (t2+ts[6])) - Amax*(CurrTime > (t3+ts[6])) + Amax*(CurrTime > (t4+ts[6])))
-        +   A[7]*(Amax*(CurrTime > (t1+ts[7])) - Amax*(CurrTime > (t2+ts[7])) - Amax*(CurrTime > (t3+ts[7])) + Amax*(CurrTime > (t4+ts[7])))
-        +   A[8]*(Amax*(CurrTime > (t1+ts[8])) - Amax*(CurrTime > (t2+ts[8])) - Amax*(CurrTime > (t3+ts[8])) + Amax*(CurrTime > (t4+ts[8]))))
-
-    return accel
+def vib_amp_batch(m1,m2,k,Amax,Vmax,Distance,StartTime,Shaper=[]):
+    """
+    Residual vibration amplitude (peak-to-peak of x2) of the two-mass system
+    after a rest-to-rest move, for a whole grid of moves in one vectorized pass.
+
+    The plant is linear and the command is a sum of force steps, so the 
+    response of the stacked system is the superposition of step responses. 
+    After the move ends, the rigid-body motion is at rest and only the 
+    flexible mode rings, with amplitude set by the sum of the steps as phasors
+    at the flexible frequency.
+
+    Arguments:
+        m1, m2, k :  masses and spring constant of the plant
+        Amax, Vmax, Distance, StartTime :  command parameters, as in 
+                        bcb_switch_times. These broadcast against each other,
+                        so any of them can be a grid.
+        Shaper :  array of the form [Ti Ai], or empty for unshaped commands
+
+    Returns:
+        vib_amp :  peak-to-peak residual vibration of x2, with the broadcast 
+                   shape of the command parameters
+    """
+    M = m1 + m2
+    w = sqrt(k*M/(m1*m2))    # flexible mode natural frequency (rad/s)
+
+    # Like CommandProfile.bang_coast_bang, only unshaped moves switch to bang-bang
+    times, steps = bcb_switch_times(Amax,Vmax,Distance,StartTime,
+                                    bang_bang=(len(Shaper) == 0))
+
+    if len(Shaper) > 0:
+        # Convolve each step with each shaper impulse
+        Shaper = asarray(Shaper, dtype=float)
+        times = (times[...,:,newaxis] + Shaper[:,0]).reshape(times.shape[:-1] + (-1,))
+        steps = (steps[...,:,newaxis] * Shaper[:,1]).reshape(steps.shape[:-1] + (-1,))
+
+    # The flexible-mode part of x2 is m1/M of the relative motion x2-x1, and the
+    # relative motion from each step of force a at time tau is 
+    # -a/(m1*w^2)*(1 - cos(w*(t-tau))). The constant parts cancel for a
+    # rest-to-rest move, leaving a single sinusoid.
+    phasor = sum(steps * exp(-1j*w*times), axis=-1)
+
+    return 2*abs(phasor)/(M*w**2)
+
 
 def vectorfield(w, t, p):
     """
@@ -97,14 +59,15 @@ def vectorfield(w, t, p):
                   w = [x1,y1,x2,y2]
         t :  time
         p :  vector of the parameters:
-                  p = [m1,m2,k1,k2,L1,L2,b1,b2]
+                  p = [m1,m2,k,profile]
+             where profile is the CommandProfile of the force input
     """
     x1, y1, x2, y2 = w
-    m1, m2, k, Amax, Vmax, StartTime, Distance, Shaper = p
+    m1, m2, k, profile = p
 
     # Create f = (x1',y1',x2',y2'):
     f = [y1,
-         (k * (x2 - x1) + accel_input(Amax,Vmax,Distance,StartTime,t,Shaper)) / m1,
+         (k * (x2 - x1) + profile(t)) / m1,
          y2,
          (-k * (x2 - x1)) / m2]
     return f
@@ -165,34 +128,33 @@ Dist = r_[1:max_dist:(max_dist/num_samples)]
 
 
 
-vib_amp = zeros(len(Dist))
+# Set to False to integrate each distance with odeint instead of using the
+# vectorized batch sweep
+batch_sweep = True
+
+if batch_sweep:
+    # All of the distances in one pass - Dist, A_max, and V_max can all be grids
+    vib_amp = vib_amp_batch(m1, m2, k, A_max, V_max, Dist, Start, Shaper)
+
+else:
+    vib_amp = zeros(len(Dist))
 
-count = 0
-for ii in range(len(Dist)):
+    for ii in range(len(Dist)):
 
-    # Pack up the parameters and initial conditions:
-    p = [m1, m2, k, A_max, V_max, Start, Dist[ii], Shaper]
-    w0 = [x1, y1, x2, y2]
+        # Build the command once for this move
+        profile = CommandProfile.bang_coast_bang(A_max, V_max, Dist[ii], Start, Shaper)
 
-    # Call the ODE solver.
-    wsol = odeint(vectorfield, w0, t, args=(p,),
-                  atol=abserr, rtol=relerr)
+        # Pack up the parameters and initial conditions:
+        p = [m1, m2, k, profile]
+        w0 = [x1, y1, x2, y2]
+
+        # Call the ODE solver, restarting it at each switch in the command
+        wsol = odeint_piecewise(vectorfield, w0, t, profile.breakpoints, args=(p,),
+                                atol=abserr, rtol=relerr)
+        
+        end_sample = int(profile.end_time*1/0.01)
                   
-    #----- Test closed form solution for bang-bang input
-    t1 = Start
-    t2 = (V_max/A_max) + t1
-    t3 = (Dist[ii]/V_max) + t1
-    t4 = (t2 + t3)-t1
-    end_time = t4
-
-    if t3 < t2: # command should be bang-bang, not bang-coast-bang
-        t2 = sqrt(Dist/A_max)+t1
-        t3 = 2*sqrt(Dist/A_max)+t1
-        end_time = t3
-    
-    end_sample = end_time*1/0.01
-              
-    vib_amp[ii] = max(wsol[end_sample:-1,2])-min(wsol[end_sample:-1,2])
+        vib_amp[ii] = max(wsol[end_sample:-1,2])-min(wsol[end_sample:-1,2])
 
 # 
 #     #  Plot the response#   Many of these setting could also be made default by the .matplotlibrc file
@@ -8,6 +8,16 @@
 #
 # Requires OpenCV
 # 
+# Usage:
+#   python PostColorTrack_MCHE470_Fall2013_cv2.py video [video ...] [options]
+#
+#   python PostColorTrack_MCHE470_Fall2013_cv2.py "Videos/*.mov" --mode sharded
+#   python PostColorTrack_MCHE470_Fall2013_cv2.py test.mov --kalman --text
+#   python PostColorTrack_MCHE470_Fall2013_cv2.py --help
+#
+# Each video is tracked into <video name>.npy (load it with tracking_log.load_log or
+# numpy.load), with the video information in <video name>.json
+#
 # Created: 11/2/13 
 #   - Joshua Vaughan 
 #   - joshua.vaughan@louisiana.edu
@@ -16,144 +26,279 @@
 # Modified:
 #   * 11/4/13 - Joshua Vaughan - joshua.vaughan@louisiana.edu
 #       - hard coded video names due to Tkinter file dialog bug
+#   * 10/18/26
+#       - added the pipelined mode, which decodes in one thread and thresholds the
+#         frames in a pool of worker threads
+#   * 10/18/26
+#       - added the sharded mode, which splits the video into frame ranges tracked
+#         in separate processes
+#   * 10/18/26
+#       - write the data with tracking_log.TrackingLog instead of per-frame text
+#         writes
+#   * 10/18/26
+#       - the parallel modes only process the unmasked part of the frame, and can
+#         use a downscaled first pass and a search window around the last centroid
+#   * 10/18/26
+#       - added the option to threshold with a color lookup table (now --lut)
+#   * 10/18/26
+#       - replaced the file dialog, raw_input pauses, and image display with a
+#         command line that tracks a list (or glob) of videos, with no GUI imports
+#       - merged in Win_PostColorTrack_MCHE470_Fall2013_cv2.py, which was a copy of
+#         this script with the file dialog turned on
+#       - the mask is now a region of interest, so only that part of each frame is
+#         processed in every mode
+#       - videos with the same name in different folders are saved under their
+#         paths, and the output folder is created if it doesn't exist
+#       - prints the frames/s of each video, instead of the progress
+#       - added the --kalman option to filter the centroids and save the velocity
 #
 ########################################################################################## 
- 
-import cv2 as cv2
+
+from __future__ import division, print_function
+
+import argparse
+import os
+import time
+
+import cv2
 import numpy as np
-from time import localtime, strftime, sleep
-from Tkinter import Tk
-from tkFileDialog import askopenfilename
-from matplotlib.pyplot import * # Grab MATLAB plotting functions
- 
-color_tracker_window = "Color Tracker"
-
-filename = strftime("%m_%d_%Y_%H%M%S") #names the output file as the date and time that the program is run
-filepath = filename + ".txt" #gives the path of the file to be opened
-    
-f = open(filepath, "a+") #opens the output file in append mode
-f.write('Time (s), X Position (pixels), Y Position (pixels)' + '\n') 
-
-show_images = 1
-print_images = 0
-
-class ColorTracker:
-    def __init__(self): 
-#         cv2.NamedWindow( color_tracker_window, 1 ) 
-
-#         tk = Tk()
-#         tk.withdraw() # we don't want a full GUI, so keep the root window from appearing
-#         video_filename = askopenfilename(parent=tk) # show an "Open" dialog box and return the path to the selected file
-#         
-#         tk.destroy()
-        
-#         video_filename = '/Users/josh/Desktop/Videos for Lecture/Movie on 11-4-13 at 7.12 PM.mov'
-#         video_filename = '/Users/josh/Desktop/Videos for Lecture/Movie on 11-4-13 at 7.18 PM.mov'
-#         video_filename = '/Users/josh/Desktop/Videos for Lecture/Movie on 11-4-13 at 7.56 PM.mov'
-#         video_filename = '/Users/josh/Desktop/Videos for Lecture/Movie on 11-4-13 at 7.59 PM.mov'
-          
-        self.capture = cv2.VideoCapture(video_filename)
-        
-        
-    def run(self): 
-        initialTime = 0. #sets the initial time
-#         num_Frames = int(  cv2.GetCaptureProperty( self.capture, cv2.CV_CAP_PROP_FRAME_COUNT ) )
-        num_Frames = int(self.capture.get(cv2.cv.CV_CAP_PROP_FRAME_COUNT))
-        fps = self.capture.get(cv2.cv.CV_CAP_PROP_FPS)
-#         fps = cv2.GetCaptureProperty( self.capture, cv2.CV_CAP_PROP_FPS )
-        
-        for ii in range(num_Frames-9):
-        
-            print('Frame: ' + str(ii) + ' of ' + str(num_Frames))
-            # read the ii-th frame
-#             img = cv2.QueryFrame( self.capture )  
-            img = self.capture.read()[1]
-            
-            if show_images:
-                cv2.imshow('Raw Frame',img)
-                raw_input("Press Enter to continue...")
-                
-                if print_images:
-                    savefig('Raw_Frame.png')
-                        
-            
-            # Blur the source image to reduce color noise 
-            # cv2.Smooth(img, img, cv2.CV_BLUR, 10) 
-            img = cv2.blur(img,(10,10))
-            
-            if show_images:
-                cv2.imshow('Blurred',img)
-                raw_input("Press Enter to continue...")
-                
-                if print_images:
-                    savefig('10x10_blur.png')
-
-            
-            # Convert the image to hsv(Hue, Saturation, Value) so its  
-            # It's easier to determine the color to track(hue) 
-            hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV) 
-
-            # Define min and max HSV values to threshold
-            Track_MIN = np.array([0, 0, 245],np.uint8)
-            Track_MAX = np.array([180, 10, 255],np.uint8)
-            
-            # threshold the image
-            thresholded_img = cv2.inRange(hsv_img, Track_MIN, Track_MAX)
-            
-            if show_images:
-                cv2.imshow('Thresholded Image',thresholded_img)
-                raw_input("Press Enter to continue...")
-                
-                if print_images:
-                    savefig('Thresholded_Frame.png')
-            
-            # fill the top with black
-            thresholded_img[0:75,0:720] = 0
-            thresholded_img[0:480,650:720] = 0
-            
-            if show_images:
-#             if ii > 100:
-                cv2.imshow('Thresholded Image',thresholded_img)
-                raw_input("Press Enter to continue...")
-            
-            
-            #determine the objects moments and check that the area is large  
-            #enough to be our object 
-#             thresholded_img2 = cv2.GetMat(thresholded_img)
-            moments = cv2.moments(thresholded_img,0) 
-            area = moments['m00'] 
-            
-            
-            # there can be noise in the video so ignore objects with small areas 
-            if(area > 1500): 
-                #determine the x and y coordinates of the center of the object 
-                #we are tracking by dividing the 1, 0 and 0, 1 moments by the area 
-                x = moments['m10'] / area
-                y = moments['m01'] / area
-
-                elapsedTime = ii/fps
-            
-                f.write(str(elapsedTime) + ',' + '%013.9f' % x + ',' + '%013.9f' % y + "\n") #prints output to the specified output file for later use
-                
-                x = int(x)
-                y = int(y)
-                
-#                 #create an overlay to mark the center of the tracked object 
-#                 overlay = cv2.CreateImage(cv2.GetSize(img), 8, 3) 
-#                 
-#                 cv2.Circle(overlay, (x, y), 2, (255, 255, 255), 20) 
-#                 cv2.Add(img, overlay, img) 
-#                 #add the thresholded image back to the img so we can see what was  
-#                 #left after it was applied 
-#                 cv2.Merge(thresholded_img, None, None, None, img) 
-#              
-#             #display the image  
-#             cv2.ShowImage(color_tracker_window, img) 
-            
-        # close the data file
-        f.close()
-
-                
-if __name__=="__main__": 
-    color_tracker = ColorTracker() 
-    color_tracker.run() 
+
+from centroid_filter import FilteredTracker, filter_centroids
+from color_tracking import (TRACK_MIN, TRACK_MAX, BLUR_SIZE, MIN_AREA, capture_property,
+                            FrameTracker, pipelined_frames, track_video, video_filenames)
+from tracking_log import TrackingLog, save_text
+
+# The part of the Mini-Project 3b videos the object can be in, (x, y, width, height).
+# The original script filled the top 75 rows and the right side from column 650 with
+# black.
+ROI = (0, 75, 650, 405)
+
+# The last frames of the videos can't always be read, so they are skipped
+SKIP_END = 9
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Track a colored object in videos, saving its centroid every frame')
+
+    parser.add_argument('videos', nargs='+',
+                        help='video filenames or glob patterns, like "Videos/*.mov"')
+    parser.add_argument('--output-dir', default='.',
+                        help='folder for the .npy (and .json) files (default: .)')
+    parser.add_argument('--text', action='store_true',
+                        help='also save each log as comma separated values (.txt)')
+
+    parser.add_argument('--mode', choices=('serial', 'pipelined', 'sharded'),
+                        default='serial',
+                        help='serial, pipelined (decode in one thread, threshold in a '
+                             'pool of threads), or sharded (frame ranges in a pool of '
+                             'processes) (default: serial)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='threads or processes of the parallel modes '
+                             '(default: one per CPU)')
+
+    parser.add_argument('--min', type=int, nargs=3, default=TRACK_MIN.tolist(),
+                        metavar=('H', 'S', 'V'), help='lower HSV threshold '
+                        '(default: %(default)s, white)')
+    parser.add_argument('--max', type=int, nargs=3, default=TRACK_MAX.tolist(),
+                        metavar=('H', 'S', 'V'), help='upper HSV threshold '
+                        '(default: %(default)s)')
+    parser.add_argument('--roi', type=int, nargs=4, default=ROI,
+                        metavar=('X', 'Y', 'WIDTH', 'HEIGHT'),
+                        help='region of interest, the rest of the frame is ignored '
+                             '(default: %(default)s)')
+    parser.add_argument('--full-frame', action='store_true',
+                        help='process the whole frame instead of the region of interest')
+    parser.add_argument('--skip-end', type=int, default=SKIP_END,
+                        help='number of frames skipped at the end of each video '
+                             '(default: %(default)s)')
+
+    parser.add_argument('--blur', type=int, default=BLUR_SIZE,
+                        help='size of the box blur, pixels (default: %(default)s)')
+    parser.add_argument('--min-area', type=float, default=MIN_AREA,
+                        help='smallest area (m00) accepted as the object '
+                             '(default: %(default)s)')
+    parser.add_argument('--lut', action='store_true',
+                        help='threshold with a color lookup table instead of '
+                             'blur/cvtColor/inRange')
+    parser.add_argument('--downscale', type=int, default=0,
+                        help='pyramid levels to find the object on first '
+                             '(default: 0, full size)')
+    parser.add_argument('--window', type=int, nargs=2, default=None,
+                        metavar=('WIDTH', 'HEIGHT'),
+                        help='search only a window around the last centroid '
+                             '(serial and sharded modes)')
+    parser.add_argument('--kalman', action='store_true',
+                        help='Kalman filter the centroids, fill short dropouts, and '
+                             'save the velocity. In serial mode, the filter also '
+                             'places the search window.')
+
+    return parser.parse_args(argv)
+
+
+def tracker_options(args):
+    """ Keyword arguments for color_tracking.FrameTracker """
+    return {'Track_MIN': np.array(args.min, np.uint8),
+            'Track_MAX': np.array(args.max, np.uint8),
+            'roi': None if args.full_frame else tuple(args.roi),
+            'downscale': args.downscale,
+            'blur_size': args.blur,
+            'min_area': args.min_area,
+            'use_lut': args.lut}
+
+
+def track(video_filename, args):
+    """
+    Tracks one video.
+
+    Returns:
+        (frame, x, y, vx, vy) arrays for the frames up to the last args.skip_end,
+        with NaN x and y where the object wasn't found. The velocity is NaN without
+        args.kalman.
+    """
+    capture = cv2.VideoCapture(video_filename)
+    num_Frames = max(int(capture_property(capture, 'FRAME_COUNT')) - args.skip_end, 0)
+    fps = capture_property(capture, 'FPS')
+    options = tracker_options(args)
+
+    if args.mode == 'sharded':
+        capture.release()
+        window = tuple(args.window) if args.window else None
+        data = track_video(video_filename, args.workers, num_frames=num_Frames,
+                           window=window, **options)
+        frame, x, y = data['frame'], data['x'], data['y']
+        return (frame, x, y) + _velocity(x, y, fps, args)
+
+    data = np.full((num_Frames, 4), np.nan)
+
+    if args.mode == 'pipelined':
+        # The frames are processed out of order, so there's no search window
+        process = FrameTracker(**options)
+        for ii, result in pipelined_frames(capture, process, num_Frames, args.workers):
+            data[ii, :2] = result[:2]
+        data[:, 2], data[:, 3] = _velocity(data[:, 0], data[:, 1], fps, args)
+    else:
+        if args.kalman:
+            window = tuple(args.window) if args.window else (64, 64)
+            process = FilteredTracker(1 / fps, window, **options)
+        else:
+            window = tuple(args.window) if args.window else None
+            process = FrameTracker(window=window, **options)
+
+        for ii in range(num_Frames):
+            ok, img = capture.read()
+            if not ok:
+                break
+            # (x, y, area), or (x, y, vx, vy, area) from the FilteredTracker
+            result = process(img)
+            data[ii, :2] = result[:2]
+            if args.kalman:
+                data[ii, 2:] = result[2:4]
+
+    capture.release()
+    return np.arange(num_Frames), data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+
+
+def _velocity(x, y, fps, args):
+    """
+    (vx, vy) of a track, NaN without args.kalman. With it, x and y are Kalman
+    filtered in place.
+    """
+    if not args.kalman:
+        return np.full(len(x), np.nan), np.full(len(x), np.nan)
+
+    # The parallel modes don't track in order, so the track is filtered afterwards
+    x[:], y[:], vx, vy = filter_centroids(x, y, 1 / fps)
+    return vx, vy
+
+
+def output_names(video_filenames):
+    """
+    Names of the output files of the videos, without the extension - the name of the
+    video, or for videos with the same name in different folders, their path from the
+    folder they have in common, with the folders joined by _
+    """
+    names = [os.path.splitext(os.path.basename(filename))[0]
+             for filename in video_filenames]
+    repeated = set(name for name in names if names.count(name) > 1)
+    if repeated:
+        paths = [os.path.abspath(filename) for filename in video_filenames]
+        common = os.path.dirname(os.path.commonprefix(
+            [path for name, path in zip(names, paths) if name in repeated]))
+        names = [os.path.splitext(os.path.relpath(path, common))[0].replace(os.sep, '_')
+                 if name in repeated else name for name, path in zip(names, paths)]
+
+    for name in set(names):
+        if names.count(name) > 1:
+            raise ValueError('more than one video would be saved as %s.npy' % name)
+    return names
+
+
+def video_metadata(video_filename, args):
+    """ The video information saved with its log """
+    capture = cv2.VideoCapture(video_filename)
+    metadata = {'video_filename': video_filename,
+                'fps': capture_property(capture, 'FPS'),
+                'frame_count': capture_property(capture, 'FRAME_COUNT'),
+                'width': capture_property(capture, 'FRAME_WIDTH'),
+                'height': capture_property(capture, 'FRAME_HEIGHT'),
+                'options': vars(args)}
+    capture.release()
+    return metadata
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.kalman and args.mode != 'serial':
+        print('The parallel modes filter the centroids after tracking, without '
+              'placing the search window')
+
+    filenames = []
+    for video_filename in video_filenames(args.videos):
+        if os.path.exists(video_filename):
+            filenames.append(video_filename)
+        else:
+            print('%s: not found' % video_filename)
+    names = output_names(filenames)
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    total_frames = 0
+    total_time = 0.
+    for video_filename, name in zip(filenames, names):
+        metadata = video_metadata(video_filename, args)
+
+        start = time.time()
+        frame, x, y, vx, vy = track(video_filename, args)
+        elapsed = time.time() - start
+
+        elapsedTime = frame / metadata['fps']
+
+        if args.kalman:
+            columns = ('time', 'x', 'y', 'vx', 'vy')
+            rows = np.column_stack((elapsedTime, x, y, vx, vy))
+        else:
+            columns = ('time', 'x', 'y')
+            rows = np.column_stack((elapsedTime, x, y))
+
+        log = TrackingLog(os.path.join(args.output_dir, name + '.npy'), columns, metadata)
+        log.extend(rows[~np.isnan(x)])
+        log.close()
+        if args.text:
+            save_text(log.filename, os.path.splitext(log.filename)[0] + '.txt')
+
+        print('%s: %d frames in %.2fs (%.1f frames/s), object found in %d' %
+              (video_filename, len(frame), elapsed, len(frame) / max(elapsed, 1e-9),
+               log.num_rows))
+
+        total_frames += len(frame)
+        total_time += elapsed
+
+    if total_time > 0:
+        print('Total: %d frames in %.2fs (%.1f frames/s)' %
+              (total_frames, total_time, total_frames / total_time))
+
+
+if __name__=="__main__":
+    main()
@@ -15,14 +15,25 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - ported from the removed cv2.cv API to cv2
+#       - all of the image buffers are allocated once and reused every frame
+#       - the data is saved with tracking_log.TrackingLog instead of growing an
+#         array with append every frame
+#   * 10/18/26
+#       - capture in a background thread with frame_grabber.FrameGrabber, which
+#         always hands out the newest frame, timestamped when it was grabbed
+#       - print the dropped frames and capture-to-centroid latency at exit
 #
 ########################################################################################## 
-import cv2.cv as cv
+import cv2
 from numpy import *  
 from time import localtime, strftime
 import time
 import datetime
+
+from tracking_log import TrackingLog, save_text
+from frame_grabber import FrameGrabber
  
 color_tracker_window = "Tracking Window"
 
@@ -34,78 +45,101 @@ if save_data:
 
 class ColorTracker:
     def __init__(self): 
-        cv.NamedWindow( color_tracker_window, 1 ) 
-        self.capture = cv.CaptureFromCAM(0) 
+        cv2.namedWindow( color_tracker_window, 1 )
+        self.capture = cv2.VideoCapture(0)
+
+        # The grabber reads one frame to get the image size, then allocate all of
+        # the buffers that are reused every frame
+        self.grabber = FrameGrabber(self.capture)
+        height, width = self.grabber.shape[:2]
+
+        self.blurred_img = empty((height, width, 3), uint8)
+        self.hsv_img = empty((height, width, 3), uint8)
+        self.thresholded_img = empty((height, width), uint8)
+
+        #try red
+        self.Track_MIN = array([160, 150, 100], uint8)
+        self.Track_MAX = array([180, 255, 255], uint8)
         
     def run(self): 
         initialTime = time.time() #sets the initial time
-        data = zeros((1,3))
+
+        if save_data:
+            # Samples are buffered in a preallocated chunk and written in blocks
+            log = TrackingLog(filename + '.npy', ('time', 'x', 'y'))
+
+        self.grabber.start()
         
         while True: 
-            img = cv.QueryFrame( self.capture ) 
+            # the newest frame, and the time it was grabbed
+            ok, img, grab_time = self.grabber.read()
+            if not ok:
+                break
                         
             #blur the source image to reduce color noise 
-            cv.Smooth(img, img, cv.CV_BLUR, 3); 
+            cv2.blur(img, (3, 3), dst=self.blurred_img)
             
             #convert the image to hsv(Hue, Saturation, Value) so its  
             #easier to determine the color to track(hue) 
-            hsv_img = cv.CreateImage(cv.GetSize(img), 8, 3) 
-            cv.CvtColor(img, hsv_img, cv.CV_BGR2HSV) 
+            cv2.cvtColor(self.blurred_img, cv2.COLOR_BGR2HSV, dst=self.hsv_img)
             
             #limit all pixels that don't match our criteria, in the	is case we are  
             #looking for purple but if you want you can adjust the first value in  
             #both turples which is the hue range(120,140).  OpenCV uses 0-180 as  
             #a hue range for the HSV color model 
-            thresholded_img =  cv.CreateImage(cv.GetSize(hsv_img), 8, 1) 
-#             cv.InRangeS(hsv_img, (112, 50, 50), (118, 200, 200), thresholded_img) 
-
-            #try red
-            cv.InRangeS(hsv_img, (160, 150, 100), (180, 255, 255), thresholded_img) 
+#             cv2.inRange(self.hsv_img, (112, 50, 50), (118, 200, 200), dst=self.thresholded_img)
+            cv2.inRange(self.hsv_img, self.Track_MIN, self.Track_MAX, dst=self.thresholded_img)
             
             #determine the objects moments and check that the area is large  
             #enough to be our object 
-            thresholded_img2 = cv.GetMat(thresholded_img)
-            moments = cv.Moments(thresholded_img2,0) 
-            area = cv.GetCentralMoment(moments, 0, 0) 
+            moments = cv2.moments(self.thresholded_img, False)
+            area = moments['m00']
             
             #there can be noise in the video so ignore objects with small areas 
             if(area > 50000): 
                 #determine the x and y coordinates of the center of the object 
                 #we are tracking by dividing the 1, 0 and 0, 1 moments by the area 
-                x = cv.GetSpatialMoment(moments, 1, 0)/area 
-                y = cv.GetSpatialMoment(moments, 0, 1)/area
+                x = moments['m10']/area
+                y = moments['m01']/area
  
                 if save_data:
-                    # Save the current time and pixel location into the data array              
-                    add = asarray([[time.time() - initialTime,x,y]])
-                    data = append(data,add,0)
+                    # Save the current time and pixel location
+                    log.append(grab_time - initialTime, x, y)
+
+                # time from grabbing the frame to finding the centroid
+                self.grabber.record_latency(grab_time)
                 
                 # convert center location to integers
                 x = int(x)
                 y = int(y)
                 
-                #create an overlay to mark the center of the tracked object 
-                overlay = cv.CreateImage(cv.GetSize(img), 8, 3) 
-                
-                cv.Circle(overlay, (x, y), 2, (0, 0, 0), 20) 
-                cv.Add(img, overlay, img) 
+                #mark the center of the tracked object
+                cv2.circle(img, (x, y), 2, (0, 0, 0), 20)
                 
                 # add the thresholded image back to the img so we can see what was  
                 # left after it was applied 
-                cv.Merge(thresholded_img2, None, None, None, img) 
+                cv2.mixChannels([self.thresholded_img], [img], [0, 0])
              
             #display the image  
-            cv.ShowImage(color_tracker_window, img) 
+            cv2.imshow(color_tracker_window, img)
             
-            check = cv.WaitKey(1)
+            check = cv2.waitKey(1) & 0xFF
             
-            if check == 27 or check == 'ESC':
-                if save_data:
-                    # save the data file as comma separated values
-                    data = delete(data, 0, 0) # remove the first row 
-                    savetxt(filepath,data,delimiter=",",header = "Time (s), X Position (pixels), Y Position (pixels)")
+            if check == 27:
                 break
 
+        self.grabber.stop()
+
+        stats = self.grabber.stats()
+        print('%d frames grabbed, %d dropped' % (stats['frames_grabbed'], stats['frames_dropped']))
+        print('Capture to centroid latency (ms) - 50%%: %.1f, 90%%: %.1f, 99%%: %.1f' %
+              (stats['latency_ms'][50], stats['latency_ms'][90], stats['latency_ms'][99]))
+
+        if save_data:
+            # save the data file as comma separated values, too
+            log.close()
+            save_text(filename + '.npy', filepath)
+
                 
 if __name__=="__main__": 
     color_tracker = ColorTracker() 
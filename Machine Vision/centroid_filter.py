@@ -0,0 +1,289 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# centroid_filter.py
+#
+# Kalman filtering of tracked centroids
+#
+# CentroidFilter runs a constant velocity (order=1) or constant acceleration (order=2)
+# Kalman filter on the centroids of any number of targets at once. The x and y motion
+# are independent and the measurement is the position alone, so each update is a
+# scalar one - there are no matrix inversions, and all of the targets are filtered
+# with a few array operations per frame.
+#
+# Each frame, the filter predicts where every target will be and how uncertain that
+# is. FilteredTracker uses the prediction to place the color_tracking.FrameTracker
+# search window, sized by the uncertainty, so only a small part of the frame is
+# processed, and measurements outside the gate are rejected. When the object isn't
+# found, the prediction fills in for up to max_dropout frames. The velocity (and
+# acceleration) estimates come out of the filter directly, in pixels/s.
+#
+# Usage:
+#   tracker = FilteredTracker(1 / fps, mask=mask)
+#   x, y, vx, vy, area = tracker.process(img)
+#
+#   x, y, vx, vy = filter_centroids(x, y, 1 / fps)       # of a recorded track
+#
+#   kalman = CentroidFilter(1 / fps, positions=first_centroids)
+#   kalman.predict()
+#   kalman.update(centroids)            # NaN rows for the targets not found
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import math
+
+import numpy as np
+
+from color_tracking import FrameTracker
+
+PROCESS_NOISE = 2000.       # standard deviation of the unmodeled acceleration (pixels/s^2),
+                            # or jerk (pixels/s^3) for the constant acceleration model
+MEASUREMENT_NOISE = 0.5     # standard deviation of the measured centroids (pixels)
+INITIAL_VELOCITY = 500.     # standard deviation of the velocity of a new target (pixels/s)
+MAX_DROPOUT = 5             # frames a target is predicted through without a measurement
+GATE_SIGMAS = 4.            # measurements farther from the prediction are rejected
+
+
+def motion_model(dt, order=1):
+    """
+    Returns the (F, G) of the per-axis motion model - the state transition matrix,
+    for a state of position and its first order derivatives, and the effect of
+    white noise on the next derivative over one time step.
+
+    Arguments:
+        dt :  time step (s)
+        order :  1 for constant velocity, 2 for constant acceleration
+    """
+    size = order + 1
+    F = np.zeros((size, size))
+    for ii in range(size):
+        for jj in range(ii, size):
+            F[ii, jj] = dt**(jj - ii) / math.factorial(jj - ii)
+
+    G = np.array([dt**(size - ii) / math.factorial(size - ii) for ii in range(size)])
+    return F, G
+
+
+class CentroidFilter(object):
+    """
+    Kalman filters the x and y positions of any number of targets.
+
+    Arguments:
+        dt :  time between frames (s)
+        order :  1 for constant velocity, 2 for constant acceleration
+        process_noise :  standard deviation of the unmodeled acceleration (order 1,
+                         pixels/s^2) or jerk (order 2, pixels/s^3)
+        measurement_noise :  standard deviation of the centroids (pixels)
+        max_dropout :  frames a target is predicted through without a measurement
+                       before it is lost
+        positions :  optional (N, 2) array of the starting positions of N targets
+    """
+    def __init__(self, dt, order=1, process_noise=PROCESS_NOISE,
+                 measurement_noise=MEASUREMENT_NOISE, max_dropout=MAX_DROPOUT,
+                 positions=None):
+        self.dt = dt
+        self.order = order
+        self.max_dropout = max_dropout
+
+        self.F, G = motion_model(dt, order)
+        self.Q = process_noise**2 * np.outer(G, G)
+        self.R = measurement_noise**2
+
+        # Covariance of a new target - the measurement noise for the position, and
+        # INITIAL_VELOCITY for the velocity (and, per second, the acceleration)
+        self.P0 = np.diag([self.R] + [INITIAL_VELOCITY**2] * order)
+
+        # Each target has an x and a y state of position and derivatives
+        size = order + 1
+        self.state = np.empty((0, 2, size))
+        self.covariance = np.empty((0, 2, size, size))
+        self.dropout = np.empty(0, dtype=int)
+
+        if positions is not None:
+            self.add(positions)
+
+    def __len__(self):
+        return len(self.state)
+
+    @property
+    def position(self):
+        """ (N, 2) array of the filtered positions (pixels) """
+        return self.state[:, :, 0]
+
+    @property
+    def velocity(self):
+        """ (N, 2) array of the velocities (pixels/s) """
+        return self.state[:, :, 1]
+
+    @property
+    def acceleration(self):
+        """ (N, 2) array of the accelerations (pixels/s^2), for order 2 """
+        return self.state[:, :, 2]
+
+    @property
+    def lost(self):
+        """ Boolean array, True for targets not measured for over max_dropout frames """
+        return self.dropout > self.max_dropout
+
+    def add(self, positions):
+        """ Starts new targets, at rest, at the (M, 2) array of positions """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+
+        state = np.zeros((len(positions), 2, self.order + 1))
+        state[:, :, 0] = positions
+        covariance = np.empty((len(positions), 2) + self.P0.shape)
+        covariance[...] = self.P0
+
+        self.state = np.concatenate((self.state, state))
+        self.covariance = np.concatenate((self.covariance, covariance))
+        self.dropout = np.concatenate((self.dropout, np.zeros(len(positions), dtype=int)))
+
+    def keep(self, targets):
+        """ Keeps only the targets selected by a boolean array or array of indices """
+        self.state = self.state[targets]
+        self.covariance = self.covariance[targets]
+        self.dropout = self.dropout[targets]
+
+    def predict(self):
+        """ Advances all of the targets one time step, returning their positions """
+        self.state = np.einsum('ij,naj->nai', self.F, self.state)
+        self.covariance = np.matmul(np.matmul(self.F, self.covariance), self.F.T) + self.Q
+        return self.position
+
+    def gate(self, sigmas=GATE_SIGMAS):
+        """
+        (N, 2) array of the half-widths of the region each target's next measurement
+        should be in - sigmas standard deviations of the predicted measurement
+        """
+        return sigmas * np.sqrt(self.covariance[:, :, 0, 0] + self.R)
+
+    def update(self, measurements, sigmas=GATE_SIGMAS):
+        """
+        Corrects the predictions with the (N, 2) array of measured positions.
+
+        Targets with a NaN measurement, or one outside the gate, keep their prediction
+        and count a dropout. Returns the boolean array of the measurements used.
+        """
+        measurements = np.asarray(measurements, dtype=float).reshape(-1, 2)
+        innovation = measurements - self.position
+        variance = self.covariance[:, :, 0, 0] + self.R
+
+        with np.errstate(invalid='ignore'):
+            used = np.all(np.abs(innovation) <= sigmas * np.sqrt(variance), axis=1)
+
+        # Scalar update of the x and y state of each measured target
+        covariance = self.covariance[used]
+        gain = covariance[:, :, :, 0] / variance[used, :, np.newaxis]
+        self.state[used] += gain * innovation[used, :, np.newaxis]
+        self.covariance[used] = (covariance -
+                                 gain[:, :, :, np.newaxis] * covariance[:, :, np.newaxis, 0, :])
+
+        self.dropout[used] = 0
+        self.dropout[~used] += 1
+        return used
+
+
+def filter_centroids(x, y, dt, **options):
+    """
+    Kalman filters a recorded track, predicting through the NaN samples.
+
+    Arguments:
+        x, y :  arrays of the centroid of every frame, NaN where it wasn't found
+        dt :  time between frames (s)
+        options :  keyword arguments for CentroidFilter (order, process_noise, ...)
+
+    Returns:
+        (x, y, vx, vy) arrays of the filtered positions and velocities, NaN where
+        the object was lost for more than max_dropout frames
+    """
+    measurements = np.column_stack((x, y))
+    result = np.full((len(measurements), 4), np.nan)
+    kalman = CentroidFilter(dt, **options)
+
+    for ii, measurement in enumerate(measurements):
+        if len(kalman) > 0 and not kalman.lost[0]:
+            kalman.predict()
+            kalman.update(measurement)
+        elif not np.isnan(measurement[0]):
+            kalman.keep(slice(0, 0))
+            kalman.add(measurement)
+
+        if len(kalman) > 0 and not kalman.lost[0]:
+            result[ii, :2] = kalman.position[0]
+            result[ii, 2:] = kalman.velocity[0]
+
+    return result[:, 0], result[:, 1], result[:, 2], result[:, 3]
+
+
+class FilteredTracker(object):
+    """
+    Tracks one object with a color_tracking.FrameTracker, searching only a window
+    around the Kalman filter prediction.
+
+    Arguments:
+        dt :  time between frames (s)
+        window :  (width, height) of the search window around the prediction, when
+                  the prediction is exact. It grows with the uncertainty of the
+                  prediction, so it should be a little larger than the object.
+        order :  1 for constant velocity, 2 for constant acceleration
+        process_noise, measurement_noise, max_dropout :  as for CentroidFilter
+        gate_sigmas :  standard deviations of the prediction searched and accepted
+        options :  keyword arguments for FrameTracker (Track_MIN, Track_MAX, mask, ...)
+
+    process() returns (x, y, vx, vy, area) - the filtered position and velocity, in
+    pixels and pixels/s, and the measured area. While the object is missing, the
+    position is predicted for up to max_dropout frames, and is NaN after that.
+    """
+    def __init__(self, dt, window=(64, 64), order=1, process_noise=PROCESS_NOISE,
+                 measurement_noise=MEASUREMENT_NOISE, max_dropout=MAX_DROPOUT,
+                 gate_sigmas=GATE_SIGMAS, **options):
+        self.tracker = FrameTracker(**options)
+        self.window = window
+        self.gate_sigmas = gate_sigmas
+        self.kalman = CentroidFilter(dt, order, process_noise, measurement_noise,
+                                     max_dropout)
+
+    def reset(self):
+        """ Forgets the object, so the next frame is searched in full """
+        self.kalman.keep(slice(0, 0))
+        self.tracker.reset()
+
+    def process(self, img):
+        """ Returns the (x, y, vx, vy, area) of the object in one frame """
+        tracking = len(self.kalman) > 0 and not self.kalman.lost[0]
+
+        if tracking:
+            # Search the gate around the prediction, then the whole region if the
+            # object isn't there
+            predicted = self.kalman.predict()[0]
+            gate = self.kalman.gate(self.gate_sigmas)[0]
+            self.tracker.last = predicted
+            self.tracker.window = (int(self.window[0] + 2 * gate[0]),
+                                   int(self.window[1] + 2 * gate[1]))
+        else:
+            self.tracker.last = None
+            self.tracker.window = None
+
+        x, y, area = self.tracker.process(img)
+
+        if tracking:
+            self.kalman.update([x, y], self.gate_sigmas)
+        elif not np.isnan(x):
+            # (Re)acquired
+            self.kalman.keep(slice(0, 0))
+            self.kalman.add([x, y])
+
+        if len(self.kalman) == 0 or self.kalman.lost[0]:
+            return np.nan, np.nan, np.nan, np.nan, area
+
+        (x, y), (vx, vy) = self.kalman.position[0], self.kalman.velocity[0]
+        return x, y, vx, vy, area
+
+    __call__ = process
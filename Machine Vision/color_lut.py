@@ -0,0 +1,301 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# color_lut.py
+#
+# Lookup-table color thresholding
+#
+# The HSV threshold of the tracking scripts (blur, cvtColor to HSV, inRange) depends only
+# on the color of each pixel, so it can be precomputed once for a grid of colors. ColorLUT
+# quantizes each channel to BITS bits (32 levels) and looks the result up in a table of
+# the 32^3 quantized colors, each thresholded at the center of its bin, so a frame costs
+# a few passes over memory instead of the blur and the color conversion. A small
+# morphological opening then removes the isolated pixels the 10x10 box blur used to
+# suppress.
+#
+# The lookup is done in OpenCV. The frame is converted to BGRA and shifted down to its
+# quantized B, G, R, 0 bytes, which read as pairs of 16-bit integers are the (x, y) =
+# (B + 256*G, R) map of cv2.remap into the table. The table is only 32 rows of 32 used
+# bytes in each of 32 blocks, so the lookups stay in cache whatever the frame looks
+# like. Near the edges of the threshold the quantized table can differ from inRange by
+# up to half a bin (4 levels with 5 bits).
+#
+# ColorBitsLUT thresholds up to 8 colors with one table, bit i of each entry being
+# set when the color is in the i-th range, so tracking several colors costs a single
+# lookup per pixel.
+#
+# Requires OpenCV
+#
+# Usage:
+#   lut = ColorLUT(Track_MIN, Track_MAX)
+#   thresholded_img = lut.threshold(img)
+#
+#   lut = ColorBitsLUT([(red_MIN, red_MAX), (blue_MIN, blue_MAX)])
+#   red_img, blue_img = lut.threshold(img)
+#
+#   python color_lut.py [video_filename]       # benchmark against blur/cvtColor/inRange
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import threading
+
+import cv2
+import numpy as np
+
+# Size of the morphological opening that replaces the box blur (pixels)
+OPEN_SIZE = 3
+
+# Bits kept of each color channel for the table lookup (1 to 7)
+BITS = 5
+
+# Tables already built, keyed by threshold and bits
+_table_cache = {}
+
+
+def _hsv_colors(bits):
+    """ n x n^2 HSV image of the quantized colors at the centers of their bins,
+        pixel [r, b + n*g] being quantized color (b, g, r), n = 2^bits """
+    if not 1 <= bits <= 7:
+        raise ValueError('bits must be from 1 to 7, not %r' % (bits,))
+
+    shift = 8 - bits
+    levels = (np.arange(1 << bits) << shift) + (1 << shift >> 1)
+    R, G, B = np.meshgrid(levels, levels, levels, indexing='ij')
+    bgr_colors = np.stack((B, G, R), axis=-1).astype(np.uint8).reshape(len(levels), -1, 3)
+    return cv2.cvtColor(bgr_colors, cv2.COLOR_BGR2HSV)
+
+
+def _remap_table(values):
+    """ Lays out the n x n^2 values of _hsv_colors as the table indexed by
+        (x, y) = (b + 256*g, r), the unused entries zero """
+    n = values.shape[0]
+    table = np.zeros((n, n, 256), np.uint8)
+    table[:, :, :n] = values.reshape(n, n, n)
+    # Less than 32767 columns for remap with 7 bits
+    table = np.ascontiguousarray(table.reshape(n, n * 256)[:, :256 * (n - 1) + n])
+    table.setflags(write=False)
+    return table
+
+
+def threshold_table(Track_MIN, Track_MAX, bits=BITS):
+    """
+    Returns the uint8 table of inRange(HSV, Track_MIN, Track_MAX) for the colors
+    quantized to bits bits per channel, indexed [r, b + 256*g] by the quantized color.
+    """
+    Track_MIN = np.asarray(Track_MIN, np.uint8)
+    Track_MAX = np.asarray(Track_MAX, np.uint8)
+    key = (Track_MIN.tobytes(), Track_MAX.tobytes(), bits)
+
+    if key not in _table_cache:
+        in_range = cv2.inRange(_hsv_colors(bits), Track_MIN, Track_MAX)
+        _table_cache[key] = _remap_table(in_range)
+
+    return _table_cache[key]
+
+
+def bits_table(colors, bits=BITS):
+    """
+    Returns the uint8 table with bit i set for the colors in the i-th of up to 8
+    (Track_MIN, Track_MAX) HSV ranges, indexed like threshold_table.
+    """
+    colors = [(np.asarray(Track_MIN, np.uint8), np.asarray(Track_MAX, np.uint8))
+              for Track_MIN, Track_MAX in colors]
+    if len(colors) > 8:
+        raise ValueError('A bits table holds at most 8 colors')
+    key = (tuple((Track_MIN.tobytes(), Track_MAX.tobytes()) for Track_MIN, Track_MAX in colors),
+           bits)
+
+    if key not in _table_cache:
+        hsv_colors = _hsv_colors(bits)
+        values = np.zeros(hsv_colors.shape[:2], np.uint8)
+        for bit, (Track_MIN, Track_MAX) in enumerate(colors):
+            in_range = cv2.inRange(hsv_colors, Track_MIN, Track_MAX)
+            values |= in_range & np.uint8(1 << bit)
+        _table_cache[key] = _remap_table(values)
+
+    return _table_cache[key]
+
+
+class ColorLUT(object):
+    """
+    Thresholds BGR frames with a precomputed lookup table.
+
+    Arguments:
+        Track_MIN, Track_MAX :  HSV threshold, as for cv2.inRange
+        open_size :  size of the morphological opening, 0 for none
+        bits :  bits kept of each color channel, 1 to 7
+
+    The working buffers are kept per thread, so one ColorLUT can be shared by the
+    worker threads of color_tracking.pipelined_frames.
+    """
+    def __init__(self, Track_MIN, Track_MAX, open_size=OPEN_SIZE, bits=BITS):
+        self._setup(threshold_table(Track_MIN, Track_MAX, bits), open_size, bits)
+
+    def _setup(self, table, open_size, bits):
+        """ Sets up the lookup table, the opening kernel, and the per-thread buffers """
+        if np.little_endian is False:
+            raise ValueError('%s needs a little-endian machine' % type(self).__name__)
+
+        self.table = table
+        self.shift = 8 - bits
+        self.channel_mask = ((1 << bits) - 1) * 0x010101     # B, G, R kept, X cleared
+        self.kernel = None
+        if open_size > 1:
+            self.kernel = np.ones((open_size, open_size), np.uint8)
+        self._buffers = threading.local()
+
+    def _buffer(self, shape):
+        """ BGRX buffer for frames of shape """
+        bgrx = getattr(self._buffers, 'bgrx', None)
+        if bgrx is None or bgrx.shape[:2] != shape:
+            bgrx = np.zeros(shape + (4,), np.uint8)
+            self._buffers.bgrx = bgrx
+        return bgrx
+
+    def lookup(self, img, dst=None):
+        """ Returns the table entry of every pixel of the BGR frame img """
+        height, width = img.shape[:2]
+        if dst is None:
+            dst = np.empty((height, width), np.uint8)
+
+        # Quantized B, G, R, 0 bytes of each pixel - the (x, y) remap coordinates
+        bgrx = self._buffer((height, width))
+        cv2.cvtColor(img, cv2.COLOR_BGR2BGRA, dst=bgrx)
+        quantized = bgrx.view(np.uint32)
+        np.right_shift(quantized, self.shift, out=quantized)
+        np.bitwise_and(quantized, self.channel_mask, out=quantized)
+
+        cv2.remap(self.table, bgrx.view(np.int16), None, cv2.INTER_NEAREST, dst=dst)
+        return dst
+
+    def threshold(self, img, dst=None):
+        """
+        Returns the thresholded (0 or 255) image of the BGR frame img.
+
+        Arguments:
+            img :  BGR frame
+            dst :  optional preallocated uint8 image for the result
+        """
+        dst = self.lookup(img, dst)
+
+        if self.kernel is not None:
+            cv2.morphologyEx(dst, cv2.MORPH_OPEN, self.kernel, dst=dst)
+
+        return dst
+
+    __call__ = threshold
+
+
+class ColorBitsLUT(ColorLUT):
+    """
+    Thresholds BGR frames for several HSV ranges at once, with one table lookup.
+
+    Arguments:
+        colors :  list of up to 8 (Track_MIN, Track_MAX) HSV thresholds
+        open_size :  size of the morphological opening, 0 for none
+        bits :  bits kept of each color channel, 1 to 7
+    """
+    def __init__(self, colors, open_size=OPEN_SIZE, bits=BITS):
+        self.num_colors = len(colors)
+        self._setup(bits_table(colors, bits), open_size, bits)
+
+    def threshold(self, img, dst=None):
+        """
+        Returns a list of the thresholded (0 or 255) images of the BGR frame img,
+        one for each color.
+
+        Arguments:
+            img :  BGR frame
+            dst :  optional list of preallocated uint8 images for the results
+        """
+        bits = getattr(self._buffers, 'bits', None)
+        if bits is None or bits.shape != img.shape[:2]:
+            bits = np.empty(img.shape[:2], np.uint8)
+            self._buffers.bits = bits
+        self.lookup(img, bits)
+
+        if dst is None:
+            dst = [np.empty_like(bits) for _ in range(self.num_colors)]
+
+        for bit, thresholded_img in enumerate(dst):
+            cv2.bitwise_and(bits, 1 << bit, dst=thresholded_img)
+            cv2.compare(thresholded_img, 0, cv2.CMP_GT, dst=thresholded_img)
+            if self.kernel is not None:
+                cv2.morphologyEx(thresholded_img, cv2.MORPH_OPEN, self.kernel,
+                                 dst=thresholded_img)
+        return dst
+
+    __call__ = threshold
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from color_tracking import TRACK_MIN, TRACK_MAX, threshold, centroid
+
+    # Frames from a video, or synthetic 720p and 1080p frames with a white marker
+    if len(sys.argv) > 1:
+        capture = cv2.VideoCapture(sys.argv[1])
+        frames = []
+        while len(frames) < 100:
+            ok, img = capture.read()
+            if not ok:
+                break
+            frames.append(img)
+        sets = {sys.argv[1]: frames}
+    else:
+        rng = np.random.RandomState(0)
+        sets = {}
+        for width, height in ((1280, 720), (1920, 1080)):
+            # Smooth shading plus sensor noise, as in real footage, and uniform noise,
+            # which has no coherence at all
+            x, y = np.meshgrid(np.linspace(0, 1, width), np.linspace(0, 1, height))
+            background = np.dstack((60 + 80 * x, 90 + 60 * y, 120 - 50 * x * y))
+            shaded, noisy = [], []
+            for ii in range(20):
+                noise = rng.normal(0., 4., (height, width, 3))
+                shaded.append(np.clip(background + noise, 0, 255).astype(np.uint8))
+                noisy.append(rng.randint(0, 256, (height, width, 3)).astype(np.uint8))
+                for img in shaded[-1], noisy[-1]:
+                    cv2.circle(img, (width // 3 + 10 * ii, height // 2), 40,
+                               (255, 255, 255), -1)
+            sets['%dx%d shaded' % (width, height)] = shaded
+            sets['%dx%d noise' % (width, height)] = noisy
+
+    start = time.time()
+    lut = ColorLUT(TRACK_MIN, TRACK_MAX)
+    print('Built the table in %.2fms' % (1000 * (time.time() - start)))
+
+    for name, frames in sorted(sets.items()):
+        dst = np.empty(frames[0].shape[:2], np.uint8)
+
+        start = time.time()
+        blurred = [centroid(threshold(img)) for img in frames]
+        blur_time = (time.time() - start) / len(frames)
+
+        start = time.time()
+        looked_up = [centroid(lut.threshold(img, dst)) for img in frames]
+        lut_time = (time.time() - start) / len(frames)
+
+        # Only frames where both found the object can be compared
+        blurred, looked_up = np.array(blurred)[:, :2], np.array(looked_up)[:, :2]
+        both = np.isfinite(blurred).all(axis=1) & np.isfinite(looked_up).all(axis=1)
+        if both.any():
+            difference = 'centroids differ by up to %.2f pixels' % \
+                np.abs(blurred[both] - looked_up[both]).max()
+        else:
+            difference = 'no frames where both found the object'
+        missed = np.count_nonzero(np.isfinite(blurred).all(axis=1) != both)
+
+        print('%s: blur/cvtColor/inRange %.2fms, lookup table %.2fms (%.1fx), %s, '
+              '%d frames missed' %
+              (name, 1000 * blur_time, 1000 * lut_time, blur_time / lut_time, difference,
+               missed))
@@ -0,0 +1,523 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# color_tracking.py
+#
+# Shared frame processing for the color tracking scripts
+#
+# A frame is blurred, converted to HSV, and thresholded between Track_MIN and Track_MAX.
+# The centroid of the thresholded pixels is found from the image moments. All of the
+# per-frame work is in OpenCV calls, which release the GIL, so pipelined_frames() can
+# spread it over a pool of threads while another thread decodes the video.
+#
+# FrameTracker restricts the processing to a region of interest (the bounding box of
+# the mask, if one is given), can find the object on a downscaled image pyramid level
+# first, and can search only a window around the last centroid, falling back to the
+# whole region when the object is lost.
+#
+# For offline processing of long recordings, track_videos() splits each video into
+# ranges of frames (shards). Each worker process seeks to the start of its shard and
+# tracks it independently, and the per-shard results are merged back into time order.
+#
+# Requires OpenCV
+#
+# Usage:
+#   from color_tracking import pipelined_frames, process_frame
+#   for ii, (x, y, area) in pipelined_frames(capture, process_frame):
+#       ...
+#   results = track_videos(['test1.mov', 'test2.mov'], processes=8)
+#   data = track_video('run[1].mov', processes=8)    # no glob expansion
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import glob
+import multiprocessing
+import os
+import threading
+
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    from Queue import Queue, Empty, Full
+
+import cv2
+import numpy as np
+
+from color_lut import ColorLUT
+
+# Default threshold, white in HSV, as in PostColorTrack
+TRACK_MIN = np.array([0, 0, 245], np.uint8)
+TRACK_MAX = np.array([180, 10, 255], np.uint8)
+
+# Default number of frames in each shard of track_videos()
+SHARD_FRAMES = 500
+
+# Columns of the tracking results
+COLUMNS = ('frame', 'time', 'x', 'y', 'area')
+
+BLUR_SIZE = 10          # size of the box blur that reduces color noise (pixels)
+MIN_AREA = 1500         # blobs with a smaller area (m00) are ignored as noise
+
+
+def capture_property(capture, name):
+    """
+    Returns a property of a cv2.VideoCapture by name, such as 'FRAME_COUNT' or
+    'FPS', for both the cv2.CAP_PROP_* and the older cv2.cv.CV_CAP_PROP_* names.
+    """
+    prop = getattr(cv2, 'CAP_PROP_' + name, None)
+    if prop is None:
+        prop = getattr(cv2.cv, 'CV_CAP_PROP_' + name)
+    return capture.get(prop)
+
+
+def threshold(img, Track_MIN=TRACK_MIN, Track_MAX=TRACK_MAX, blur_size=BLUR_SIZE):
+    """ Blurs img, converts it to HSV, and returns the Track_MIN-Track_MAX mask """
+    if blur_size > 1:
+        img = cv2.blur(img, (blur_size, blur_size))
+    hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv_img, Track_MIN, Track_MAX)
+
+
+def centroid(thresholded_img, min_area=MIN_AREA):
+    """
+    Returns (x, y, area) of the thresholded pixels, with x and y NaN if the area
+    is too small to be the tracked object. As in the scripts, the area is the m00
+    moment of the 0/255 thresholded image.
+    """
+    moments = cv2.moments(thresholded_img, False)
+    area = moments['m00']
+
+    if area <= min_area:
+        return np.nan, np.nan, area
+
+    return moments['m10'] / area, moments['m01'] / area, area
+
+
+def process_frame(img, Track_MIN=TRACK_MIN, Track_MAX=TRACK_MAX, mask=None,
+                  blur_size=BLUR_SIZE, min_area=MIN_AREA):
+    """
+    Thresholds one frame and returns the (x, y, area) of the tracked object.
+
+    Arguments:
+        img :  BGR frame
+        Track_MIN, Track_MAX :  HSV threshold
+        mask :  optional uint8 image, 0 where the thresholded image is ignored
+        blur_size :  size of the box blur (pixels), 0 for none
+        min_area :  smallest area (m00) accepted as the object
+    """
+    thresholded_img = threshold(img, Track_MIN, Track_MAX, blur_size)
+    if mask is not None:
+        cv2.bitwise_and(thresholded_img, mask, dst=thresholded_img)
+    return centroid(thresholded_img, min_area)
+
+
+class FrameTracker(object):
+    """
+    Tracks the object in a sequence of frames, only processing the parts of each
+    frame where it can be.
+
+    Arguments:
+        Track_MIN, Track_MAX :  HSV threshold
+        roi :  (x, y, width, height) of the region of interest - the rest of the frame
+               is never processed (default - the bounding box of mask, or the frame)
+        mask :  optional uint8 image, 0 where the thresholded image is ignored
+        downscale :  number of pyramid levels (each half the size) to find the object
+                     on. With a window, the centroid is then refined at full size in
+                     a window around it. Without one, the downscaled result is used.
+        window :  (width, height) of the search window around the last centroid,
+                  None to search the whole region every frame
+        blur_size :  size of the box blur (pixels, at full size)
+        min_area :  smallest area (m00 at full size) accepted as the object
+        use_lut :  threshold with a color_lut.ColorLUT lookup table and a small
+                   opening, instead of the blur, cvtColor, and inRange
+
+    Without a window, process() has no state, so one FrameTracker can be shared by
+    the worker threads of pipelined_frames.
+    """
+    def __init__(self, Track_MIN=TRACK_MIN, Track_MAX=TRACK_MAX, roi=None, mask=None,
+                 downscale=0, window=None, blur_size=BLUR_SIZE, min_area=MIN_AREA,
+                 use_lut=False):
+        self.Track_MIN = Track_MIN
+        self.Track_MAX = Track_MAX
+        self.mask = mask
+        self.downscale = downscale
+        self.window = window
+        self.blur_size = blur_size
+        self.min_area = min_area
+
+        if roi is None and mask is not None:
+            roi = cv2.boundingRect(mask)
+        self.roi = roi
+
+        self.lut = None
+        if use_lut:
+            self.lut = ColorLUT(Track_MIN, Track_MAX)
+
+        self.last = None            # last centroid, for the search window
+
+    def reset(self):
+        """ Forgets the last centroid, so the next frame is searched in full """
+        self.last = None
+
+    def _region(self, img):
+        """ (x0, y0, x1, y1) of the region of interest in img """
+        height, width = img.shape[:2]
+        if self.roi is None:
+            return 0, 0, width, height
+        x, y, w, h = self.roi
+        return max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)
+
+    def _window(self, center, region):
+        """ Search window around center, clipped to region """
+        x0, y0, x1, y1 = region
+        half_width, half_height = self.window[0] // 2, self.window[1] // 2
+        cx, cy = int(center[0]), int(center[1])
+        return (max(cx - half_width, x0), max(cy - half_height, y0),
+                min(cx + half_width, x1), min(cy + half_height, y1))
+
+    def _track(self, img, rect, levels=0):
+        """ (x, y, area) in full-frame coordinates, searching rect at a pyramid level """
+        x0, y0, x1, y1 = rect
+        if x1 <= x0 or y1 <= y0:
+            return np.nan, np.nan, 0.
+
+        sub_img = img[y0:y1, x0:x1]
+        for _ in range(levels):
+            sub_img = cv2.pyrDown(sub_img)
+        scale = 2**levels
+
+        if self.lut is not None:
+            thresholded_img = self.lut.threshold(sub_img)
+        else:
+            thresholded_img = threshold(sub_img, self.Track_MIN, self.Track_MAX,
+                                        max(self.blur_size // scale, 0))
+        if self.mask is not None:
+            sub_mask = self.mask[y0:y1, x0:x1]
+            if levels > 0:
+                sub_mask = cv2.resize(sub_mask, thresholded_img.shape[::-1],
+                                      interpolation=cv2.INTER_NEAREST)
+            cv2.bitwise_and(thresholded_img, sub_mask, dst=thresholded_img)
+
+        x, y, area = centroid(thresholded_img, self.min_area / scale**2)
+
+        # Pixel centers of a pyrDown level are at 2x+0.5 of the level below
+        return (x0 + scale * (x + 0.5) - 0.5, y0 + scale * (y + 0.5) - 0.5,
+                area * scale**2)
+
+    def _search(self, img, rect):
+        if self.downscale == 0:
+            return self._track(img, rect)
+
+        coarse = self._track(img, rect, self.downscale)
+        if self.window is None or np.isnan(coarse[0]):
+            return coarse
+
+        # Refine at full size around the coarse centroid
+        fine = self._track(img, self._window(coarse[:2], self._region(img)))
+        return coarse if np.isnan(fine[0]) else fine
+
+    def process(self, img):
+        """ Returns the (x, y, area) of the object in one frame """
+        region = self._region(img)
+
+        result = (np.nan, np.nan, 0.)
+        if self.window is not None and self.last is not None:
+            result = self._search(img, self._window(self.last, region))
+
+        # Lost, or no window - search the whole region
+        if np.isnan(result[0]):
+            result = self._search(img, region)
+
+        if self.window is not None:
+            self.last = None if np.isnan(result[0]) else result[:2]
+
+        return result
+
+    __call__ = process
+
+
+def pipelined_frames(capture, process, num_frames=None, workers=None, queue_size=None):
+    """
+    Reads frames from capture in one thread, runs process(frame) on them in a pool
+    of worker threads, and yields (index, result) in frame order.
+
+    The number of frames between decoding and being yielded is bounded, so decoding
+    only runs a little ahead of processing (and of the caller), even while results
+    that finish out of order are held until the frames before them are done. An
+    exception in the decoder or in process is raised here.
+
+    Arguments:
+        capture :  cv2.VideoCapture (or anything with a read() like it)
+        process :  function of a frame, run in the worker threads
+        num_frames :  number of frames to read (default - until the video ends)
+        workers :  number of worker threads (default one per CPU)
+        queue_size :  number of decoded frames waiting for a worker (default 4 per worker)
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if queue_size is None:
+        queue_size = 4 * workers
+
+    # A slot for each frame decoded but not yet yielded - waiting, being processed,
+    # or done
+    max_frames = queue_size + workers
+    in_flight = Queue(max_frames)
+
+    frames = Queue(queue_size)
+    results = Queue(max_frames + workers + 1)       # room for the end of every thread
+    decoded = threading.Event()         # set once the decoder has queued its last frame
+    stop = threading.Event()            # set to shut the pipeline down early
+
+    def decode():
+        index = 0
+        try:
+            while not stop.is_set() and (num_frames is None or index < num_frames):
+                try:
+                    in_flight.put(None, timeout=0.01)
+                except Full:
+                    continue
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frames.put((index, frame))
+                index += 1
+        except Exception as error:
+            results.put((None, None, error))
+        finally:
+            decoded.set()
+
+    def work():
+        try:
+            while not stop.is_set():
+                try:
+                    index, frame = frames.get(timeout=0.01)
+                except Empty:
+                    if decoded.is_set() and frames.empty():
+                        break
+                    continue
+                try:
+                    results.put((index, process(frame), None))
+                except Exception as error:
+                    results.put((index, None, error))
+        finally:
+            results.put(None)
+
+    threads = [threading.Thread(target=decode)]
+    threads += [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    pending = {}
+    next_index = 0
+    finished = 0
+    try:
+        while finished < workers:
+            item = results.get()
+            if item is None:
+                finished += 1
+                continue
+
+            index, result, error = item
+            if error is not None:
+                raise error
+
+            pending[index] = result
+            while next_index in pending:
+                yield next_index, pending.pop(next_index)
+                next_index += 1
+                in_flight.get_nowait()
+    finally:
+        # Shut down if the caller stops early, emptying the queue in case the
+        # decoder is waiting for room in it
+        stop.set()
+        while threads[0].is_alive():
+            try:
+                frames.get(timeout=0.01)
+            except Empty:
+                pass
+        for thread in threads:
+            thread.join()
+
+
+def shard_video(filename, shard_frames=SHARD_FRAMES, num_frames=None):
+    """
+    Splits a video into (filename, start, stop) frame ranges of shard_frames frames,
+    which can be tracked independently, in any process or on any machine.
+    """
+    if num_frames is None:
+        capture = cv2.VideoCapture(filename)
+        num_frames = int(capture_property(capture, 'FRAME_COUNT'))
+        capture.release()
+
+    return [(filename, start, min(start + shard_frames, num_frames))
+            for start in range(0, num_frames, shard_frames)]
+
+
+def _seek(capture, filename, start):
+    """
+    Seeks capture to frame start. Seeking is not frame-accurate for every codec,
+    so if the capture reports another position, the video is reopened and read
+    up to start instead.
+    """
+    if start == 0:
+        return capture
+
+    prop = getattr(cv2, 'CAP_PROP_POS_FRAMES', None)
+    if prop is None:
+        prop = cv2.cv.CV_CAP_PROP_POS_FRAMES
+
+    capture.set(prop, start)
+    if int(round(capture.get(prop))) == start:
+        return capture
+
+    capture.release()
+    capture = cv2.VideoCapture(filename)
+    for _ in range(start):
+        capture.grab()
+    return capture
+
+
+def track_shard(shard, options=None):
+    """
+    Tracks the frames of one (filename, start, stop) shard.
+
+    Arguments:
+        shard :  (filename, start, stop) from shard_video
+        options :  dict of keyword arguments for FrameTracker
+
+    Returns:
+        dict of arrays keyed by COLUMNS, with a row per frame (NaN x and y for the
+        frames where the object wasn't found)
+    """
+    filename, start, stop = shard
+    options = options or {}
+
+    capture = cv2.VideoCapture(filename)
+    fps = capture_property(capture, 'FPS')
+    capture = _seek(capture, filename, start)
+    tracker = FrameTracker(**options)
+
+    data = np.full((stop - start, 3), np.nan)
+    num_read = 0
+    for ii in range(stop - start):
+        ok, img = capture.read()
+        if not ok:
+            break
+        data[ii] = tracker.process(img)
+        num_read += 1
+    capture.release()
+
+    frame = np.arange(start, start + num_read)
+    return {'frame': frame, 'time': frame / fps, 'x': data[:num_read, 0],
+            'y': data[:num_read, 1], 'area': data[:num_read, 2]}
+
+
+def _init_worker():
+    """ Pool initializer, keeping OpenCV to one thread in each worker process """
+    cv2.setNumThreads(1)
+
+
+def _track_shard(args):
+    """ Unpacks the arguments of track_shard for Pool.map """
+    return track_shard(*args)
+
+
+def merge_shards(results):
+    """ Concatenates the results of shards of one video into frame order """
+    if len(results) == 0:
+        return dict((name, np.empty(0)) for name in COLUMNS)
+
+    frame = np.concatenate([result['frame'] for result in results])
+    order = np.argsort(frame, kind='mergesort')
+
+    return dict((name, np.concatenate([result[name] for result in results])[order])
+                for name in COLUMNS)
+
+
+def video_filenames(patterns):
+    """
+    Expands a video filename or glob pattern, or a list of them, keeping the order
+    and dropping repeats. An existing file is taken as is, even if its name has glob
+    characters (run[1].mov), and a pattern that matches no file is kept as a filename.
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    filenames = []
+    for pattern in patterns:
+        matches = [pattern] if os.path.isfile(pattern) else sorted(glob.glob(pattern))
+        for filename in matches or [pattern]:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def _track_shards(shards, processes, options):
+    """ Results of track_shard for each shard, in a process pool unless processes is 1 """
+    tasks = [(shard, options) for shard in shards]
+
+    if processes == 1 or len(tasks) <= 1:
+        return [_track_shard(task) for task in tasks]
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    try:
+        return pool.map(_track_shard, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def track_video(filename, processes=None, shard_frames=SHARD_FRAMES, num_frames=None,
+                **options):
+    """
+    Tracks one video in parallel, splitting it into shards that are spread across
+    a process pool. The filename is used as is, not as a glob pattern.
+
+    Arguments:
+        filename :  video filename
+        processes :  number of worker processes (default one per CPU, 1 to run in the
+                     calling process)
+        shard_frames :  number of frames in each shard
+        num_frames :  number of frames to track from the start (default all)
+        options :  keyword arguments for FrameTracker (Track_MIN, Track_MAX, mask, ...)
+
+    Returns:
+        dict of arrays keyed by COLUMNS in frame order
+    """
+    shards = shard_video(filename, shard_frames, num_frames)
+    return merge_shards(_track_shards(shards, processes, options))
+
+
+def track_videos(filenames, processes=None, shard_frames=SHARD_FRAMES, **options):
+    """
+    Tracks a list of videos (or glob patterns) in parallel, splitting every video into
+    shards that are spread across one process pool.
+
+    Arguments:
+        filenames :  video filename, glob pattern, or list of them
+        processes :  number of worker processes (default one per CPU, 1 to run in the
+                     calling process)
+        shard_frames :  number of frames in each shard
+        options :  keyword arguments for FrameTracker (Track_MIN, Track_MAX, mask, ...)
+
+    Returns:
+        dict, keyed by filename, of dicts of arrays keyed by COLUMNS in frame order
+    """
+    videos = video_filenames(filenames)
+
+    shards = []
+    for filename in videos:
+        shards.extend(shard_video(filename, shard_frames))
+    results = _track_shards(shards, processes, options)
+
+    return dict((filename, merge_shards([result for shard, result in zip(shards, results)
+                                         if shard[0] == filename]))
+                for filename in videos)
@@ -0,0 +1,162 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# frame_grabber.py
+#
+# Threaded camera capture that always hands out the newest frame
+#
+# A background thread grabs frames from the camera as fast as it delivers them and
+# timestamps each one right after the grab, before it is decoded. read() returns the
+# newest frame that hasn't been read yet. Frames that were replaced before they were
+# read are counted as dropped, so slow processing never backs up the camera or adds
+# latency.
+#
+# The frames rotate through three preallocated buffers - one being grabbed into, the
+# newest complete frame, and the one the caller is processing - so there are no
+# per-frame allocations and the caller's frame is never overwritten while in use.
+#
+# Requires OpenCV
+#
+# Usage:
+#   grabber = FrameGrabber(cv2.VideoCapture(0))
+#   grabber.start()
+#   ok, img, timestamp = grabber.read()
+#   ...process img...
+#   grabber.record_latency(timestamp)          # once the centroid is found
+#   print(grabber.stats())
+#   grabber.stop()
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import threading
+import time
+
+import numpy as np
+
+# Number of latency samples kept for the statistics
+LATENCY_SAMPLES = 1000
+
+
+class FrameGrabber(object):
+    """
+    Grabs frames from capture in a background thread, keeping only the newest.
+
+    Arguments:
+        capture :  opened cv2.VideoCapture
+        latency_samples :  number of recent latencies the statistics are computed on
+    """
+    def __init__(self, capture, latency_samples=LATENCY_SAMPLES):
+        self.capture = capture
+
+        # The first frame sets the size of the buffers
+        ok, first = capture.read()
+        if not ok:
+            raise IOError('Could not read from the camera')
+
+        self.shape = first.shape
+        self._grab_buffer = first
+        self._latest = np.empty_like(first)
+        self._front = np.empty_like(first)
+        self._latest_time = None
+        self._new = False
+
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.frames_grabbed = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self._start_time = None
+
+        self._latency = np.zeros(latency_samples)
+        self._latency_count = 0
+
+    def start(self):
+        """ Starts the capture thread """
+        self._running = True
+        self._start_time = time.time()
+        self._thread = threading.Thread(target=self._grab_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the capture thread """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _grab_loop(self):
+        while self._running:
+            ok = self.capture.grab()
+            grab_time = time.time()
+            if ok:
+                # retrieve() fills the buffer in place if it can, but reallocates if
+                # the frame size or format changes, so keep the array it returns
+                ok, frame = self.capture.retrieve(self._grab_buffer)
+                if ok:
+                    self._grab_buffer = frame
+
+            with self._condition:
+                if not ok:
+                    self._running = False
+                    self._condition.notify_all()
+                    return
+
+                if self._new:
+                    self.frames_dropped += 1
+                self._grab_buffer, self._latest = self._latest, self._grab_buffer
+                self._latest_time = grab_time
+                self._new = True
+                self.frames_grabbed += 1
+                self._condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Waits for a frame that hasn't been read yet and returns (ok, img, timestamp),
+        with the time the frame was grabbed. img stays valid until the next read().
+        ok is False once the camera stops delivering frames (or on a timeout).
+        """
+        with self._condition:
+            while not self._new and self._running:
+                if not self._condition.wait(timeout) and timeout is not None:
+                    break
+            if not self._new:
+                return False, None, None
+
+            self._front, self._latest = self._latest, self._front
+            self._new = False
+            self.frames_read += 1
+            return True, self._front, self._latest_time
+
+    def record_latency(self, timestamp):
+        """ Records the time from grabbing a frame (its timestamp) to now """
+        self._latency[self._latency_count % len(self._latency)] = time.time() - timestamp
+        self._latency_count += 1
+
+    def stats(self, percentiles=(50, 90, 99)):
+        """
+        Returns a dict of the capture statistics -
+            frames_grabbed, frames_read, frames_dropped :  counts
+            capture_fps :  rate frames are grabbed at (frames/s)
+            latency_ms :  dict of grab-to-result latency percentiles (ms)
+        """
+        elapsed = time.time() - self._start_time if self._start_time else 0.
+        latency = self._latency[:min(self._latency_count, len(self._latency))]
+
+        return {'frames_grabbed': self.frames_grabbed,
+                'frames_read': self.frames_read,
+                'frames_dropped': self.frames_dropped,
+                'capture_fps': self.frames_grabbed / elapsed if elapsed > 0 else 0.,
+                'latency_ms': dict((p, 1000 * np.percentile(latency, p) if len(latency) else np.nan)
+                                   for p in percentiles)}
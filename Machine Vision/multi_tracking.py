@@ -0,0 +1,305 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# multi_tracking.py
+#
+# Tracking several objects of several colors in one pass over each frame
+#
+# The frame is blurred and converted to HSV once (or looked up once in a
+# color_lut.ColorBitsLUT table), and every color range is thresholded from that shared
+# conversion. Instead of the moments of the whole thresholded image, each thresholded
+# image is split into connected components, and every component large enough to be an
+# object is a blob, with the centroid and area of that component alone.
+#
+# Blobs are matched to the objects found in the previous frames by nearest neighbor,
+# closest pairs first, so each object keeps the same id from frame to frame. A blob
+# with no object within max_distance starts a new one, and objects that aren't seen
+# for more than max_missing frames are dropped.
+#
+# With a frame time dt, every object is Kalman filtered with a
+# centroid_filter.CentroidFilter, vectorized over all of the objects of a color. Blobs
+# are then matched to where each object is predicted to be, the positions are
+# smoothed, objects that go unseen are predicted through for up to max_missing frames,
+# and each row includes the velocity.
+#
+# Requires OpenCV
+#
+# Usage:
+#   tracker = MultiColorTracker([(red_MIN, red_MAX), (blue_MIN, blue_MAX)])
+#   for color, id, x, y, area in tracker.process(img):
+#       ...
+#
+#   tracker = MultiColorTracker(colors, dt=1 / fps)
+#   for color, id, x, y, area, vx, vy in tracker.process(img):
+#       ...
+#
+#   python multi_tracking.py video_filename
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import cv2
+import numpy as np
+
+from centroid_filter import CentroidFilter
+from color_lut import ColorBitsLUT
+from color_tracking import BLUR_SIZE, MIN_AREA
+
+# Columns of the rows returned by MultiColorTracker.process
+COLUMNS = ('color', 'id', 'x', 'y', 'area')
+
+# Columns of the rows with the Kalman filter - the area is 0 while an object is predicted
+FILTERED_COLUMNS = COLUMNS + ('vx', 'vy')
+
+MAX_DISTANCE = 50.      # farthest a blob can move between frames and keep its id (pixels)
+MAX_MISSING = 5         # frames an object can go unseen before its id is dropped
+
+
+def blobs(thresholded_img, min_area=MIN_AREA, max_blobs=None):
+    """
+    Returns an (N, 3) array of the (x, y, area) of the connected components of a
+    thresholded image, largest first. As in color_tracking.centroid, the area is
+    the m00 moment of the 0/255 image.
+
+    Arguments:
+        thresholded_img :  uint8 thresholded image
+        min_area :  smallest area (m00) accepted as an object
+        max_blobs :  largest number of blobs returned, None for all of them
+    """
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        thresholded_img, connectivity=8, ltype=cv2.CV_32S)
+
+    # Label 0 is the background
+    area = 255. * stats[1:, cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(area > min_area)
+    keep = keep[np.argsort(-area[keep], kind='mergesort')][:max_blobs]
+
+    return np.column_stack((centroids[1:][keep], area[keep]))
+
+
+def associate(previous, current, max_distance=MAX_DISTANCE):
+    """
+    Matches current points to previous ones by nearest neighbor, closest pairs first.
+
+    Arguments:
+        previous :  (M, 2) array of positions
+        current :  (N, 2) array of positions
+        max_distance :  largest distance between matched points
+
+    Returns:
+        length N array of the index into previous of each current point, -1 where
+        it has no match
+    """
+    match = np.full(len(current), -1, dtype=int)
+    if len(previous) == 0 or len(current) == 0:
+        return match
+
+    distance = np.hypot(previous[:, 0, np.newaxis] - current[np.newaxis, :, 0],
+                        previous[:, 1, np.newaxis] - current[np.newaxis, :, 1])
+
+    used = np.zeros(len(previous), dtype=bool)
+    for flat_index in np.argsort(distance, axis=None, kind='mergesort'):
+        ii, jj = divmod(flat_index, len(current))
+        if distance[ii, jj] > max_distance:
+            break
+        if not used[ii] and match[jj] < 0:
+            used[ii] = True
+            match[jj] = ii
+
+    return match
+
+
+class MultiColorTracker(object):
+    """
+    Tracks every blob of several colors in a sequence of frames, with ids that stay
+    the same from frame to frame.
+
+    Arguments:
+        colors :  list of (Track_MIN, Track_MAX) HSV thresholds
+        roi :  (x, y, width, height) of the region of interest - the rest of the frame
+               is never processed (default - the bounding box of mask, or the frame)
+        mask :  optional uint8 image, 0 where the thresholded images are ignored
+        blur_size :  size of the box blur (pixels)
+        min_area :  smallest area (m00) accepted as an object
+        max_blobs :  largest number of objects of each color, None for no limit
+        max_distance :  farthest an object can move between frames and keep its id
+        max_missing :  number of frames an object can go unseen and keep its id
+        use_lut :  threshold all colors with one color_lut.ColorBitsLUT lookup and a
+                   small opening, instead of the blur, cvtColor, and inRange
+        dt :  time between frames (s), to Kalman filter the objects, None for the
+              raw centroids
+        filter_options :  dict of keyword arguments for centroid_filter.CentroidFilter
+                          (order, process_noise, measurement_noise)
+    """
+    def __init__(self, colors, roi=None, mask=None, blur_size=BLUR_SIZE,
+                 min_area=MIN_AREA, max_blobs=None, max_distance=MAX_DISTANCE,
+                 max_missing=MAX_MISSING, use_lut=False, dt=None, filter_options=None):
+        self.colors = [(np.asarray(Track_MIN, np.uint8), np.asarray(Track_MAX, np.uint8))
+                       for Track_MIN, Track_MAX in colors]
+        self.mask = mask
+        self.blur_size = blur_size
+        self.min_area = min_area
+        self.max_blobs = max_blobs
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.dt = dt
+        self.filter_options = filter_options or {}
+
+        if roi is None and mask is not None:
+            roi = cv2.boundingRect(mask)
+        self.roi = roi
+
+        self.lut = None
+        if use_lut:
+            self.lut = ColorBitsLUT(self.colors)
+
+        self.reset()
+
+    def reset(self):
+        """ Forgets all of the objects, so the next frame starts new ids """
+        self.next_id = 0
+        self.ids = [np.empty(0, dtype=int) for _ in self.colors]
+        self.positions = [np.empty((0, 2)) for _ in self.colors]
+        self.missing = [np.empty(0, dtype=int) for _ in self.colors]
+
+        self.filters = None
+        if self.dt is not None:
+            self.filters = [CentroidFilter(self.dt, max_dropout=self.max_missing,
+                                           **self.filter_options)
+                            for _ in self.colors]
+
+    def _region(self, img):
+        """ (x0, y0, x1, y1) of the region of interest in img """
+        height, width = img.shape[:2]
+        if self.roi is None:
+            return 0, 0, width, height
+        x, y, w, h = self.roi
+        return max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)
+
+    def threshold(self, img):
+        """ Returns the list of thresholded images of img, one for each color """
+        if self.lut is not None:
+            return self.lut.threshold(img)
+
+        if self.blur_size > 1:
+            img = cv2.blur(img, (self.blur_size, self.blur_size))
+        hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        return [cv2.inRange(hsv_img, Track_MIN, Track_MAX)
+                for Track_MIN, Track_MAX in self.colors]
+
+    def _update(self, color, found):
+        """
+        Matches the blobs found of one color to its objects. Returns the ids of the
+        blobs, or with the Kalman filter, the rows for all of the objects.
+        """
+        previous = self.positions[color]
+        if self.filters is not None:
+            previous = self.filters[color].predict()
+        match = associate(previous, found[:, :2], self.max_distance)
+        matched = match >= 0
+        new = ~matched
+
+        # Objects that weren't seen keep their last position for a few frames
+        seen = np.zeros(len(self.ids[color]), dtype=bool)
+        seen[match[matched]] = True
+        self.missing[color][seen] = 0
+        self.missing[color][~seen] += 1
+        self.positions[color][match[matched]] = found[matched, :2]
+
+        area = np.zeros(len(self.ids[color]))
+        area[match[matched]] = found[matched, 2]
+
+        if self.filters is not None:
+            measurements = np.full((len(self.ids[color]), 2), np.nan)
+            measurements[match[matched]] = found[matched, :2]
+            self.filters[color].update(measurements, np.inf)
+            self.filters[color].add(found[new, :2])
+
+        new_ids = self.next_id + np.arange(np.count_nonzero(new))
+        self.next_id += len(new_ids)
+
+        ids = np.empty(len(found), dtype=int)
+        ids[matched] = self.ids[color][match[matched]]
+        ids[new] = new_ids
+
+        kept = np.concatenate((self.missing[color] <= self.max_missing,
+                               np.ones(len(new_ids), dtype=bool)))
+        self.ids[color] = np.concatenate((self.ids[color], new_ids))[kept]
+        self.positions[color] = np.concatenate((self.positions[color], found[new, :2]))[kept]
+        self.missing[color] = np.concatenate((self.missing[color],
+                                              np.zeros(len(new_ids), dtype=int)))[kept]
+        area = np.concatenate((area, found[new, 2]))[kept]
+
+        if self.filters is None:
+            return ids
+
+        kalman = self.filters[color]
+        kalman.keep(kept)
+        return np.column_stack((np.full(len(kalman), color), self.ids[color],
+                                kalman.position, area, kalman.velocity))
+
+    def process(self, img):
+        """
+        Returns an array with a row of COLUMNS - (color, id, x, y, area) - for each
+        object found in one frame. color is the index into colors. With the Kalman
+        filter, the rows are FILTERED_COLUMNS - (color, id, x, y, area, vx, vy) - for
+        every object being tracked, including those predicted through a dropout.
+        """
+        x0, y0, x1, y1 = self._region(img)
+        sub_img = img[y0:y1, x0:x1]
+
+        rows = []
+        for color, thresholded_img in enumerate(self.threshold(sub_img)):
+            if self.mask is not None:
+                cv2.bitwise_and(thresholded_img, self.mask[y0:y1, x0:x1],
+                                dst=thresholded_img)
+
+            found = blobs(thresholded_img, self.min_area, self.max_blobs)
+            found[:, 0] += x0
+            found[:, 1] += y0
+
+            result = self._update(color, found)
+            if self.filters is None:
+                result = np.column_stack((np.full(len(found), color), result, found))
+            rows.append(result)
+
+        columns = COLUMNS if self.filters is None else FILTERED_COLUMNS
+        return np.concatenate(rows) if rows else np.empty((0, len(columns)))
+
+    __call__ = process
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from color_tracking import TRACK_MIN, TRACK_MAX
+
+    # White, as in PostColorTrack, and red, as in WebcamColorTrack
+    colors = [(TRACK_MIN, TRACK_MAX), ([160, 150, 100], [180, 255, 255])]
+
+    capture = cv2.VideoCapture(sys.argv[1])
+    tracker = MultiColorTracker(colors, use_lut='--lut' in sys.argv)
+
+    num_frames = 0
+    ids = set()
+    start = time.time()
+    while True:
+        ok, img = capture.read()
+        if not ok:
+            break
+
+        for color, id, x, y, area in tracker.process(img):
+            ids.add((int(color), int(id)))
+        num_frames += 1
+
+    elapsed = time.time() - start
+    print('%d frames in %.2fs (%.1f frames/s)' % (num_frames, elapsed, num_frames / elapsed))
+    for color in range(len(colors)):
+        print('Color %d: ids %s' % (color, sorted(id for c, id in ids if c == color)))
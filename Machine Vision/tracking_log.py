@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# tracking_log.py
+#
+# Buffered binary logging of tracking data
+#
+# Samples are written into a preallocated NumPy chunk and the chunk is appended to a
+# .npy file when it fills (or every flush_interval seconds), so there is no string
+# formatting in the tracking loop. The file is a standard .npy file of a structured
+# array with one field per column, and its header is rewritten at every flush, so it
+# is always readable up to the last flush, even if the program stops early. Metadata,
+# like the video name and frame rate, goes in a .json file next to it.
+#
+# np.load(filename, mmap_mode='r') memory-maps the file, so loading is instant no matter
+# how many samples it has.
+#
+# Usage:
+#   log = TrackingLog('data.npy', columns=('time', 'x', 'y'), metadata={'fps': fps})
+#   log.append(elapsedTime, x, y)        # in the tracking loop
+#   log.close()
+#
+#   data, metadata = load_log('data.npy')
+#   plot(data['time'], data['x'])
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import json
+import os
+import time
+
+import numpy as np
+
+# Space reserved for the .npy header, so that it can be rewritten in place with the
+# number of rows at each flush (a multiple of 64 bytes, as the format requires)
+HEADER_BYTES = 256
+
+
+def metadata_filename(filename):
+    """ Name of the metadata file that goes with a log """
+    return os.path.splitext(filename)[0] + '.json'
+
+
+def _header(dtype, num_rows):
+    """ Version 1.0 .npy header for num_rows of dtype, padded to HEADER_BYTES """
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(dtype), num_rows)
+    header = header.ljust(HEADER_BYTES - 10 - 1) + '\n'
+
+    if len(header) + 10 > HEADER_BYTES:
+        raise ValueError('Too many columns for the log header')
+
+    return (np.lib.format.MAGIC_PREFIX + b'\x01\x00' +
+            np.array([len(header)], '<u2').tobytes() + header.encode('latin1'))
+
+
+class TrackingLog(object):
+    """
+    Writes rows of float samples to a .npy file in chunks.
+
+    Arguments:
+        filename :  name of the .npy file
+        columns :  names of the columns
+        metadata :  dict saved to the .json file next to the log
+        chunk_rows :  number of rows buffered between writes
+        flush_interval :  longest time between writes (s), None to only write full
+                          chunks
+    """
+    def __init__(self, filename, columns=('time', 'x', 'y'), metadata=None,
+                 chunk_rows=4096, flush_interval=5.):
+        self.filename = filename
+        self.columns = tuple(columns)
+        self.dtype = np.dtype([(name, '<f8') for name in self.columns])
+        self.flush_interval = flush_interval
+
+        self.num_rows = 0                   # rows written to the file
+        self._chunk = np.empty((chunk_rows, len(self.columns)))
+        self._count = 0                     # rows waiting in the chunk
+        self._last_flush = time.time()
+
+        metadata = dict(metadata or {})
+        metadata.setdefault('columns', list(self.columns))
+        metadata.setdefault('created', time.strftime('%Y-%m-%d %H:%M:%S'))
+        with open(metadata_filename(filename), 'w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2, default=_to_json)
+
+        self._file = open(filename, 'wb')
+        self._file.write(_header(self.dtype, 0))
+
+    def append(self, *values):
+        """ Adds one row, with a value for each column """
+        self._chunk[self._count] = values
+        self._count += 1
+
+        if self._count == len(self._chunk):
+            self.flush()
+        elif (self.flush_interval is not None and
+              time.time() - self._last_flush > self.flush_interval):
+            self.flush()
+
+    def extend(self, rows):
+        """ Adds an (N, columns) array of rows """
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(self.columns))
+        self.flush()
+        self._write(rows)
+
+    def _write(self, rows):
+        if len(rows) == 0:
+            return
+
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.ascontiguousarray(rows, dtype='<f8').tobytes())
+        self.num_rows += len(rows)
+
+        # Update the number of rows in the header
+        self._file.seek(0)
+        self._file.write(_header(self.dtype, self.num_rows))
+        self._file.flush()
+
+    def flush(self):
+        """ Writes the buffered rows to the file """
+        self._write(self._chunk[:self._count])
+        self._count = 0
+        self._last_flush = time.time()
+
+    def close(self):
+        """ Writes the buffered rows and closes the file """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _to_json(value):
+    """ Converts NumPy values in the metadata for json """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def load_log(filename, mmap_mode='r'):
+    """
+    Returns (data, metadata) of a log. data is a structured array, memory-mapped
+    by default, with a field for each column.
+    """
+    data = np.load(filename, mmap_mode=mmap_mode)
+
+    metadata = {}
+    if os.path.exists(metadata_filename(filename)):
+        with open(metadata_filename(filename)) as metadata_file:
+            metadata = json.load(metadata_file)
+
+    return data, metadata
+
+
+def save_text(filename, text_filename):
+    """ Saves a log as comma separated values, like the original text output """
+    data, metadata = load_log(filename)
+    header = ', '.join(data.dtype.names)
+    np.savetxt(text_filename, data.view('<f8').reshape(len(data), -1), fmt='%.9f',
+               delimiter=',', header=header, comments='')
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# ring_buffer.py
+#
+# Fixed-capacity, multi-channel NumPy ring buffer
+#
+# The samples are stored twice, at i and i + capacity of an array twice the capacity,
+# so the last capacity samples are always one contiguous slice of it. view() returns
+# that slice, in order, without copying, and appending a batch of samples is a few
+# slice assignments, with no Python loop over the samples.
+#
+# Usage:
+#   buffer = RingBuffer(100000, channels=4)
+#   buffer.extend(samples)                  # (N, 4) array, or buffer.append(sample)
+#   line.set_ydata(buffer.view()[3])        # the last 100000 samples of channel 3
+#
+#   python ring_buffer.py                   # benchmark against collections.deque
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """
+    Holds the last capacity samples of a number of channels.
+
+    Arguments:
+        capacity :  number of samples held
+        channels :  number of channels
+        dtype :  data type of the samples
+        fill :  value of the samples before any are added
+    """
+    def __init__(self, capacity, channels=1, dtype=float, fill=0.):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.full((channels, 2 * capacity), fill, dtype)
+        self._next = 0              # where the next sample goes, and the oldest one is
+        self.count = 0              # number of samples ever added
+
+    def __len__(self):
+        return self.capacity
+
+    def extend(self, samples):
+        """ Adds an (N, channels) array of samples, oldest first """
+        samples = np.asarray(samples).reshape(-1, self.channels)[-self.capacity:]
+        num_samples = len(samples)
+        if num_samples == 0:
+            return
+
+        # Up to the end of the buffer, then wrapping around to the start, each
+        # written to both copies
+        first = min(num_samples, self.capacity - self._next)
+        rest = num_samples - first
+        for start in (self._next, self._next + self.capacity):
+            self._data[:, start:start + first] = samples[:first].T
+        for start in (0, self.capacity):
+            self._data[:, start:start + rest] = samples[first:].T
+
+        self._next = (self._next + num_samples) % self.capacity
+        self.count += num_samples
+
+    def append(self, sample):
+        """ Adds one sample, a value for each channel """
+        self.extend(np.asarray(sample).reshape(1, self.channels))
+
+    def view(self):
+        """
+        Returns a (channels, capacity) view of the samples, oldest first. It isn't
+        a copy, so it changes as samples are added.
+        """
+        return self._data[:, self._next:self._next + self.capacity]
+
+    def latest(self, num_samples):
+        """ Returns a (channels, num_samples) view of the newest samples """
+        end = self._next + self.capacity
+        return self._data[:, end - min(num_samples, self.capacity):end]
+
+
+if __name__ == "__main__":
+    import time
+    from collections import deque
+
+    capacity = 100000
+    redraws = 20
+    batch = np.random.rand(100, 4)
+
+    # As AnalogData did it - a deque per channel, converted to an array every redraw
+    deques = [deque([0.0] * capacity) for _ in range(4)]
+    start = time.time()
+    for _ in range(redraws):
+        for sample in batch:
+            for buf, value in zip(deques, sample):
+                buf.pop()
+                buf.appendleft(value)
+        arrays = [np.asarray(buf) for buf in deques]
+    deque_time = (time.time() - start) / redraws
+
+    buffer = RingBuffer(capacity, 4)
+    start = time.time()
+    for _ in range(redraws):
+        buffer.extend(batch)
+        arrays = [channel for channel in buffer.view()]
+    ring_time = (time.time() - start) / redraws
+
+    print('%d sample window, %d new samples per redraw:' % (capacity, len(batch)))
+    print('  deques: %.3fms per redraw' % (1000 * deque_time))
+    print('  RingBuffer: %.3fms per redraw (%.0fx)' % (1000 * ring_time,
+                                                       deque_time / ring_time))
@@ -0,0 +1,437 @@
+#! /usr/bin/env python3
+
+##########################################################################################
+# serial_acquisition.py
+#
+# Acquisition from several serial devices at once, with asyncio
+#
+# Each port is read in its own dedicated thread (blocking reads of whatever has
+# arrived), and the chunks are handed to the asyncio event loop, where they are decoded - binary
+# packets with serial_packets.decode, or the lines of text of the original sketch.
+# Samples are timestamped on arrival, on one clock for all of the devices (seconds
+# since the service started):
+#   - packets carry the board's microsecond timestamp, so each sample is placed at
+#     its board time plus the smallest arrival - board time offset seen so far,
+#     which tracks the transmission delay from below
+#   - lines of text are spread evenly between the arrival of the previous chunk
+#     and this one
+#
+# The batches of samples are fanned out to any number of consumers, each with its own
+# bounded asyncio.Queue. A full queue either holds up the device until the consumer
+# catches up (backpressure, for recording and analysis that must see every sample),
+# or drops its oldest batch (for plotting, which only needs the latest). Holding up
+# the device blocks its reader thread, so the bytes wait in the serial port instead
+# of piling up in memory.
+#
+# record_batches is a consumer that records each device with a
+# serial_recorder.Recorder.
+#
+# FakeDevice streams an input shaping signal through a pseudo-terminal, so all of this
+# can be run without any boards attached.
+#
+# Requires Python 3 and pySerial, FakeDevice requires a POSIX system (pty)
+#
+# Usage:
+#   service = AcquisitionService([Device('left', '/dev/ttyUSB0'),
+#                                 Device('right', '/dev/ttyUSB1')])
+#   recording = service.subscribe()
+#   plotting = service.subscribe(maxsize=4, drop=True)
+#   asyncio.run(service.run())             # with consumers awaiting recording.get()
+#
+#   python3 serial_acquisition.py          # three fake devices
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+import asyncio
+import collections
+import os
+import threading
+import time
+
+import numpy as np
+import serial
+
+from serial_packets import BAUD_RATE, CHANNELS, decode, encode
+from serial_recorder import Recorder
+
+# Default size of the consumer queues (batches)
+QUEUE_SIZE = 64
+
+# Largest number of bytes read from a port at once
+READ_SIZE = 1 << 16
+
+# A batch of samples from one device - the name of the device, the (N,) array of
+# times (s, on the service clock), and the (N, 4) array of samples
+Batch = collections.namedtuple('Batch', 'device time samples')
+
+
+class Device(object):
+    """
+    A serial device, and the state of decoding its stream.
+
+    Arguments:
+        name :  name the batches of the device are labeled with
+        port :  serial port, like '/dev/tty.usbserial-A601EGPS'
+        baudrate :  baud rate
+        binary :  True for serial_packets packets, False for lines of text
+    """
+    def __init__(self, name, port, baudrate=BAUD_RATE, binary=True):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.binary = binary
+
+        self.samples = 0                # samples received
+        self.lost = 0                   # packets missing from the sequence numbers
+        self.skipped = 0                # bytes that weren't part of a sample
+        self.error = None               # exception that stopped the reader thread
+
+        self._pending = b''             # bytes of an incomplete packet or line
+        self._last_arrival = None
+        self._last_sequence = None
+        self._last_board_time = None    # us, unwrapped
+        self._offset = np.inf           # service clock - board clock (s)
+
+    def decode(self, chunk, arrival):
+        """ Returns the (time, samples) arrays of a chunk of bytes received at arrival """
+        data = self._pending + chunk
+        if self.binary:
+            times, samples, consumed = self._decode_packets(data, arrival)
+        else:
+            times, samples, consumed = self._decode_text(data, arrival)
+        self._pending = data[consumed:]
+        self._last_arrival = arrival
+        self.samples += len(samples)
+        return times, samples
+
+    def _decode_packets(self, data, arrival):
+        packets, consumed, skipped = decode(data)
+        self.skipped += skipped
+        if len(packets) == 0:
+            return np.empty(0), np.empty((0, len(CHANNELS))), consumed
+
+        sequence = packets['sequence'].astype(np.int64)
+        board_time = packets['timestamp'].astype(np.int64)
+        if self._last_sequence is not None:
+            sequence = np.concatenate(([self._last_sequence], sequence))
+            board_time = np.concatenate(([self._last_board_time], board_time))
+        else:
+            sequence = np.concatenate(([sequence[0] - 1], sequence))
+            board_time = np.concatenate(([board_time[0]], board_time))
+        self.lost += int(((np.diff(sequence) - 1) % (1 << 16)).sum())
+
+        # Unwrap the 32-bit microsecond counter
+        board_time = board_time[0] + np.cumsum(np.diff(board_time) % (1 << 32))
+        self._last_sequence = sequence[-1]
+        self._last_board_time = board_time[-1]
+
+        # The last packet arrived with the chunk, the earlier ones before it
+        seconds = board_time / 1e6
+        self._offset = min(self._offset, arrival - seconds[-1])
+        return seconds + self._offset, packets['channels'].astype(float), consumed
+
+    def _decode_text(self, data, arrival):
+        consumed = data.rfind(b'\n') + 1
+        rows = []
+        for line in data[:consumed].splitlines():
+            try:
+                values = [float(val) for val in line.split()]
+            except ValueError:
+                values = []
+            if len(values) == len(CHANNELS):
+                rows.append(values)
+            else:
+                self.skipped += len(line) + 1
+
+        samples = np.array(rows, dtype=float).reshape(-1, len(CHANNELS))
+        start = arrival if self._last_arrival is None else self._last_arrival
+        times = np.linspace(start, arrival, len(samples) + 1)[1:]
+        return times, samples, consumed
+
+
+class AcquisitionService(object):
+    """
+    Acquires samples from several serial devices and fans them out to consumers.
+
+    Arguments:
+        devices :  list of Device
+        open_port :  function of a Device returning its opened port (default - a
+                     serial.Serial with a short timeout)
+    """
+    def __init__(self, devices, open_port=None):
+        self.devices = list(devices)
+        self.open_port = open_port or _open_port
+        self._subscribers = []
+        self._stop = threading.Event()
+        self.start_time = None
+
+    def subscribe(self, devices=None, maxsize=QUEUE_SIZE, drop=False):
+        """
+        Returns a new asyncio.Queue of Batches for a consumer.
+
+        Arguments:
+            devices :  names of the devices to receive, None for all of them
+            maxsize :  largest number of batches waiting in the queue
+            drop :  False to hold up the devices while the queue is full, True to
+                    drop the oldest batch instead. The number of batches dropped is
+                    the dropped attribute of the queue.
+        """
+        queue = asyncio.Queue(maxsize)
+        queue.dropped = 0
+        self._subscribers.append((queue, None if devices is None else set(devices), drop))
+        return queue
+
+    def stop(self):
+        """ Stops the service (from any thread) """
+        self._stop.set()
+
+    def now(self):
+        """ Time on the service clock (s) """
+        return time.monotonic() - self.start_time
+
+    async def run(self, duration=None):
+        """
+        Acquires until stop() is called, or for duration seconds. If the reader of a
+        port fails (a board unplugged, say), the service stops and the error is
+        raised, with the device as its device attribute.
+        """
+        loop = asyncio.get_running_loop()
+        self.start_time = time.monotonic()
+        self._stop.clear()
+
+        ports = []
+        try:
+            for device in self.devices:
+                ports.append(self.open_port(device))
+        except Exception:
+            for port in ports:
+                port.close()
+            raise
+
+        readers = [threading.Thread(target=self._read_port, args=(loop, device, port),
+                                    name='read %s' % device.name, daemon=True)
+                   for device, port in zip(self.devices, ports)]
+        for reader in readers:
+            reader.start()
+        try:
+            while not self._stop.is_set():
+                if duration is not None and self.now() >= duration:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            # The readers may be waiting on the loop, so don't block it while they stop
+            self._stop.set()
+            while any(reader.is_alive() for reader in readers):
+                await asyncio.sleep(0.01)
+            for port in ports:
+                port.close()
+
+        for device in self.devices:
+            if device.error is not None:
+                device.error.device = device
+                raise device.error
+
+    def _read_port(self, loop, device, port):
+        """ Reader thread of one port, which waits while the consumers are full """
+        try:
+            while not self._stop.is_set():
+                chunk = port.read(min(max(port.in_waiting, 1), READ_SIZE))
+                if not chunk:
+                    continue
+                arrival = self.now()
+                future = asyncio.run_coroutine_threadsafe(
+                    self._receive(device, chunk, arrival), loop)
+                future.result()
+        except Exception as error:
+            device.error = error
+            self._stop.set()
+
+    async def _receive(self, device, chunk, arrival):
+        times, samples = device.decode(chunk, arrival)
+        if len(samples):
+            await self._publish(Batch(device.name, times, samples))
+
+    async def _publish(self, batch):
+        for queue, devices, drop in self._subscribers:
+            if devices is not None and batch.device not in devices:
+                continue
+            if drop:
+                if queue.full():
+                    queue.get_nowait()
+                    queue.dropped += 1
+                queue.put_nowait(batch)
+            else:
+                # Wait (and hold up the device) while the consumer is behind,
+                # unless the service is stopping
+                while not self._stop.is_set():
+                    try:
+                        await asyncio.wait_for(queue.put(batch), 0.1)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+
+
+def _open_port(device):
+    return serial.Serial(device.port, device.baudrate, timeout=0.05)
+
+
+async def record_batches(queue, directory='.'):
+    """
+    Consumer that records the batches of each device to <directory>/<device>.dat,
+    until it is cancelled. Subscribe it without drop, so every sample is recorded.
+    """
+    recorders = {}
+    try:
+        while True:
+            batch = await queue.get()
+            if batch.device not in recorders:
+                filename = os.path.join(directory, batch.device + '.dat')
+                recorders[batch.device] = Recorder(filename,
+                                                   metadata={'device': batch.device})
+            recorders[batch.device].write(batch.time, batch.samples)
+    finally:
+        for recorder in recorders.values():
+            recorder.close()
+
+
+class FakeDevice(object):
+    """
+    Streams the signals of arduino_InputShaping_realTimePlot.ino through a
+    pseudo-terminal, which can be opened like a serial port.
+
+    Arguments:
+        rate :  samples per second
+        binary :  True for serial_packets packets, False for lines of text
+        period :  period of the button presses (s)
+        delay :  time from the A1 to the A2 impulse of the ZV shaper (s)
+    """
+    def __init__(self, rate=1000., binary=True, period=4., delay=1.):
+        import pty
+        import tty
+
+        self.rate = rate
+        self.binary = binary
+        self.period = period
+        self.delay = delay
+        self.sent = 0
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Starts streaming """
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops streaming and closes the pseudo-terminal """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def samples(self, index):
+        """ (N, 4) array of the unshaped, A1, A2, and shaped samples at sample index """
+        t = index / self.rate
+        unshaped = (t % self.period) < self.period / 2
+        delayed = ((t - self.delay) % self.period) < self.period / 2
+        A1 = 0.5 * unshaped
+        A2 = 0.5 * delayed
+        return np.column_stack((unshaped, A1, A2, A1 + A2)).astype(float)
+
+    def _write_loop(self):
+        # Non-blocking, so that a full pseudo-terminal (nobody reading it) can't
+        # keep the thread from stopping
+        os.set_blocking(self._master, False)
+        pending = b''
+
+        start = time.monotonic()
+        while not self._stop.is_set():
+            # Everything that should have been sent by now, in one write
+            due = int((time.monotonic() - start) * self.rate)
+            if due > self.sent:
+                index = np.arange(self.sent, due)
+                samples = self.samples(index)
+                if self.binary:
+                    data = encode(samples, index, (1e6 * index / self.rate).astype(np.int64))
+                else:
+                    data = ''.join('%.2f %.2f %.2f %.2f\n' % tuple(row)
+                                   for row in samples).encode()
+                pending += data
+                self.sent = due
+
+            try:
+                if pending:
+                    pending = pending[os.write(self._master, pending):]
+            except BlockingIOError:
+                pass
+            time.sleep(0.005)
+
+
+if __name__ == "__main__":
+    from ring_buffer import RingBuffer
+
+    fakes = [FakeDevice(1000.), FakeDevice(2000.), FakeDevice(200., binary=False)]
+    devices = [Device('board%d' % ii, fake.port, binary=fake.binary)
+               for ii, fake in enumerate(fakes)]
+    service = AcquisitionService(devices)
+
+    async def record(queue, recorded):
+        """ Keeps every sample """
+        while True:
+            batch = await queue.get()
+            recorded[batch.device].append(batch.samples)
+
+    async def analyze(queue, latency):
+        """ Tracks how long after its timestamp each batch is seen """
+        while True:
+            batch = await queue.get()
+            latency.append(service.now() - batch.time[-1])
+
+    async def plot(queue, buffers):
+        """ Keeps the last second of each device, as the plot would show """
+        while True:
+            batch = await queue.get()
+            buffers[batch.device].extend(batch.samples)
+            await asyncio.sleep(1 / 30.)        # as slow as redrawing at 30 Hz
+
+    async def main(duration):
+        recorded = collections.defaultdict(list)
+        latency = []
+        buffers = dict((device.name, RingBuffer(1000, 4)) for device in devices)
+
+        plotting = service.subscribe(maxsize=4, drop=True)
+        consumers = [asyncio.ensure_future(record(service.subscribe(), recorded)),
+                     asyncio.ensure_future(analyze(service.subscribe(), latency)),
+                     asyncio.ensure_future(plot(plotting, buffers))]
+        await service.run(duration)
+        for consumer in consumers:
+            consumer.cancel()
+        return recorded, latency, plotting.dropped
+
+    for fake in fakes:
+        fake.start()
+    recorded, latency, dropped = asyncio.run(main(3.))
+    for fake in fakes:
+        fake.stop()
+
+    for device, fake in zip(devices, fakes):
+        num_samples = sum(len(samples) for samples in recorded[device.name])
+        print('%s (%s, %.0f samples/s): %d received, %d recorded, %d lost, %d bytes '
+              'skipped' % (device.name, 'binary' if device.binary else 'text', fake.rate,
+                           device.samples, num_samples, device.lost, device.skipped))
+    print('Latency from timestamp to consumer: median %.1fms, max %.1fms' %
+          (1000 * np.median(latency), 1000 * np.max(latency)))
+    print('Plot batches dropped: %d' % dropped)
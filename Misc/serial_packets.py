@@ -0,0 +1,315 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# serial_packets.py
+#
+# Binary packet protocol and background reader for streaming samples over serial
+#
+# Each sample is a fixed-size, little-endian packet -
+#
+#   offset  size  field
+#        0     2  sync bytes, 0xA5 0x5A
+#        2     2  sequence number (uint16, wraps), to count lost packets
+#        4     4  timestamp (uint32, microseconds on the board, wraps)
+#        8    16  four channels (float32) - unshaped, A1, A2, shaped
+#       24     2  CRC-16/CCITT (uint16) of bytes 2 to 23
+#
+# as written by arduino_InputShaping_realTimePlot.ino with BINARY_OUTPUT defined. A
+# whole buffer of bytes is decoded at once - the sync bytes are found with NumPy, the
+# CRCs of all of the candidate packets are checked together, and the packets are read
+# with numpy.frombuffer. Garbage and corrupted packets are skipped, so the stream
+# resynchronizes by itself.
+#
+# PacketReader runs in a background thread, reading from the port in bulk into a
+# preallocated buffer and queueing the decoded batches, so the caller gets every sample
+# no matter how long it spends plotting.
+#
+# Requires pySerial (for PacketReader)
+#
+# Usage:
+#   reader = PacketReader(serial.Serial(strPort, BAUD_RATE, timeout=0.01)).start()
+#   packets = reader.read()                 # all of the packets since the last read
+#   plot(packets['channels'][:, 3])         # the shaped command
+#   reader.stop()
+#
+#   python serial_packets.py                # decoding benchmark
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import threading
+import time
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+import numpy as np
+
+SYNC = b'\xa5\x5a'
+
+# Names of the four channels
+CHANNELS = ('unshaped', 'A1', 'A2', 'shaped')
+
+PACKET_DTYPE = np.dtype([('sync', '<u2'),
+                         ('sequence', '<u2'),
+                         ('timestamp', '<u4'),
+                         ('channels', '<f4', (len(CHANNELS),)),
+                         ('crc', '<u2')])
+PACKET_SIZE = PACKET_DTYPE.itemsize
+
+# Baud rate of the binary output - exact on a 16 MHz AVR, and with 10 bits per byte,
+# room for about 1900 packets/s, so 4 channels at 1 kHz
+BAUD_RATE = 500000
+
+# Size of the buffer the reader thread reads the port into (bytes)
+BUFFER_SIZE = 1 << 16
+
+
+def _crc_table():
+    """ Byte-at-a-time table for CRC-16/CCITT (polynomial 0x1021) """
+    table = np.arange(256, dtype=np.uint32) << 8
+    for _ in range(8):
+        table = np.where(table & 0x8000, (table << 1) ^ 0x1021, table << 1)
+    return (table & 0xFFFF).astype(np.uint16)
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(data):
+    """
+    CRC-16/CCITT (initial value 0xFFFF) of every row of a 2D uint8 array, or of a
+    bytes-like object.
+    """
+    data = np.asarray(bytearray(data) if not isinstance(data, np.ndarray) else data,
+                      dtype=np.uint8)
+    rows = np.atleast_2d(data)
+
+    # One byte of every row at a time
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for column in rows.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+
+    return crc if data.ndim == 2 else int(crc[0])
+
+
+def encode(channels, sequence=None, timestamp=None):
+    """
+    Packs samples into packets, as the board sends them.
+
+    Arguments:
+        channels :  (N, 4) array of samples, one row per packet
+        sequence :  sequence numbers (default - counting from 0)
+        timestamp :  timestamps (us, default - 1000us apart)
+
+    Returns:
+        bytes of the N packets
+    """
+    channels = np.asarray(channels, dtype=np.float32).reshape(-1, len(CHANNELS))
+    if sequence is None:
+        sequence = np.arange(len(channels))
+    if timestamp is None:
+        timestamp = 1000 * np.arange(len(channels))
+
+    packets = np.zeros(len(channels), PACKET_DTYPE)
+    packets['sync'] = np.frombuffer(SYNC, '<u2')[0]
+    packets['sequence'] = np.asarray(sequence) & 0xFFFF
+    packets['timestamp'] = np.asarray(timestamp) & 0xFFFFFFFF
+    packets['channels'] = channels
+
+    raw = packets.view(np.uint8).reshape(len(packets), PACKET_SIZE)
+    packets['crc'] = crc16(raw[:, 2:PACKET_SIZE - 2])
+    return packets.tobytes()
+
+
+def decode(buffer):
+    """
+    Decodes all of the complete packets in a buffer of received bytes.
+
+    Arguments:
+        buffer :  bytes-like object (bytes, bytearray, memoryview, uint8 array)
+
+    Returns:
+        (packets, consumed, skipped) - the structured array of PACKET_DTYPE packets,
+        the number of bytes of the buffer used up (the rest may be the start of a
+        packet, so they should be kept for the next call), and the number of those
+        bytes that weren't part of a valid packet
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    last_start = len(data) - PACKET_SIZE
+    if last_start < 0:
+        return np.empty(0, PACKET_DTYPE), 0, 0
+
+    # Every place a complete packet could start
+    starts = np.flatnonzero((data[:last_start + 1] == SYNC[0]) &
+                            (data[1:last_start + 2] == SYNC[1]))
+
+    # Check all of the candidates at once
+    rows = data[starts[:, np.newaxis] + np.arange(PACKET_SIZE)]
+    crc = rows[:, -2].astype(np.uint16) | (rows[:, -1].astype(np.uint16) << 8)
+    valid = crc16(rows[:, 2:-2]) == crc
+    starts, rows = starts[valid], rows[valid]
+
+    # A valid packet can only overlap another by chance, in which case keep the first
+    if np.any(np.diff(starts) < PACKET_SIZE):
+        keep = []
+        end = 0
+        for ii, start in enumerate(starts):
+            if start >= end:
+                keep.append(ii)
+                end = start + PACKET_SIZE
+        starts, rows = starts[keep], rows[keep]
+
+    packets = np.ascontiguousarray(rows).view(PACKET_DTYPE).ravel()
+
+    # Keep the bytes that could still be the start of a packet
+    end = starts[-1] + PACKET_SIZE if len(starts) else 0
+    consumed = max(end, last_start + 1)
+    return packets, consumed, consumed - len(packets) * PACKET_SIZE
+
+
+class PacketReader(object):
+    """
+    Reads and decodes packets from a serial port in a background thread.
+
+    Arguments:
+        port :  opened serial.Serial (or anything with a readinto() like it), with a
+                short timeout, so the thread can stop
+        buffer_size :  size of the receive buffer (bytes)
+
+    Attributes:
+        packets :  number of packets received
+        lost :  number of packets missing from the sequence numbers
+        skipped :  number of bytes received that weren't part of a valid packet
+    """
+    def __init__(self, port, buffer_size=BUFFER_SIZE):
+        self.port = port
+        self._buffer = bytearray(buffer_size)
+        self._queue = Queue()
+        self._running = False
+        self._thread = None
+        self.error = None
+
+        self.packets = 0
+        self.lost = 0
+        self.skipped = 0
+        self._last_sequence = None
+
+    def start(self):
+        """ Starts the reader thread """
+        self._running = True
+        self._thread = threading.Thread(target=self._read_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the reader thread """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def _read_loop(self):
+        view = memoryview(self._buffer)
+        fill = 0
+        try:
+            while self._running:
+                num_read = self.port.readinto(view[fill:])
+                if not num_read:
+                    continue
+                fill += num_read
+
+                packets, consumed, skipped = decode(view[:fill])
+                self._count(packets)
+                self.skipped += skipped
+                if len(packets):
+                    self._queue.put(packets)
+
+                # Move the partial packet at the end to the front
+                self._buffer[:fill - consumed] = self._buffer[consumed:fill]
+                fill -= consumed
+        except Exception as error:
+            self.error = error
+        finally:
+            self._running = False
+
+    def _count(self, packets):
+        """ Counts the packets, and the ones lost, from the sequence numbers """
+        if len(packets) == 0:
+            return
+        sequence = packets['sequence'].astype(np.int64)
+        if self._last_sequence is not None:
+            sequence = np.concatenate(([self._last_sequence], sequence))
+        gaps = (np.diff(sequence) - 1) % (1 << 16)
+        self.lost += int(gaps.sum())
+        self.packets += len(packets)
+        self._last_sequence = sequence[-1]
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def backlog(self):
+        """ Number of decoded batches waiting to be read """
+        return self._queue.qsize()
+
+    def read(self, timeout=None):
+        """
+        Returns the array of all of the packets received since the last read, waiting
+        up to timeout seconds for one if there are none (None to wait as long as the
+        reader is running)
+        """
+        batches = []
+        while True:
+            try:
+                batches.append(self._queue.get(timeout=0.1 if timeout is None else timeout))
+                break
+            except Empty:
+                if timeout is not None or not self._running:
+                    break
+        while True:
+            try:
+                batches.append(self._queue.get_nowait())
+            except Empty:
+                break
+
+        if self.error is not None and not batches:
+            raise self.error
+        if not batches:
+            return np.empty(0, PACKET_DTYPE)
+        return np.concatenate(batches)
+
+
+if __name__ == "__main__":
+    num_samples = 100000
+    t = np.arange(num_samples) / 1000.
+    samples = np.column_stack((t % 1 > 0.5, 0.5 * (t % 1 > 0.5), 0.5 * (t % 1 > 1.0),
+                               np.sin(t)))
+
+    # The text the sketch prints, parsed as the plotting script does
+    text = ''.join('%.2f %.2f %.2f %.2f\n' % tuple(row) for row in samples)
+    start = time.time()
+    for line in text.splitlines():
+        data = [float(val) for val in line.split()]
+    text_time = time.time() - start
+
+    # The same samples as packets, with some garbage in the stream
+    stream = bytearray(encode(samples))
+    stream[1000:1003] = b'\x00\xa5\x5a'
+    start = time.time()
+    packets, consumed, skipped = decode(stream)
+    binary_time = time.time() - start
+
+    print('Text lines: %.0f samples/s' % (num_samples / text_time))
+    print('Binary packets: %.0f samples/s (%d packets, %d bytes skipped)' %
+          (num_samples / binary_time, len(packets), skipped))
+    print('At %d baud, the packets can carry %.0f samples/s' %
+          (BAUD_RATE, BAUD_RATE / 10 / PACKET_SIZE))
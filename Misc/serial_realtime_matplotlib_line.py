@@ -17,41 +17,93 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - added the binary option, to read the packets of the sketch with
+#         BINARY_OUTPUT defined with serial_packets.PacketReader, in the background
+#   * 10/18/26
+#       - AnalogData keeps the samples in a ring_buffer.RingBuffer instead of four
+#         deques, and its channels are views of it, so nothing is rebuilt from a
+#         deque for every redraw
+#       - the unshaped channel is now filled, too
+#   * 10/18/26
+#       - the serial port is read in an acquisition thread, and the plot is redrawn
+#         at frame_rate instead of after every sample, blitting only the lines
+#       - prints the frames drawn and dropped, and the largest backlog, at exit
+#       - garbled lines are skipped, and the plot stops (and the error is raised) if
+#         the acquisition thread fails
+#   * 10/18/26
+#       - added record_filename, to record every sample with
+#         serial_recorder.Recorder, and replay_filename, to plot a recording
+#         instead of the serial port
+#       - binary packets are recorded with the board's timestamps, and the text
+#         port has a timeout, so the acquisition thread always stops before the
+#         recorder is closed
 #
 ##########################################################################################
 
 
-import sys, serial
+import sys, serial, threading, time
 import numpy as np
 from time import sleep
-from collections import deque
 from matplotlib import pyplot as plt
+from ring_buffer import RingBuffer
+from serial_packets import PacketReader, BAUD_RATE
+from serial_recorder import Recorder, record_packets, record_samples, replay_samples
+
+# Set to True for the binary packets of arduino_InputShaping_realTimePlot.ino with
+# BINARY_OUTPUT defined, instead of its lines of text
+binary = False
+
+# Plot redraws per second, independent of the sample rate
+frame_rate = 30
+
+# Set to a filename to record every sample received (load it with
+# serial_recorder.load_recording)
+record_filename = None
+
+# Set to the filename of a recording to plot it instead of the serial port, at
+# replay_speed times the recorded rate
+replay_filename = None
+replay_speed = 1.0
 
 # class that holds analog data for N samples
 class AnalogData:
   # constr
   def __init__(self, maxLen):
-    self.unshaped = deque([0.0]*maxLen)
-    self.A1 = deque([0.0]*maxLen)
-    self.A2 = deque([0.0]*maxLen)
-    self.shaped = deque([0.0]*maxLen)
+    # the four channels - unshaped, A1, A2, shaped
+    self.buffer = RingBuffer(maxLen, 4)
     self.maxLen = maxLen
 
-  # ring buffer
-  def addToBuf(self, buf, val):
-    if len(buf) < self.maxLen:
-      buf.append(val)
-    else:
-      buf.pop()
-      buf.appendleft(val)
+    # samples are added by the acquisition thread while the plot reads them
+    self.lock = threading.Lock()
+
+  # the channels, newest sample first, as views of the ring buffer (not copies)
+  @property
+  def unshaped(self):
+    return self.buffer.view()[0, ::-1]
+
+  @property
+  def A1(self):
+    return self.buffer.view()[1, ::-1]
+
+  @property
+  def A2(self):
+    return self.buffer.view()[2, ::-1]
+
+  @property
+  def shaped(self):
+    return self.buffer.view()[3, ::-1]
 
   # add data
   def add(self, data):
     assert(len(data) == 4)
-    self.addToBuf(self.A1, data[1])
-    self.addToBuf(self.A2, data[2])
-    self.addToBuf(self.shaped, data[3])
+    with self.lock:
+      self.buffer.append(data)
+
+  # add an (N, 4) array of samples, oldest first
+  def extend(self, data):
+    with self.lock:
+      self.buffer.extend(data)
     
 # plot class
 class AnalogPlot:
@@ -60,10 +112,11 @@ class AnalogPlot:
     # set plot to animated
     fig = plt.figure(figsize=(8,4.5))
     plt.ion() 
+    self.fig = fig
     
     
     plt.subplot(2,1,1)
-    self.shapedline, = plt.plot(analogData.shaped,color='black',label=r'Shaped Command')#,linestyle='.-')
+    self.shapedline, = plt.plot(analogData.shaped,color='black',label=r'Shaped Command',animated=True)#,linestyle='.-')
     plt.xticks([])
     plt.ylim([0, 1.501])
     plt.yticks([0,0.5,1.0],['0','0.5','1.0'])
@@ -73,8 +126,8 @@ class AnalogPlot:
     
     
     plt.subplot(2,1,2)
-    self.A1line, = plt.plot(analogData.A1,color='blue',label=r'$A_1$ Component')#,linestyle='--')
-    self.A2line, = plt.plot(analogData.A2,color='red',label=r'$A_2$ Component')#,linestyle='-.')
+    self.A1line, = plt.plot(analogData.A1,color='blue',label=r'$A_1$ Component',animated=True)#,linestyle='--')
+    self.A2line, = plt.plot(analogData.A2,color='red',label=r'$A_2$ Component',animated=True)#,linestyle='-.')
     plt.ylim([0, 1.501])
     plt.yticks([0,0.5,1.0],['0','0.5','1.0'])
     
@@ -86,13 +139,112 @@ class AnalogPlot:
 #     plt.ylabel('Amplitude',fontsize=22,weight='bold',labelpad=10)
     plt.text(-15, 2, 'Amplitude',family='CMU Serif',weight='bold',fontsize=22,rotation=90)
 
-    
+    # The lines are animated, so a full draw leaves them out. The rest of the figure
+    # is saved after each full draw (the first, or after a resize), and each update
+    # only redraws the lines over it.
+    self.lines = [self.shapedline, self.A1line, self.A2line]
+    self.background = None
+    fig.canvas.mpl_connect('draw_event', self.on_draw)
+
+  # save the background after a full draw of the figure
+  def on_draw(self, event):
+    self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+    self.draw_lines()
+
+  def draw_lines(self):
+    for line in self.lines:
+      self.fig.draw_artist(line)
+
   # update plot
   def update(self, analogData):
-    self.A1line.set_ydata(analogData.A1)
-    self.A2line.set_ydata(analogData.A2)
-    self.shapedline.set_ydata(analogData.shaped)
-    plt.draw()
+    with analogData.lock:
+      self.A1line.set_ydata(analogData.A1)
+      self.A2line.set_ydata(analogData.A2)
+      self.shapedline.set_ydata(analogData.shaped)
+
+    canvas = self.fig.canvas
+    if self.background is None:
+      canvas.draw()
+    else:
+      canvas.restore_region(self.background)
+      self.draw_lines()
+      canvas.blit(self.fig.bbox)
+    canvas.flush_events()
+
+# the samples of the text lines of the sketch, one at a time. The port has a timeout,
+# so an empty batch is yielded while nothing arrives, for acquire to check stop.
+def text_samples(ser):
+  line = b''
+  while True:
+    line += ser.readline()
+    if not line.endswith(b'\n'):
+      yield np.empty((0, 4))        # timed out, maybe partway through a line
+      continue
+
+    text, line = line, b''
+    try:
+      data = [float(val) for val in text.split()]
+    except ValueError:
+      continue        # a garbled line, like the partial one when the port opens
+    if(len(data) == 4):
+      yield np.array([data])
+
+# the batches of binary packets, decoded in the background
+def packet_batches(reader):
+  while reader.running:
+    yield reader.read(0.1)
+  if reader.error is not None:
+    raise reader.error
+
+# the samples of the binary packets
+def packet_samples(reader):
+  for packets in packet_batches(reader):
+    yield packets['channels']
+
+# acquisition thread - adds every sample from source to analogData until stop is set.
+# It sets stop itself when the source ends or fails, with the error added to errors.
+def acquire(source, analogData, stop, errors):
+  try:
+    for samples in source:
+      analogData.extend(samples)
+      if stop.is_set():
+        break
+  except Exception as error:
+    errors.append(error)
+  finally:
+    stop.set()
+
+# redraw analogPlot at frame_rate until stop is set, returning the number of frames
+# drawn and dropped (when a redraw took longer than a frame), and the largest backlog
+def render(analogPlot, analogData, stop, frame_rate=frame_rate, backlog=None):
+  period = 1.0/frame_rate
+  frames = 0
+  dropped = 0
+  max_backlog = 0
+
+  next_frame = time.time()
+  try:
+    while not stop.is_set():
+      delay = next_frame - time.time()
+      if delay > 0:
+        sleep(delay)
+
+      analogPlot.update(analogData)
+      frames += 1
+      if backlog is not None:
+        max_backlog = max(max_backlog, backlog())
+
+      # skip the frames there wasn't time for, rather than falling behind
+      next_frame += period
+      late = time.time() - next_frame
+      if late > 0:
+        missed = int(late/period) + 1
+        dropped += missed
+        next_frame += missed*period
+  except KeyboardInterrupt:
+    print('exiting')
+
+  return frames, dropped, max_backlog
 
 # main() function
 def main():
@@ -103,26 +255,65 @@ def main():
   analogData = AnalogData(100)
   analogPlot = AnalogPlot(analogData)
 
-  print 'plotting data...'
+  print('plotting data...')
+
+  recorder = None
+  if record_filename:
+    recorder = Recorder(record_filename, metadata={'port': strPort, 'binary': binary})
+
+  ser = None
+  if replay_filename:
+    source = replay_samples(replay_filename, replay_speed)
+    backlog = None
+    if recorder is not None:
+      source = record_samples(source, recorder)
+  elif binary:
+    # open serial port, with a short timeout so the reader thread can stop
+    ser = serial.Serial(strPort, BAUD_RATE, timeout=0.01)
+    reader = PacketReader(ser).start()
+    backlog = lambda: reader.backlog        # decoded batches waiting
+    if recorder is not None:
+      # recorded with the board's timestamps
+      source = record_packets(packet_batches(reader), recorder)
+    else:
+      source = packet_samples(reader)
+  else:
+    # open serial port, with a timeout so the acquisition thread can stop
+    ser = serial.Serial(strPort, 9600, timeout=0.1)
+    source = text_samples(ser)
+    backlog = lambda: ser.in_waiting        # bytes waiting in the port
+    if recorder is not None:
+      # timestamped on arrival
+      source = record_samples(source, recorder)
+
+  stop = threading.Event()
+  errors = []
+  acquisition = threading.Thread(target=acquire, args=(source, analogData, stop, errors))
+  acquisition.daemon = True
+  acquisition.start()
+
+  frames, dropped, max_backlog = render(analogPlot, analogData, stop, frame_rate, backlog)
+  stop.set()
+
+  print('%d samples, %d frames drawn, %d dropped, largest backlog %d' %
+        (analogData.buffer.count, frames, dropped, max_backlog))
+
+  if binary and ser is not None:
+    reader.stop()
+  # the recorder can only be closed once nothing else is written to it
+  acquisition.join()
+  if recorder is not None:
+    recorder.close()
+    print('%d samples recorded to %s' % (recorder.num_rows, record_filename))
 
-  # open serial port
-  ser = serial.Serial(strPort, 9600)
-  
-  while True:
-    try:
-      line = ser.readline()
-#       print line
-      data = [float(val) for val in line.split()]
-      #print data
-      if(len(data) == 4):
-        analogData.add(data)
-        analogPlot.update(analogData)
-    except KeyboardInterrupt:
-      print 'exiting'
-      break
   # close serial
-  ser.flush()
-  ser.close()
+  if ser is not None:
+    ser.flush()
+    ser.close()
+
+  # the acquisition failed, rather than the plot being closed
+  if errors:
+    raise errors[0]
 
 # call main
 if __name__ == '__main__':
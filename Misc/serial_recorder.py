@@ -0,0 +1,284 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# serial_recorder.py
+#
+# Lossless recording of serial samples to memory-mapped files, and replay
+#
+# Recorder appends timestamped samples to a binary file of fixed-size records - a
+# float64 time and a float32 per channel - through a memory map. The file is grown in
+# large steps, remapped each time, and cut to the samples written when it's closed.
+# Every chunk_rows samples, the file is flushed and an entry is added to a small index
+# file next to it, with the rows and times of the chunk. The index is only written
+# after its samples are on disk, so a recording is readable up to the last chunk even
+# if the program stops without closing it.
+#
+# load_recording memory-maps a recording, so hours of samples are read from disk only
+# as they are used, and the index finds the samples of any span of time without
+# reading the rest. replay_samples yields the samples of a recording in batches, at
+# their recorded rate, or faster, so a recording can be fed back through the same
+# AnalogData and AnalogPlot as the serial port.
+#
+# Usage:
+#   recorder = Recorder('run1.dat')
+#   recorder.write(times, samples)          # (N,) times (s) and (N, 4) samples
+#   recorder.close()
+#
+#   data, index, metadata = load_recording('run1.dat')
+#   plot(data['time'], data['channels'][:, 3])
+#
+#   for samples in record_packets(batches, recorder):   # batches of packets
+#       analogData.extend(samples)
+#
+#   for samples in replay_samples('run1.dat', speed=10.):
+#       analogData.extend(samples)
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import json
+import os
+import time
+
+import numpy as np
+
+from serial_packets import CHANNELS
+
+# Samples between index entries (and flushes to disk)
+CHUNK_ROWS = 4096
+
+# Samples the file is grown by when it fills
+GROW_ROWS = 1 << 20
+
+# Recording time in each batch of replay_samples (s)
+BATCH_TIME = 0.02
+
+INDEX_DTYPE = np.dtype([('start', '<i8'),           # first row of the chunk
+                        ('rows', '<i8'),            # number of rows in the chunk
+                        ('first_time', '<f8'),
+                        ('last_time', '<f8')])
+
+
+def record_dtype(num_channels=len(CHANNELS)):
+    """ Data type of one record - the time and a value for each channel """
+    return np.dtype([('time', '<f8'), ('channels', '<f4', (num_channels,))])
+
+
+def index_filename(filename):
+    """ Name of the index file that goes with a recording """
+    return os.path.splitext(filename)[0] + '.idx'
+
+
+def metadata_filename(filename):
+    """ Name of the metadata file that goes with a recording """
+    return os.path.splitext(filename)[0] + '.json'
+
+
+class Recorder(object):
+    """
+    Appends samples to a memory-mapped recording.
+
+    Arguments:
+        filename :  name of the recording
+        channels :  names of the channels
+        metadata :  dict saved to the .json file next to the recording
+        chunk_rows :  samples between index entries (and flushes to disk)
+        grow_rows :  samples the file is grown by when it fills
+    """
+    def __init__(self, filename, channels=CHANNELS, metadata=None,
+                 chunk_rows=CHUNK_ROWS, grow_rows=GROW_ROWS):
+        self.filename = filename
+        self.channels = tuple(channels)
+        self.dtype = record_dtype(len(self.channels))
+        self.chunk_rows = chunk_rows
+        self.grow_rows = grow_rows
+
+        self.num_rows = 0
+        self._chunk_start = 0           # first row not in the index yet
+        self._capacity = 0
+        self._map = None
+
+        metadata = dict(metadata or {})
+        metadata.setdefault('channels', list(self.channels))
+        metadata.setdefault('created', time.strftime('%Y-%m-%d %H:%M:%S'))
+        with open(metadata_filename(filename), 'w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+
+        self._file = open(filename, 'w+b')
+        self._index = open(index_filename(filename), 'wb')
+
+    def _grow(self, num_rows):
+        """ Grows the file to hold at least num_rows, and remaps it """
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+
+        self._capacity = max(self._capacity + self.grow_rows, num_rows)
+        self._file.truncate(self._capacity * self.dtype.itemsize)
+        self._map = np.memmap(self._file, self.dtype, 'r+', shape=(self._capacity,))
+
+    def write(self, times, samples):
+        """ Appends the (N,) array of times (s) and (N, channels) array of samples """
+        samples = np.asarray(samples).reshape(-1, len(self.channels))
+        end = self.num_rows + len(samples)
+        if end > self._capacity:
+            self._grow(end)
+
+        self._map['time'][self.num_rows:end] = times
+        self._map['channels'][self.num_rows:end] = samples
+        self.num_rows = end
+
+        if self.num_rows - self._chunk_start >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """ Writes the samples since the last flush to disk, and indexes them """
+        if self.num_rows == self._chunk_start:
+            return
+
+        self._map.flush()
+
+        entry = np.zeros(1, INDEX_DTYPE)
+        entry['start'] = self._chunk_start
+        entry['rows'] = self.num_rows - self._chunk_start
+        entry['first_time'] = self._map['time'][self._chunk_start]
+        entry['last_time'] = self._map['time'][self.num_rows - 1]
+        self._index.write(entry.tobytes())
+        self._index.flush()
+
+        self._chunk_start = self.num_rows
+
+    def close(self):
+        """ Flushes the samples, and cuts the file down to them """
+        if self._file.closed:
+            return
+
+        self.flush()
+        self._map = None
+        self._file.truncate(self.num_rows * self.dtype.itemsize)
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_recording(filename):
+    """
+    Returns (data, index, metadata) of a recording. data is a memory-mapped
+    structured array with 'time' and 'channels' fields, index the array of
+    INDEX_DTYPE chunks, and metadata the dict from the .json file.
+    """
+    with open(metadata_filename(filename)) as metadata_file:
+        metadata = json.load(metadata_file)
+    dtype = record_dtype(len(metadata['channels']))
+
+    index = np.fromfile(index_filename(filename), INDEX_DTYPE)
+    num_rows = int(index['start'][-1] + index['rows'][-1]) if len(index) else 0
+
+    if num_rows == 0:
+        return np.empty(0, dtype), index, metadata
+    return np.memmap(filename, dtype, 'r', shape=(num_rows,)), index, metadata
+
+
+def time_span(data, index, start=None, stop=None):
+    """
+    Returns the rows of a recording with start <= time < stop, using the index to
+    read only the chunks at either end.
+    """
+    first, last = 0, len(data)
+    if start is not None:
+        chunk = np.searchsorted(index['last_time'], start)
+        if chunk == len(index):
+            return data[:0]
+        offset = index['start'][chunk]
+        chunk_time = data['time'][offset:offset + index['rows'][chunk]]
+        first = offset + np.searchsorted(chunk_time, start)
+    if stop is not None:
+        chunk = np.searchsorted(index['last_time'], stop)
+        if chunk < len(index):
+            offset = index['start'][chunk]
+            chunk_time = data['time'][offset:offset + index['rows'][chunk]]
+            last = offset + np.searchsorted(chunk_time, stop)
+    return data[first:max(first, last)]
+
+
+def replay_samples(filename, speed=1., batch_time=BATCH_TIME, start=None, stop=None):
+    """
+    Yields the samples of a recording, as (N, channels) arrays of batch_time of
+    recording each.
+
+    Arguments:
+        filename :  name of the recording
+        speed :  multiple of the recorded rate to replay at, None for as fast as
+                 possible
+        batch_time :  recording time in each batch (s)
+        start, stop :  span of the recording to replay (s, default - all of it)
+    """
+    data, index, metadata = load_recording(filename)
+    data = time_span(data, index, start, stop)
+    if len(data) == 0:
+        return
+
+    times = data['time']
+    first_time = times[0]
+    boundaries = np.arange(first_time + batch_time, times[-1] + batch_time, batch_time)
+
+    wall_start = time.time()
+    row = 0
+    for boundary in boundaries:
+        end = row + np.searchsorted(times[row:], boundary)
+        if speed is not None:
+            delay = wall_start + (boundary - first_time) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        if end > row:
+            yield np.asarray(data['channels'][row:end], dtype=float)
+        row = end
+
+    if row < len(data):
+        yield np.asarray(data['channels'][row:], dtype=float)
+
+
+def record_samples(source, recorder):
+    """
+    Records the batches of samples of source as they pass through, timestamping
+    them on arrival, spread evenly since the previous batch. For a source with
+    timestamps of its own, like serial_packets packets, use record_packets.
+    """
+    start = time.time()
+    last = 0.
+    for samples in source:
+        now = time.time() - start
+        recorder.write(np.linspace(last, now, len(samples) + 1)[1:], samples)
+        last = now
+        yield samples
+
+
+def record_packets(source, recorder):
+    """
+    Records the batches of serial_packets packets of source as they pass through,
+    timestamped with the board's microsecond time (s since the first packet, with
+    the 32-bit counter unwrapped), yielding the (N, 4) array of samples of each
+    """
+    last_stamp = None           # last timestamp received, and its unwrapped time (us)
+    last_time = 0
+    for packets in source:
+        if len(packets):
+            stamps = packets['timestamp'].astype(np.int64)
+            if last_stamp is None:
+                last_stamp = stamps[0]
+            steps = np.diff(np.concatenate(([last_stamp], stamps))) % (1 << 32)
+            times = last_time + np.cumsum(steps)
+            last_stamp, last_time = stamps[-1], times[-1]
+            recorder.write(times / 1e6, packets['channels'])
+        yield packets['channels']
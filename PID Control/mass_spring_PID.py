@@ -15,7 +15,9 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - simulate with discrete_sim.zoh_response, as forced_response returns only
+#         (T, yout) in python-control 0.10
 #
 ##########################################################################################
 
@@ -33,6 +35,12 @@ from numpy import *             # Grab all of the NumPy functions
 from matplotlib.pyplot import * # Grab MATLAB-like plotting functions
 import control                  # import the control system functions
 
+# discrete_sim is shared with the scripts in Command Generation
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'Command Generation'))
+from discrete_sim import zoh_response    # exact ZOH simulation of sampled inputs
+
 # Uncomment to use LaTeX to process the text in figure
 rc('text',usetex=True)
 
@@ -58,8 +66,8 @@ sys = control.tf(num,den);
 F = zeros(500)  # Define an array of all zeros
 F[25:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 
-# run the simulation - utilize the built-in forced_response function
-[T,yout,xout] = control.forced_response(sys,t,F)
+# run the simulation - exact for the input held constant between samples
+[T,yout,xout] = zoh_response(sys,t,F)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -103,8 +111,8 @@ sysP = control.tf(numP,denP);
 Xd = zeros(500)  # Define an array of all zeros
 Xd[50:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 
-# run the simulation - utilize the built-in forced_response function
-[T_P,yout_P,xout_P] = control.forced_response(sysP,t,Xd)
+# run the simulation - exact for the input held constant between samples
+[T_P,yout_P,xout_P] = zoh_response(sysP,t,Xd)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -147,8 +155,8 @@ sysPD = control.tf(numPD,denPD);
 Xd = zeros(500)  # Define an array of all zeros
 Xd[50:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 
-# run the simulation - utilize the built-in forced_response function
-[T_PD,yout_PD,xout_PD] = control.forced_response(sysPD,t,Xd)
+# run the simulation - exact for the input held constant between samples
+[T_PD,yout_PD,xout_PD] = zoh_response(sysPD,t,Xd)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -191,8 +199,8 @@ sysPID = control.tf(numPID,denPID);
 Xd = zeros(500)  # Define an array of all zeros
 Xd[50:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 
-# run the simulation - utilize the built-in forced_response function
-[T_PID,yout_PID,xout_PID] = control.forced_response(sysPID,t,Xd)
+# run the simulation - exact for the input held constant between samples
+[T_PID,yout_PID,xout_PID] = zoh_response(sysPID,t,Xd)
 
 # Make the figure pretty, then plot the results
 #   "pretty" parameters selected based on pdf output, not screen output
@@ -15,7 +15,14 @@
 #   - http://www.ucs.louisiana.edu/~jev9637
 #
 # Modified:
-#   *
+#   * 10/18/26
+#       - compute the controller output with pid_controller.PID, which uses a
+#         running integral of the error
+#       - the derivative is now divided by the time step, in the force and the
+#         error_deriv plot, so the direct application kick at the setpoint step
+#         grows from about 5N to about 500N
+#       - simulate with discrete_sim.zoh_response, as forced_response returns only
+#         (T, yout) in python-control 0.10
 #
 ##########################################################################################
 
@@ -32,6 +39,13 @@
 from numpy import *                 # Grab all of the NumPy functions
 from matplotlib.pyplot import *     # Grab MATLAB-like plotting functions
 import control                      # import the control system functions
+from pid_controller import PID      # streaming PID controller
+
+# discrete_sim is shared with the scripts in Command Generation
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'Command Generation'))
+from discrete_sim import zoh_response    # exact ZOH simulation of sampled inputs
 
 # Uncomment to use LaTeX to process the text in figure
 rc('text',usetex=True)
@@ -65,22 +79,23 @@ Xd = zeros(500)  # Define an array of all zeros
 Xd[50:] = 1      # Make all elements of this array index>50 = 1 (all after 0.5s)
 Xd[200:] = 0.6   # Make the elements after 2.5s = 0.5
 
-# run the simulation - utilize the built-in forced_response function
-[T_PID,yout_PID,xout_PID] = control.forced_response(sysPID,t,Xd)
+# run the simulation - exact for the reference held constant between samples
+[T_PID,yout_PID,xout_PID] = zoh_response(sysPID,t,Xd)
 
 # Calculate the error terms
+dt = T_PID[1] - T_PID[0]
 error = Xd - yout_PID
-error_deriv = r_[0,diff(error)]
-error_int = trapz(error,T_PID)
-
-# Calculate the "derivative on measurement" term
-error_measurement = -r_[0,diff(yout_PID)]
+error_deriv = r_[0,diff(error)]/dt   # per second, as the controller uses it
 
-# Calculate the force input (the output of the PID controller)
-force = kp*error + ki*error_int + kd*error_deriv        # Direct application
+# Calculate the force input (the output of the PID controller) by running the
+# controller over the response. The integral term is the running integral of
+# the error, not a single value for the whole run.
+pid_direct = PID(kp,ki,kd,derivative_on_measurement=False)
+force = pid_direct.run(Xd,yout_PID,dt)                  # Direct application
 
 # Force from "derivative on measurement" method
-force_measurement = kp*error + ki*error_int + kd*error_measurement  
+pid_measurement = PID(kp,ki,kd,derivative_on_measurement=True)
+force_measurement = pid_measurement.run(Xd,yout_PID,dt)
 
 
 # Make the figure pretty, then plot the results
@@ -256,8 +271,8 @@ setp(ltext,family='CMU Serif',fontsize=16)
 # sysDerivMeasure = control.tf(num,den)
 # 
 # # this is not "strictly" correct, but it should give us an idea
-# # run the simulation - utilize the built-in forced_response function
-# [T_meas,yout_meas,xout_meas] = control.forced_response(sysDerivMeasure,T_PID,force,hmax=0.01)
+# # run the simulation - exact for the force held constant between samples
+# [T_meas,yout_meas,xout_meas] = zoh_response(sysDerivMeasure,T_PID,force)
 # 
 # #----- Plot the force
 # # Make the figure pretty, then plot the results
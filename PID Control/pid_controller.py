@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# pid_controller.py
+#
+# Streaming PID controller
+#
+# The same controller can run sample-by-sample in a real-time loop, with update(), or
+# re-compute the control output over a whole logged run at once, with run(). Both keep
+# the integral as a running (cumulative) trapezoidal sum, and both leave the controller
+# in the same state, so a log can be processed in pieces.
+#
+# Features:
+#   * derivative on measurement (or on error, to compare against direct application)
+#   * first-order low-pass filter on the derivative term, time constant tau
+#   * output saturation with anti-windup - the integral is frozen while the output
+#     is saturated and the error would drive it further into saturation
+#   * update() also steps arrays of independent loops at once
+#
+# Usage:
+#   controller = PID(kp=12, ki=10, kd=5, tau=0.01, output_limits=(-50, 50))
+#   force = controller.update(setpoint, measurement, dt)     # in the control loop
+#   force = controller.run(Xd, yout, dt)                     # over whole arrays
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division
+
+import numpy as np
+from scipy.signal import lfilter
+
+
+class PID(object):
+    """
+    PID controller with derivative filtering and anti-windup.
+
+    Arguments:
+        kp, ki, kd :  proportional, integral, and derivative gains
+        tau :  time constant of the derivative filter (s), 0 for no filtering
+        output_limits :  (min, max) actuator limits, either can be None
+        derivative_on_measurement :  differentiate -measurement rather than the
+                                     error, which avoids the derivative kick at
+                                     setpoint steps
+    """
+    __slots__ = ('kp', 'ki', 'kd', 'tau', 'output_min', 'output_max',
+                 'derivative_on_measurement', 'integral', 'derivative',
+                 'last_error', 'last_signal', 'initialized')
+
+    def __init__(self, kp, ki, kd, tau=0., output_limits=(None, None),
+                 derivative_on_measurement=True):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.tau = tau
+        self.output_min, self.output_max = output_limits
+        self.derivative_on_measurement = derivative_on_measurement
+        self.reset()
+
+    def reset(self):
+        """ Clears the integral and derivative history """
+        self.integral = 0.
+        self.derivative = 0.
+        self.last_error = 0.
+        self.last_signal = 0.
+        self.initialized = False
+
+    def update(self, setpoint, measurement, dt):
+        """
+        Advances the controller one sample and returns the control output.
+
+        The setpoint, measurement, and gains can also be arrays, to step a number of
+        independent loops together (as pid_cosim does), each with its own state.
+
+        Arguments:
+            setpoint :  desired value
+            measurement :  measured value
+            dt :  time since the last update (s)
+        """
+        error = setpoint - measurement
+
+        # The signal that is differentiated
+        if self.derivative_on_measurement:
+            signal = -measurement
+        else:
+            signal = error
+
+        if self.initialized:
+            raw_derivative = (signal - self.last_signal) / dt
+            alpha = dt / (self.tau + dt)
+            self.derivative += alpha * (raw_derivative - self.derivative)
+            integral = self.integral + self.ki * 0.5 * (error + self.last_error) * dt
+        else:
+            integral = self.integral
+            self.initialized = True
+
+        self.last_error = error
+        self.last_signal = signal
+
+        output = self.kp * error + integral + self.kd * self.derivative
+
+        if isinstance(output, np.ndarray):
+            return self._saturate_array(output, error, integral)
+
+        # Saturate, only keeping the new integral if it doesn't wind up
+        if self.output_max is not None and output > self.output_max:
+            if error < 0:
+                self.integral = integral
+            return self.output_max
+
+        if self.output_min is not None and output < self.output_min:
+            if error > 0:
+                self.integral = integral
+            return self.output_min
+
+        self.integral = integral
+        return output
+
+    def _saturate_array(self, output, error, integral):
+        """ The saturation and anti-windup of update(), for arrays of loops """
+        keep = np.ones(output.shape, dtype=bool)
+        if self.output_max is not None:
+            high = output > self.output_max
+            keep &= ~high | (error < 0)
+            output = np.where(high, self.output_max, output)
+        if self.output_min is not None:
+            low = output < self.output_min
+            keep &= ~low | (error > 0)
+            output = np.where(low, self.output_min, output)
+
+        self.integral = np.where(keep, integral, self.integral)
+        return output
+
+    def run(self, setpoint, measurement, dt):
+        """
+        Returns the control output over whole arrays of samples, continuing from
+        (and updating) the current state of the controller.
+
+        Without output limits, this is computed in one vectorized pass, with a
+        cumulative sum for the integral and a linear filter for the derivative.
+        Anti-windup makes the integral depend on the past outputs, so with
+        output limits the samples are stepped through update().
+
+        Arguments:
+            setpoint :  desired values, array or scalar
+            measurement :  array of measured values
+            dt :  sample time (s)
+        """
+        measurement = np.asarray(measurement, dtype=float)
+        setpoint = np.broadcast_to(np.asarray(setpoint, dtype=float), measurement.shape)
+        if len(measurement) == 0:
+            return np.empty(0)
+
+        if self.output_min is not None or self.output_max is not None:
+            output = np.empty_like(measurement)
+            for ii in range(len(measurement)):
+                output[ii] = self.update(setpoint[ii], measurement[ii], dt)
+            return output
+
+        error = setpoint - measurement
+        if self.derivative_on_measurement:
+            signal = -measurement
+        else:
+            signal = error
+
+        # Running trapezoidal integral - the first sample only adds to it if the
+        # controller already has a previous error
+        if self.initialized:
+            last_error, last_signal = self.last_error, self.last_signal
+        else:
+            last_error, last_signal = error[0], signal[0]
+
+        steps = 0.5 * (error + np.r_[last_error, error[:-1]]) * dt
+        if not self.initialized:
+            steps[0] = 0.
+        integral = self.integral + self.ki * np.cumsum(steps)
+
+        # Filtered derivative, d[n] = d[n-1] + alpha*(raw[n] - d[n-1])
+        raw_derivative = np.diff(signal, prepend=last_signal) / dt
+        alpha = dt / (self.tau + dt)
+        derivative, _ = lfilter([alpha], [1., alpha - 1.], raw_derivative,
+                                zi=[(1. - alpha) * self.derivative])
+
+        self.integral = integral[-1]
+        self.derivative = derivative[-1]
+        self.last_error = error[-1]
+        self.last_signal = signal[-1]
+        self.initialized = True
+
+        return self.kp * error + integral + self.kd * derivative
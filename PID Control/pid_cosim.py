@@ -0,0 +1,209 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# pid_cosim.py
+#
+# Co-simulation of the mass-spring-damper plant of mass_spring_PID.py under a digital
+# PID controller running at a realistic sample rate
+#
+# The continuous plant is stepped with an exact zero-order-hold discretization, several
+# plant steps per controller sample. The controller only sees the plant at its own sample
+# times and includes the effects the continuous closed-loop transfer function leaves out:
+#   * computation latency - the output is applied a configurable number of samples late
+#   * sensor quantization (and optional measurement noise)
+#   * actuator saturation, with anti-windup
+#
+# The controller is a pid_controller.PID, stepping all of the runs at once, with the
+# derivative on the measurement by default. With derivative_on_measurement=False, no
+# delay, and a short sample time, the response matches the continuous [kd, kp, ki]
+# closed loop of mass_spring_PID.py.
+#
+# Every argument broadcasts across runs, and the runs are stepped together as one NumPy
+# recurrence, so Monte Carlo studies over plant uncertainty take one call.
+#
+# Usage:
+#   results = cosimulate(kp=350, ki=300, kd=25, m=1., c=2.5, k=2.,
+#                        controller_dt=0.01, delay=1, quantization=0.001,
+#                        output_limits=(-50, 50))
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import numpy as np
+from scipy.linalg import expm
+
+from pid_controller import PID
+
+
+def plant_zoh(m, c, k, dt):
+    """
+    Exact ZOH discretization of m x'' + c x' + k x = F for arrays of plants.
+
+    Returns:
+        Phi, Gamma :  (R, 2, 2) and (R, 2), so that [x, x'][n+1] = Phi [x, x'][n] + Gamma F[n]
+    """
+    m, c, k = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float))
+                                    for x in (m, c, k)])
+
+    M = np.zeros((len(m), 3, 3))
+    M[:, 0, 1] = 1.
+    M[:, 1, 0] = -k / m
+    M[:, 1, 1] = -c / m
+    M[:, 1, 2] = 1. / m
+
+    E = expm(M * dt)
+
+    return E[:, :2, :2], E[:, :2, 2]
+
+
+def cosimulate(kp, ki, kd, m=1., c=2.5, k=2., setpoint=1., t_final=5.,
+               controller_dt=0.01, plant_substeps=10, delay=1, quantization=0.,
+               output_limits=(None, None), tau=0., noise_std=0., seed=None,
+               record_plant=False, derivative_on_measurement=True):
+    """
+    Simulates a digital PID controller on the mass-spring-damper for many runs at once.
+
+    Arguments:
+        kp, ki, kd :  controller gains
+        m, c, k :  plant mass, damping coefficient, and spring constant
+                   The gains and plant parameters broadcast to the number of runs.
+        setpoint :  desired position, a scalar, an array over the controller samples,
+                    or an (R, N) array with a setpoint history for each run
+        t_final :  length of the simulation (s)
+        controller_dt :  controller sample time (s)
+        plant_substeps :  number of plant steps per controller sample
+        delay :  number of controller samples between reading the sensor and applying
+                 the resulting output (0 for an instantaneous controller)
+        quantization :  sensor resolution (m), 0 for none
+        output_limits :  (min, max) actuator limits, either can be None
+        tau :  time constant of the derivative filter (s)
+        noise_std :  standard deviation of additive measurement noise (m)
+        seed :  seed for the measurement noise
+        record_plant :  also return the position at every plant step
+        derivative_on_measurement :  False to differentiate the error, like the
+                                     [kd, kp, ki] loop of mass_spring_PID.py, which
+                                     kicks at setpoint steps
+
+    Returns:
+        dict -
+            t :  controller sample times, (N,)
+            position :  plant position at the controller samples, (R, N)
+            measurement :  quantized, noisy position seen by the controller, (R, N)
+            force :  force applied to the plant over each sample, (R, N)
+            t_plant, position_plant :  plant-rate time and position, if record_plant
+    """
+    num_samples = int(round(t_final / controller_dt))
+    t = np.arange(num_samples) * controller_dt
+
+    kp, ki, kd, m, c, k = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float))
+                                                for x in (kp, ki, kd, m, c, k)])
+    num_runs = len(m)
+
+    # Setpoint history as (N, R)
+    setpoint = np.asarray(setpoint, dtype=float)
+    if setpoint.ndim == 1:
+        setpoint = setpoint[:, np.newaxis]
+    elif setpoint.ndim == 2:
+        setpoint = setpoint.T
+    setpoint = np.broadcast_to(setpoint, (num_samples, num_runs))
+
+    # Plant discretization for one plant step, and the jumps to each substep of a
+    # controller sample: x[n, j] = Phi_j x[n] + Gamma_j F[n]
+    Phi, Gamma = plant_zoh(m, c, k, controller_dt / plant_substeps)
+    Phi_j = np.empty((plant_substeps, num_runs, 2, 2))
+    Gamma_j = np.empty((plant_substeps, num_runs, 2))
+    Phi_j[0], Gamma_j[0] = Phi, Gamma
+    for jj in range(1, plant_substeps):
+        Phi_j[jj] = np.einsum('rij,rjk->rik', Phi, Phi_j[jj-1])
+        Gamma_j[jj] = np.einsum('rij,rj->ri', Phi, Gamma_j[jj-1]) + Gamma
+    Phi_s, Gamma_s = Phi_j[-1], Gamma_j[-1]
+
+    rng = np.random.RandomState(seed)
+
+    # One PID steps all of the runs. Its zero state is the loop at rest before the
+    # start, so the first sample already integrates, and differentiates from there.
+    controller = PID(kp, ki, kd, tau, output_limits, derivative_on_measurement)
+    controller.initialized = True
+
+    # Plant state
+    x = np.zeros((num_runs, 2))
+    pending = np.zeros((delay + 1, num_runs))     # outputs waiting to be applied
+
+    position = np.empty((num_runs, num_samples))
+    measurement_log = np.empty((num_runs, num_samples))
+    force_log = np.empty((num_runs, num_samples))
+    if record_plant:
+        position_plant = np.empty((num_runs, num_samples, plant_substeps))
+
+    for n in range(num_samples):
+        position[:, n] = x[:, 0]
+
+        # Sensor
+        measurement = x[:, 0]
+        if noise_std > 0:
+            measurement = measurement + noise_std * rng.standard_normal(num_runs)
+        if quantization > 0:
+            measurement = quantization * np.round(measurement / quantization)
+        measurement_log[:, n] = measurement
+
+        output = controller.update(setpoint[n], measurement, controller_dt)
+
+        # Computation delay - the output computed now is applied delay samples later
+        pending[-1] = output
+        force = pending[0].copy()
+        pending[:-1] = pending[1:]
+        force_log[:, n] = force
+
+        # Plant - hold the force over the controller sample
+        if record_plant:
+            substeps = (np.einsum('jrik,rk->jri', Phi_j, x) +
+                        Gamma_j * force[np.newaxis, :, np.newaxis])
+            position_plant[:, n, :] = substeps[:, :, 0].T
+            x = substeps[-1]
+        else:
+            x = np.einsum('rik,rk->ri', Phi_s, x) + Gamma_s * force[:, np.newaxis]
+
+    results = {'t': t, 'position': position, 'measurement': measurement_log,
+               'force': force_log}
+
+    if record_plant:
+        dt_plant = controller_dt / plant_substeps
+        results['t_plant'] = np.arange(1, num_samples * plant_substeps + 1) * dt_plant
+        results['position_plant'] = position_plant.reshape(num_runs, -1)
+
+    return results
+
+
+if __name__ == "__main__":
+    import time
+    from pid_sweep import step_metrics
+
+    # The PID gains and plant from mass_spring_PID.py
+    kp = 350                    # The proportional gain
+    kd = 25                     # The derivative gain
+    ki = 300                    # The integral gain
+
+    # Monte Carlo over +/-10% uncertainty in the plant
+    num_runs = 10000
+    rng = np.random.RandomState(0)
+    m = 1. * rng.uniform(0.9, 1.1, num_runs)
+    c = 2.5 * rng.uniform(0.9, 1.1, num_runs)
+    k = 2. * rng.uniform(0.9, 1.1, num_runs)
+
+    for controller_dt in (0.001, 0.005, 0.01):
+        start = time.time()
+        results = cosimulate(kp, ki, kd, m, c, k, t_final=2., controller_dt=controller_dt,
+                             delay=1, quantization=1e-4, output_limits=(-100, 100))
+        elapsed = time.time() - start
+
+        metrics = step_metrics(results['t'], results['position'], np.ones(num_runs))
+        print('%5.1f ms sample time: median overshoot = %6.2f%%, 95th percentile = '
+              '%6.2f%% (%d runs in %.2fs)' %
+              (1000 * controller_dt, np.median(metrics['overshoot']),
+               np.percentile(metrics['overshoot'], 95), num_runs, elapsed))
@@ -0,0 +1,274 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# pid_sweep.py
+#
+# Parallel PID gain sweeps for the mass-spring-damper system of mass_spring_PID.py
+#
+# The closed-loop transfer function of PID control of the mass-spring-damper is
+#
+#                 kd s^2 + kp s + ki
+#   X/Xd = ---------------------------------
+#           m s^3 + (c+kd) s^2 + (k+kp) s + ki
+#
+# For every combination of (kp, ki, kd, m, c, k) on the grid, the step response is
+# simulated exactly at the samples (ZOH discretization of the closed loop) and reduced
+# to rise time, overshoot, settling time, IAE, and ISE. The cases are split into chunks
+# that are each simulated as one vectorized batch, and the chunks are spread across a
+# process pool.
+#
+# The metrics are read off the samples, so the time step has to resolve the fastest
+# closed-loop mode - at kp = 3000 its period is about 0.115s. Unless a time vector is
+# given, the cases are grouped by the size of their fastest pole, and each chunk gets
+# a time step of at most 1/SAMPLES_PER_PERIOD of that pole's period.
+#
+# Usage:
+#   results = sweep_gains(kp=[300,500,1000,3000], ki=0, kd=0, m=1., c=2.5, k=2)
+#   results['overshoot']       # array with the broadcast shape of the gain grid
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import multiprocessing
+
+import numpy as np
+from scipy.linalg import expm
+
+from pole_metrics import batch_roots
+
+# Names of the metrics returned by sweep_gains
+METRICS = ('rise_time', 'overshoot', 'settling_time', 'IAE', 'ISE')
+
+# Default time vector - its length (s), its largest time step (s), and the smallest
+# number of samples in a period of the fastest closed-loop pole
+DURATION = 5.
+MAX_DT = 0.01
+SAMPLES_PER_PERIOD = 20
+
+
+def closed_loop_pid(kp, ki, kd, m, c, k):
+    """
+    Returns the numerator and denominator coefficients of the PID closed loop,
+    highest power first, for broadcast arrays of gains and plant parameters.
+
+    Returns:
+        num, den :  arrays of shape (..., 3) and (..., 4)
+                    num = [kd, kp, ki], den = [m, c+kd, k+kp, ki]
+    """
+    kp, ki, kd, m, c, k = np.broadcast_arrays(*[np.asarray(x, dtype=float)
+                                                for x in (kp, ki, kd, m, c, k)])
+
+    num = np.stack((kd, kp, ki), axis=-1)
+    den = np.stack((m, c + kd, k + kp, ki), axis=-1)
+
+    return num, den
+
+
+def step_response_batch(num, den, t):
+    """
+    Unit step responses of a batch of third-order transfer functions, exact at
+    the samples of the uniform time vector t. For metrics read off the samples, t
+    should have SAMPLES_PER_PERIOD samples in a period of the fastest pole (see
+    time_vector).
+
+    Arguments:
+        num :  (N, 3) numerator coefficients, highest power first
+        den :  (N, 4) denominator coefficients, highest power first
+        t :  uniformly spaced time vector
+
+    Returns:
+        y :  (N, len(t)) step responses
+    """
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    num_cases = len(den)
+    dt = t[1] - t[0]
+
+    # Controllable canonical form of each closed loop
+    a = den[:, 1:] / den[:, :1]
+    b = num / den[:, :1]
+
+    M = np.zeros((num_cases, 4, 4))
+    M[:, 0, 1] = 1.
+    M[:, 1, 2] = 1.
+    M[:, 2, :3] = -a[:, ::-1]
+    M[:, 2, 3] = 1.            # the augmented column holds B = [0, 0, 1]
+
+    # ZOH discretization of all of the cases at once
+    E = expm(M * dt)
+    Phi = E[:, :3, :3]
+    Gamma = E[:, :3, 3]
+    C = b[:, ::-1]
+
+    x = np.zeros((num_cases, 3))
+    y = np.empty((num_cases, len(t)))
+    for ii in range(len(t)):
+        y[:, ii] = np.sum(C * x, axis=1)
+        x = np.einsum('nij,nj->ni', Phi, x) + Gamma
+
+    return y
+
+
+def time_vector(den, duration=DURATION):
+    """
+    Uniform time vector from 0 to duration, with a time step of at most MAX_DT
+    and at most 1/SAMPLES_PER_PERIOD of the period 2 pi/|p| of the fastest pole p
+    of the (N, 4) closed-loop denominators den.
+    """
+    speed = np.max(np.abs(batch_roots(den)), axis=1)
+    speed = np.max(speed[np.isfinite(speed)], initial=0.)
+
+    dt = MAX_DT
+    if speed > 0:
+        dt = min(dt, 2. * np.pi / (SAMPLES_PER_PERIOD * speed))
+
+    return np.linspace(0., duration, int(np.ceil(duration / dt)) + 1)
+
+
+def _first_crossing(t, y, level):
+    """ Time at which each row of y first reaches level (NaN if it never does) """
+    above = (y >= level[:, np.newaxis])
+    index = np.argmax(above, axis=1)
+    return np.where(above.any(axis=1), t[index], np.nan)
+
+
+def _trapezoid(f, dt):
+    """ Trapezoidal integral of each row of f over uniform samples """
+    return dt * (np.sum(f, axis=1) - 0.5 * (f[:, 0] + f[:, -1]))
+
+
+def step_metrics(t, y, final_value, settle_band=0.02):
+    """
+    Reduces a batch of unit step responses to performance metrics.
+
+    Arguments:
+        t :  uniformly spaced time vector
+        y :  (N, len(t)) step responses
+        final_value :  (N,) steady-state value of each response
+        settle_band :  settling tolerance, as a fraction of the final value
+
+    Returns:
+        dict of (N,) arrays -
+            rise_time :  10% to 90% rise time (s)
+            overshoot :  percent overshoot of the final value
+            settling_time :  time to stay within settle_band of the final value (s)
+            IAE, ISE :  integrated absolute and squared error to the unit step
+    """
+    dt = t[1] - t[0]
+    scale = np.abs(final_value)
+
+    rise_time = (_first_crossing(t, y, 0.9 * final_value) -
+                 _first_crossing(t, y, 0.1 * final_value))
+
+    overshoot = 100. * np.maximum(np.max(y, axis=1) - final_value, 0.) / scale
+
+    # Settled after the last sample outside of the band
+    outside = np.abs(y - final_value[:, np.newaxis]) > settle_band * scale[:, np.newaxis]
+    last_outside = len(t) - 1 - np.argmax(outside[:, ::-1], axis=1)
+    settling_time = np.where(outside.any(axis=1),
+                             t[np.minimum(last_outside + 1, len(t) - 1)], t[0])
+    settling_time[outside[:, -1]] = np.nan
+
+    error = 1. - y
+    IAE = _trapezoid(np.abs(error), dt)
+    ISE = _trapezoid(error**2, dt)
+
+    return {'rise_time': rise_time, 'overshoot': overshoot,
+            'settling_time': settling_time, 'IAE': IAE, 'ISE': ISE}
+
+
+def _sweep_chunk(args):
+    """ Simulates one chunk of the sweep - runs in the worker processes """
+    num, den, t = args
+
+    y = step_response_batch(num, den, t)
+
+    # DC gain of the closed loop, ki/ki for PID or kp/(k+kp) without integral action
+    final_value = np.where(den[:, 3] != 0,
+                           num[:, 2] / np.where(den[:, 3] != 0, den[:, 3], 1.),
+                           num[:, 1] / den[:, 2])
+
+    return step_metrics(t, y, final_value)
+
+
+def sweep_gains(kp, ki, kd, m=1., c=2.5, k=2., t=None, processes=None, chunksize=1024):
+    """
+    Step-response metrics of PID control over a grid of gains and plants.
+
+    Arguments:
+        kp, ki, kd :  proportional, integral, and derivative gains
+        m, c, k :  mass, damping coefficient, and spring constant of the plant
+                   All six broadcast against each other, so each can be a grid.
+        t :  uniformly spaced time vector for the step responses (default
+             0-DURATION s, with the time step of each chunk from time_vector)
+        processes :  number of worker processes (default one per CPU, 1 to run
+                     in the calling process)
+        chunksize :  number of cases simulated together in one task
+
+    Returns:
+        dict of arrays with the broadcast shape of the inputs, keyed by the
+        names in METRICS
+    """
+    num, den = closed_loop_pid(kp, ki, kd, m, c, k)
+    shape = den.shape[:-1]
+    num = num.reshape(-1, 3)
+    den = den.reshape(-1, 4)
+
+    if t is None:
+        # Group cases with similar fastest poles, so that each chunk's time step
+        # is no finer than its cases need
+        speed = np.max(np.abs(batch_roots(den)), axis=1)
+        order = np.argsort(np.where(np.isfinite(speed), speed, 0.), kind='mergesort')
+    else:
+        t = np.asarray(t, dtype=float)
+        order = np.arange(len(den))
+
+    chunks = []
+    for ii in range(0, len(den), chunksize):
+        index = order[ii:ii+chunksize]
+        chunks.append((num[index], den[index], t if t is not None else time_vector(den[index])))
+
+    if processes == 1 or len(chunks) == 1:
+        results = [_sweep_chunk(chunk) for chunk in chunks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_sweep_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+    metrics = {}
+    for name in METRICS:
+        metrics[name] = np.empty(len(den))
+        metrics[name][order] = np.concatenate([r[name] for r in results])
+        metrics[name] = metrics[name].reshape(shape)
+    return metrics
+
+
+if __name__ == "__main__":
+    # The proportional gains from mass_spring_PID.py, then a PID grid
+    m = 1.              # kg
+    k = 2               # spring constant - N/m
+    c = 2.5             # damping coeff - N/(m/s)
+
+    kp = np.array([300, 500, 1000, 3000])
+    results = sweep_gains(kp, 0, 0, m, c, k)
+
+    for ii, gain in enumerate(kp):
+        print('kp = %5d   overshoot = %6.2f%%   rise time = %6.4fs' %
+              (gain, results['overshoot'][ii], results['rise_time'][ii]))
+
+    kp, ki, kd = np.meshgrid(np.linspace(100, 500, 41), np.linspace(0, 400, 41),
+                             np.linspace(5, 50, 46), indexing='ij')
+    results = sweep_gains(kp, ki, kd, m, c, k)
+
+    best = np.unravel_index(np.nanargmin(results['IAE']), kp.shape)
+    print('Minimum IAE of %6.4f at kp = %g, ki = %g, kd = %g' %
+          (results['IAE'][best], kp[best], ki[best], kd[best]))
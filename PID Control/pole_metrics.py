@@ -0,0 +1,342 @@
+#! /usr/bin/env python
+
+##########################################################################################
+# pole_metrics.py
+#
+# Step-response metrics computed from the poles of a transfer function, without a
+# time simulation
+#
+# The step response of a stable transfer function N(s)/D(s) with distinct poles p_i is
+#
+#   y(t) = K + sum_i r_i/p_i e^(p_i t),     r_i = N(p_i) / D'(p_i)
+#
+# so once the poles and residues are known, the response can be evaluated at any time
+# directly. The poles of thousands of closed loops are found at once from batched
+# companion matrices (what numpy.roots does for one polynomial), the response is
+# sampled on a grid sized to each case's slowest decay and fastest oscillation, and the
+# peak, rise, and settling crossings are then refined by bisection. The extrema late in
+# the response are located from the sign changes of its derivative, so an excursion
+# out of the settling band between two samples isn't missed.
+#
+# For the standard second-order system, second_order_metrics gives the textbook
+# closed-form values.
+#
+# Created: 10/18/26
+#
+# Modified:
+#   *
+#
+##########################################################################################
+
+from __future__ import division, print_function
+
+import numpy as np
+
+# Number of bisection steps used to refine the crossing and peak times
+REFINE_ITERATIONS = 24
+
+# Largest phase change of the fastest mode between grid samples (rad)
+MAX_PHASE_STEP = np.pi / 8
+
+
+def batch_roots(coeffs):
+    """
+    Roots of a batch of polynomials, the vectorized equivalent of numpy.roots.
+
+    Arguments:
+        coeffs :  (N, n+1) polynomial coefficients, highest power first, with
+                  nonzero leading coefficients
+
+    Returns:
+        (N, n) complex roots
+    """
+    coeffs = np.atleast_2d(np.asarray(coeffs, dtype=float))
+    num_cases, n = coeffs.shape[0], coeffs.shape[1] - 1
+
+    companion = np.zeros((num_cases, n, n))
+    companion[:, 0, :] = -coeffs[:, 1:] / coeffs[:, :1]
+    companion[:, 1:, :-1] = np.eye(n - 1)
+
+    return np.linalg.eigvals(companion)
+
+
+def second_order_metrics(wn, zeta, settle_band=0.02):
+    """
+    Closed-form step-response metrics of wn^2/(s^2 + 2 zeta wn s + wn^2).
+
+    Returns:
+        overshoot :  percent overshoot (0 for zeta >= 1)
+        peak_time :  time of the first peak (s) (NaN for zeta >= 1)
+        settling_time :  envelope-based settling time, -ln(settle_band)/(zeta wn) (s)
+    """
+    wn, zeta = np.broadcast_arrays(np.asarray(wn, dtype=float),
+                                   np.asarray(zeta, dtype=float))
+    underdamped = zeta < 1
+    root = np.sqrt(np.where(underdamped, 1 - zeta**2, 1.))
+
+    overshoot = np.where(underdamped, 100. * np.exp(-zeta * np.pi / root), 0.)
+    peak_time = np.where(underdamped, np.pi / (wn * root), np.nan)
+    settling_time = -np.log(settle_band) / (zeta * wn)
+
+    return overshoot, peak_time, settling_time
+
+
+def _residues(num, den, poles):
+    """
+    Step-response coefficients c_i = r_i/p_i, direct feedthrough d, and the
+    mask of poles that are not cancelled by a zero at the origin.
+    """
+    n = den.shape[1] - 1
+
+    # Pad the numerator to the order of the denominator and split off the
+    # direct feedthrough, leaving a strictly proper remainder
+    num = np.concatenate((np.zeros((len(num), n + 1 - num.shape[1])), num), axis=1)
+    d = num[:, 0] / den[:, 0]
+    num = num - d[:, np.newaxis] * den
+
+    # r_i = N(p_i) / (a_n prod_{j != i} (p_i - p_j))
+    powers = poles[:, :, np.newaxis] ** np.arange(n, -1, -1)
+    N_p = np.einsum('nik,nk->ni', powers, num)
+    diffs = poles[:, :, np.newaxis] - poles[:, np.newaxis, :]
+    diffs[:, np.arange(n), np.arange(n)] = 1.
+    r = N_p / (den[:, :1] * np.prod(diffs, axis=2))
+
+    # A pole at the origin with no residue is cancelled by a zero there (ki = 0)
+    scale = np.max(np.abs(poles), axis=1, keepdims=True) + 1.
+    active = ~((np.abs(poles) < 1e-9 * scale) & (np.abs(r) < 1e-9 * scale))
+    c = np.where(active, r / np.where(active, poles, 1.), 0.)
+
+    return c, d, active
+
+
+def _separate_repeated(poles):
+    """ Nudges repeated poles apart so that the residue expansion stays finite """
+    n = poles.shape[1]
+    scale = np.max(np.abs(poles), axis=1, keepdims=True) + 1.
+    gaps = np.abs(poles[:, :, np.newaxis] - poles[:, np.newaxis, :])
+    gaps[:, np.arange(n), np.arange(n)] = np.inf
+    repeated = np.min(gaps, axis=2) < 1e-6 * scale
+
+    return poles + repeated * 1e-6 * scale * np.arange(1, n + 1)
+
+
+def _evaluate(K, c, poles, t):
+    """ Step response of each case at its own times t, shape (N,) or (N, G) """
+    if t.ndim == 1:
+        return K + np.real(np.sum(c * np.exp(poles * t[:, np.newaxis]), axis=1))
+    return K[:, np.newaxis] + np.real(np.einsum('ni,nig->ng', c,
+                                               np.exp(poles[:, :, np.newaxis] *
+                                                      t[:, np.newaxis, :])))
+
+
+def _bisect(f, lo, hi, level):
+    """ Vectorized bisection for f(t) = level between lo and hi """
+    f_lo = f(lo) - level
+    for ii in range(REFINE_ITERATIONS):
+        mid = 0.5 * (lo + hi)
+        f_mid = f(mid) - level
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return 0.5 * (lo + hi)
+
+
+def _modes(num, den, settle_band):
+    """
+    Poles and step-response coefficients of each case, along with the time
+    spans the response grid has to cover.
+
+    A grid long enough for the slowest mode to decay and fine enough for the
+    fastest oscillation would be huge when a slow pole (such as the one added
+    by a small ki) sits next to fast ones, so the grid is fine only while the
+    fast modes last and coarse over the slow tail after them.
+    """
+    poles = _separate_repeated(batch_roots(den))
+    c, d, active = _residues(num, den, poles)
+
+    # y(0+) = d, so the final value is d - sum(c)
+    K = d - np.real(np.sum(c, axis=1))
+    stable = np.all(~active | (np.real(poles) < 0), axis=1)
+
+    decay = np.where(active, -np.real(poles), np.inf)
+    slowest = np.where(stable, np.min(decay, axis=1), 1.)
+    size = np.where(active, np.abs(poles), 0.)
+    fast = size > 10. * slowest[:, np.newaxis]
+
+    settle_decays = -np.log(settle_band) + 6.
+    horizon = settle_decays / slowest
+    fast_horizon = np.minimum(settle_decays / np.min(np.where(fast, decay, np.inf), axis=1),
+                              horizon)
+    fastest = np.max(size, axis=1)
+    fastest_slow = np.max(np.where(fast, 0., size), axis=1)
+
+    return {'poles': poles, 'c': c, 'K': K, 'stable': stable,
+            'fast_span': fast_horizon, 'fast_speed': fastest,
+            'slow_span': horizon - fast_horizon, 'slow_speed': fastest_slow}
+
+
+def _metrics_chunk(modes, settle_band):
+    poles, c, K, stable = modes['poles'], modes['c'], modes['K'], modes['stable']
+    fast_span, slow_span = modes['fast_span'], modes['slow_span']
+    rows = np.arange(len(K))
+
+    def num_points(span, speed):
+        return int(np.clip(np.max(span * speed) / MAX_PHASE_STEP, 100, 20000))
+
+    t = np.concatenate((fast_span[:, np.newaxis] *
+                        np.linspace(0., 1., num_points(fast_span, modes['fast_speed'])),
+                        fast_span[:, np.newaxis] + slow_span[:, np.newaxis] *
+                        np.linspace(0., 1., num_points(slow_span, modes['slow_speed']))[1:]),
+                       axis=1)
+    num_points = t.shape[1]
+    # Normalized to a final value of 1
+    exponentials = np.exp(poles[:, :, np.newaxis] * t[:, np.newaxis, :])
+    y = 1. + np.real(np.einsum('ni,nig->ng', c, exponentials)) / K[:, np.newaxis]
+    dy = np.real(np.einsum('ni,nig->ng', c * poles, exponentials)) / K[:, np.newaxis]
+    del exponentials
+
+    y_at = lambda tt: _evaluate(K, c, poles, tt) / K
+    dy_at = lambda tt: np.real(np.sum(c * poles * np.exp(poles * tt[:, np.newaxis]), axis=1))
+
+    # Peak - refine the largest sample with the zero of the derivative around it
+    peak = np.argmax(y, axis=1)
+    interior = (peak > 0) & (peak < num_points - 1) & (y[rows, peak] > 1.)
+    lo = t[rows, np.maximum(peak - 1, 0)]
+    hi = t[rows, np.minimum(peak + 1, num_points - 1)]
+    peak_time = np.where(interior, _bisect(dy_at, lo, hi, 0.), np.nan)
+    overshoot = np.where(interior, 100. * (y_at(np.where(interior, peak_time, 0.)) - 1.), 0.)
+
+    # Rise time, 10% to 90% of the final value
+    def first_crossing(level):
+        above = y >= level
+        index = np.argmax(above, axis=1)
+        lo = t[rows, np.maximum(index - 1, 0)]
+        hi = t[rows, index]
+        return np.where(above.any(axis=1), _bisect(y_at, lo, hi, level), np.nan)
+
+    rise_time = first_crossing(0.9) - first_crossing(0.1)
+
+    # Settling time - the last time the response leaves the band. Between samples
+    # it can only leave at an extremum, so the extrema after the last sample outside
+    # that might reach out of the band are refined and checked too, latest first.
+    # An extremum between two samples is at most one step of the steeper slope
+    # beyond them.
+    deviation = np.abs(y - 1.)
+    outside = deviation > settle_band
+    last = np.where(outside.any(axis=1),
+                    num_points - 1 - np.argmax(outside[:, ::-1], axis=1), 0)
+
+    reach = (np.maximum(deviation[:, :-1], deviation[:, 1:]) + np.diff(t, axis=1) *
+             np.maximum(np.abs(dy[:, :-1]), np.abs(dy[:, 1:])))
+    candidate = ((np.sign(dy[:, :-1]) != np.sign(dy[:, 1:])) & (reach > settle_band) &
+                 (np.arange(num_points - 1) >= last[:, np.newaxis]))
+
+    lo = t[rows, last]
+    hi = t[rows, np.minimum(last + 1, num_points - 1)]
+    left = outside.any(axis=1)
+    pending = candidate.any(axis=1)
+    while pending.any():
+        index = num_points - 2 - np.argmax(candidate[:, ::-1], axis=1)
+        extremum = _bisect(dy_at, t[rows, index], t[rows, index + 1], 0.)
+        found = pending & (np.abs(y_at(extremum) - 1.) > settle_band)
+        lo = np.where(found, extremum, lo)
+        hi = np.where(found, t[rows, index + 1], hi)
+        left |= found
+
+        candidate[rows[pending], index[pending]] = False
+        pending &= ~found & candidate.any(axis=1)
+
+    band = np.where(y_at(lo) > 1., 1. + settle_band, 1. - settle_band)
+    settling_time = np.where(left, _bisect(y_at, lo, hi, band), 0.)
+
+    unstable = ~stable
+    for metric in (overshoot, peak_time, rise_time, settling_time):
+        metric[unstable] = np.nan
+
+    return {'overshoot': overshoot, 'peak_time': peak_time, 'rise_time': rise_time,
+            'settling_time': settling_time, 'final_value': K, 'stable': stable}
+
+
+def tf_step_metrics(num, den, settle_band=0.02, chunksize=2048):
+    """
+    Step-response metrics of a batch of transfer functions from their poles.
+
+    Arguments:
+        num :  numerator coefficients, highest power first, shape (n_num,) or
+               (..., n_num)
+        den :  denominator coefficients, highest power first, shape (n+1,) or
+               (..., n+1), broadcast against num
+        settle_band :  settling tolerance, as a fraction of the final value
+        chunksize :  number of cases evaluated together
+
+    Returns:
+        dict of arrays with the batch shape -
+            overshoot :  percent overshoot (0 if the response never exceeds its
+                         final value)
+            peak_time :  time of the peak (s) (NaN without overshoot)
+            rise_time :  10% to 90% rise time (s)
+            settling_time :  time to stay within settle_band of the final value (s)
+            final_value :  steady-state value
+            stable :  True where all of the (uncancelled) poles are in the LHP
+    """
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    shape = np.broadcast(num[..., 0], den[..., 0]).shape
+
+    num = np.broadcast_to(num, shape + num.shape[-1:]).reshape(-1, num.shape[-1])
+    den = np.broadcast_to(den, shape + den.shape[-1:]).reshape(-1, den.shape[-1])
+
+    modes = _modes(num, den, settle_band)
+
+    # Group cases that need similar grids so that each chunk's grid is no
+    # larger than its cases need
+    cost = np.maximum(modes['fast_span'] * modes['fast_speed'],
+                      modes['slow_span'] * modes['slow_speed'])
+    order = np.argsort(np.where(np.isfinite(cost), cost, 0.), kind='mergesort')
+
+    results = {}
+    for ii in range(0, len(order), chunksize):
+        index = order[ii:ii+chunksize]
+        chunk = _metrics_chunk(dict((name, value[index]) for name, value in modes.items()),
+                               settle_band)
+        for name, value in chunk.items():
+            results.setdefault(name, np.empty(len(order), dtype=value.dtype))[index] = value
+
+    return dict((name, value.reshape(shape)) for name, value in results.items())
+
+
+def pid_step_metrics(kp, ki, kd, m=1., c=2.5, k=2., settle_band=0.02):
+    """
+    Step-response metrics of PID control of the mass-spring-damper, for
+    broadcast grids of gains and plant parameters. See tf_step_metrics.
+    """
+    kp, ki, kd, m, c, k = np.broadcast_arrays(*[np.asarray(x, dtype=float)
+                                                for x in (kp, ki, kd, m, c, k)])
+
+    num = np.stack((kd, kp, ki), axis=-1)
+    den = np.stack((m, c + kd, k + kp, ki), axis=-1)
+
+    return tf_step_metrics(num, den, settle_band)
+
+
+if __name__ == "__main__":
+    # The closed loops from mass_spring_PID.py
+    m = 1.              # kg
+    k = 2               # spring constant - N/m
+    c = 2.5             # damping coeff - N/(m/s)
+
+    for name, kp, ki, kd in (('P', 300, 0, 0), ('PD', 300, 0, 10), ('PID', 350, 300, 25)):
+        metrics = pid_step_metrics(kp, ki, kd, m, c, k)
+        print('%3s:  overshoot = %6.2f%%   peak time = %6.4fs   settling time = %6.4fs' %
+              (name, metrics['overshoot'], metrics['peak_time'], metrics['settling_time']))
+
+    # Screen a grid of gains
+    kp, ki, kd = np.meshgrid(np.linspace(100, 500, 41), np.linspace(0, 400, 41),
+                             np.linspace(5, 50, 46), indexing='ij')
+    metrics = pid_step_metrics(kp, ki, kd, m, c, k)
+
+    fast = metrics['settling_time'] * (metrics['overshoot'] < 5.)
+    best = np.unravel_index(np.nanargmin(np.where(fast > 0, fast, np.nan)), kp.shape)
+    print('Fastest settling with < 5%% overshoot: %6.4fs at kp = %g, ki = %g, kd = %g' %
+          (metrics['settling_time'][best], kp[best], ki[best], kd[best]))